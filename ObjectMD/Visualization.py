@@ -2,7 +2,9 @@ import json
 from pathlib import Path
 import random
 
-import cv2
+import typer
+
+from ObjectMD.catalog import load_catalog
 
 # === CONFIG ===
 NUM_VIDEOS = 3
@@ -14,33 +16,31 @@ RAW_DATA_DIR = Path("data/raw")
 PROCESSED_DATA_DIR = Path("data/processed")
 LABELS_FILE = PROCESSED_DATA_DIR / "labels.json"
 
-# === LOAD LABELS ===
-with open(LABELS_FILE, "r") as f:
-    labels = json.load(f)
+app = typer.Typer()
+
+
+def load_labels(labels_file=LABELS_FILE):
+    with open(labels_file, "r") as f:
+        return json.load(f)
+
+
+def play_video(entry, catalog):
+    """Plays one labeled video with the action status overlaid (space pauses, q skips)."""
+    import cv2  # GUI backend is only loaded when something is actually played
 
-# === VISUALIZE N VIDEOS ===
-random.shuffle(labels)
-for entry in labels[:NUM_VIDEOS]:
     video_file = entry["video"]
 
-    # Search for the video in all subfolders of data/raw
-    matches = list(RAW_DATA_DIR.rglob(video_file))
-    if not matches:
+    # Look the video up in the catalog of data/raw
+    video_path = catalog.path_of(video_file)
+    if video_path is None:
         print(f"[!] ❌ Label video name not found: {video_file}")
-        continue
-
-    # Confirm exact match
-    video_path = matches[0]
-    actual_file_name = video_path.name
-    if actual_file_name != video_file:
-        print(f"[!] ⚠️ Name mismatch! Label: {video_file} | Actual file: {actual_file_name}")
-    else:
-        print(f"[✓] Matched: {video_file}")
+        return
+    print(f"[✓] Matched: {video_file}")
 
     print(f"▶️ Playing {video_file}")
     cap = cv2.VideoCapture(str(video_path))
 
-    fps = cap.get(cv2.CAP_PROP_FPS) or FPS
+    fps = catalog.fps_of(video_file) or FPS
     paused = False
 
     while cap.isOpened():
@@ -68,13 +68,19 @@ for entry in labels[:NUM_VIDEOS]:
 
             # Overlay text
             overlay_text = f"{video_file} | Time: {timestamp:.2f}s | {status}"
-            cv2.putText(frame, overlay_text, (30, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            cv2.putText(frame, overlay_text, (30, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
 
             if SHOW_INFO:
                 subject_info = f"{entry['subject_gender']}, {int(entry['subject_age'])}y"
-                cv2.putText(frame, subject_info, (30, 60),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 1)
+                cv2.putText(
+                    frame,
+                    subject_info,
+                    (30, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7,
+                    (200, 200, 200),
+                    1,
+                )
 
             # Show the frame
             cv2.imshow("Video Annotation Viewer", frame)
@@ -87,4 +93,18 @@ for entry in labels[:NUM_VIDEOS]:
             break
 
     cap.release()
-    cv2.destroyAllWindows()
\ No newline at end of file
+    cv2.destroyAllWindows()
+
+
+# === VISUALIZE N VIDEOS ===
+@app.command()
+def main(num_videos: int = NUM_VIDEOS):
+    labels = load_labels()
+    catalog = load_catalog(RAW_DATA_DIR)
+    random.shuffle(labels)
+    for entry in labels[:num_videos]:
+        play_video(entry, catalog)
+
+
+if __name__ == "__main__":
+    app()
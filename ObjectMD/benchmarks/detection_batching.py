@@ -0,0 +1,92 @@
+from itertools import islice
+from pathlib import Path
+import time
+
+import cv2
+import numpy as np
+import typer
+
+from ObjectMD.object_detection import detect_objects_in_batch, get_model
+
+BATCH_SIZES = [1, 4, 8, 16]
+BATCH_SIZES_OPTION = typer.Option(BATCH_SIZES)
+
+app = typer.Typer()
+
+
+def read_frames(video_path: Path | None, num_frames: int, width: int, height: int):
+    """Decode the first `num_frames` frames of `video_path`, or make random frames."""
+    if video_path is None:
+        rng = np.random.default_rng(0)
+        shape = (height, width, 3)
+        return [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(num_frames)]
+
+    cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    while len(frames) < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_detection(frames, batch_size):
+    detections = []
+    it = iter(enumerate(frames))
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            break
+        indices = [idx for idx, _ in chunk]
+        images = [frame for _, frame in chunk]
+        for frame_detections in detect_objects_in_batch(images, indices):
+            detections.extend(frame_detections)
+    return detections
+
+
+def same_detections(a, b, atol=1e-4):
+    if len(a) != len(b):
+        return False
+    for da, db in zip(a, b):
+        if (da["frame"], da["label"], da["bbox"]) != (db["frame"], db["label"], db["bbox"]):
+            return False
+        if abs(da["confidence"] - db["confidence"]) > atol:
+            return False
+    return True
+
+
+@app.command()
+def main(
+    video_path: Path | None = None,
+    num_frames: int = 64,
+    width: int = 640,
+    height: int = 480,
+    batch_sizes: list[int] = BATCH_SIZES_OPTION,
+):
+    """Report YOLO frames/sec on CPU per batch size and check results match batch size 1."""
+    get_model().to("cpu")
+    frames = read_frames(video_path, num_frames, width, height)
+    print(f"[INFO] Benchmarking {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    # Warm-up so the first timed batch size doesn't pay for lazy initialisation
+    run_detection(frames[: max(batch_sizes)], max(batch_sizes))
+
+    reference = None
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        detections = run_detection(frames, batch_size)
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = detections
+        match = "✅" if same_detections(reference, detections) else "❌"
+        print(
+            f"batch={batch_size:>3} | {len(frames) / elapsed:8.2f} frames/sec | "
+            f"{len(detections)} detections | matches batch={batch_sizes[0]}: {match}"
+        )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,378 @@
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+from queue import Empty
+import resource
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import typer
+
+from ObjectMD.config import PROJ_ROOT, REPORTS_DIR
+
+STAGES = [
+    "frames",
+    "frame_store",
+    "detection",
+    "pose",
+    "pose_roi",
+    "feature_extraction",
+    "is_moving",
+]
+VIDEO_NAME = "synthetic"
+RESULT_POLL_S = 1.0  # how often the parent checks that a stage worker is still alive
+STAGES_OPTION = typer.Option(STAGES)
+
+app = typer.Typer()
+
+
+# === SYNTHETIC INPUT ===
+def box_position(frame_idx, num_frames, width, height, box_w, box_h):
+    """Box rests, moves across the frame during the middle third, then rests."""
+    start, end = num_frames // 3, 2 * num_frames // 3
+    progress = min(max((frame_idx - start) / max(end - start, 1), 0.0), 1.0)
+    x = int(0.1 * width + progress * (0.8 * width - box_w))
+    y = int(height / 2 - box_h / 2)
+    return x, y
+
+
+def make_synthetic_video(path: Path, width: int, height: int, fps: int, duration: float):
+    """Write an mp4 with a textured background and a moving orange "box" (with tape
+    and a label, so it has some texture of its own)."""
+    num_frames = round(fps * duration)
+    box_w, box_h = width // 6, height // 5
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for frame_idx in range(num_frames):
+        frame = background.copy()
+        x, y = box_position(frame_idx, num_frames, width, height, box_w, box_h)
+        cv2.rectangle(frame, (x, y), (x + box_w, y + box_h), (0, 140, 255), -1)
+        tape_x = x + box_w // 2 - box_w // 16
+        cv2.rectangle(frame, (tape_x, y), (tape_x + box_w // 8, y + box_h), (40, 90, 160), -1)
+        cv2.rectangle(
+            frame,
+            (x + box_w // 8, y + box_h // 5),
+            (x + box_w // 3, y + box_h // 2),
+            (235, 235, 235),
+            -1,
+        )
+        cv2.putText(
+            frame,
+            "A1",
+            (x + box_w // 8 + 2, y + box_h // 2 - 4),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.4,
+            (20, 20, 20),
+            1,
+        )
+        writer.write(frame)
+    writer.release()
+    return num_frames
+
+
+def write_labels(path: Path, fps: int, duration: float):
+    """labels.json entry marking the middle third (when the box moves) as the action."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            [
+                {
+                    "video": f"{VIDEO_NAME}.mp4",
+                    "action_start": {"video_second": duration / 3},
+                    "action_end": {"video_second": 2 * duration / 3},
+                }
+            ],
+            f,
+        )
+
+
+# === STAND-IN DETECTOR ===
+class _Box:
+    def __init__(self, cls_id, conf, xyxy):
+        self.cls = np.float32(cls_id)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class _Results:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StandInDetector:
+    """Tiny colour-threshold detector with the ultralytics call interface.
+
+    Finds the synthetic orange box so the detection stage exercises the real
+    batching, filtering and serialization code without model weights.
+    """
+
+    def __init__(self):
+        self.names = {0: "box"}
+
+    def __call__(self, frames):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        results = []
+        for frame in frames:
+            small = cv2.resize(frame, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+            mask = cv2.inRange(small, (0, 100, 200), (60, 180, 255))
+            points = cv2.findNonZero(mask)
+            boxes = []
+            if points is not None:
+                x, y, w, h = cv2.boundingRect(points)
+                boxes.append(_Box(0, 0.9, [4 * x, 4 * y, 4 * (x + w), 4 * (y + h)]))
+            results.append(_Results(boxes))
+        return results
+
+
+# === STAGE RUNNERS (executed in a fresh process inside the work dir) ===
+# Each runner does its imports up front and returns the callable to time, so
+# module import cost is not counted as stage throughput.
+def run_frames(video_path: Path):
+    from ObjectMD.frames import OUTPUT_DIR, extract_frames_for_video
+
+    def run():
+        extract_frames_for_video(video_path)
+        return {"frames": None, "outputs": [str(OUTPUT_DIR)]}
+
+    return run
+
+
+def run_frame_store(video_path: Path):
+    from ObjectMD.frames import STORE_DIR, extract_frames_for_video
+
+    def run():
+        extract_frames_for_video(video_path, backend="memmap")
+        return {"frames": None, "outputs": [str(STORE_DIR)]}
+
+    return run
+
+
+def run_detection(video_path: Path):
+    from ObjectMD.object_detection import OUTPUT_DIR, DetectionStage
+    from ObjectMD.video_pipeline import run_stages
+
+    def run():
+        run_stages(video_path, [DetectionStage(model=StandInDetector())])
+        return {"frames": None, "outputs": [str(OUTPUT_DIR)]}
+
+    return run
+
+
+def run_pose(video_path: Path):
+    from ObjectMD.pose_estimation import OUTPUT_DIR, estimate_pose_for_video
+
+    def run():
+        estimate_pose_for_video(video_path)
+        return {"frames": None, "outputs": [str(OUTPUT_DIR)]}
+
+    return run
+
+
+def run_pose_roi(video_path: Path):
+    # Crops around the boxes saved by the detection stage
+    from ObjectMD.pose_estimation import OUTPUT_DIR, estimate_pose_for_video
+
+    def run():
+        estimate_pose_for_video(video_path, roi=True)
+        return {"frames": None, "outputs": [str(OUTPUT_DIR)]}
+
+    return run
+
+
+def run_feature_extraction(video_path: Path):
+    from ObjectMD.feature_extraction import OUTPUT_DIR, POSE_DIR, extract_features_for_video
+    from ObjectMD.storage import find_pose, save_pose
+
+    pose_file = find_pose(POSE_DIR, VIDEO_NAME)
+    if pose_file is None:
+        # Pose was skipped (no mediapipe): feed features an empty pose track
+        POSE_DIR.mkdir(parents=True, exist_ok=True)
+        pose_file = save_pose(video_path.name, [], POSE_DIR / f"{VIDEO_NAME}_pose.json")
+
+    def run():
+        rows = extract_features_for_video(pose_file)
+        return {"frames": rows, "outputs": [str(OUTPUT_DIR)]}
+
+    return run
+
+
+def run_is_moving(video_path: Path):
+    from ObjectMD.catalog import load_catalog
+    from ObjectMD.is_moving import (
+        FEATURES_DIR,
+        LABEL_FILE,
+        LABELED_DIR,
+        build_video_label_dict,
+        label_feature_file,
+        load_label_data,
+    )
+    from ObjectMD.storage import load_features
+
+    video_fps = {name: entry.get("fps") for name, entry in load_catalog().videos.items()}
+
+    def run():
+        video_labels = build_video_label_dict(load_label_data(LABEL_FILE), video_fps)
+        feature_file = FEATURES_DIR / f"features_{VIDEO_NAME}.csv"
+        output_file = label_feature_file(feature_file, video_labels)
+        rows = len(load_features(output_file)) if output_file is not None else 0
+        return {"frames": rows, "outputs": [str(LABELED_DIR)]}
+
+    return run
+
+
+RUNNERS = {
+    "frames": run_frames,
+    "frame_store": run_frame_store,
+    "detection": run_detection,
+    "pose": run_pose,
+    "pose_roi": run_pose_roi,
+    "feature_extraction": run_feature_extraction,
+    "is_moving": run_is_moving,
+}
+
+
+def dir_size(paths) -> int:
+    total = 0
+    for path in map(Path, paths):
+        if path.is_file():
+            total += path.stat().st_size
+        elif path.is_dir():
+            total += sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return total
+
+
+def stage_worker(stage, workdir, video_path, queue):
+    os.chdir(workdir)
+    try:
+        run = RUNNERS[stage](Path(video_path))
+        start = time.perf_counter()
+        info = run()
+        elapsed = time.perf_counter() - start
+        # ru_maxrss is in KiB on Linux
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        queue.put({"status": "ok", "elapsed": elapsed, "peak_rss_bytes": peak_rss, **info})
+    except ImportError as e:
+        queue.put({"status": "skipped", "reason": str(e)})
+    except Exception as e:  # noqa: BLE001 - reported as a failed stage by the parent
+        queue.put({"status": "failed", "reason": repr(e)})
+
+
+def wait_for_result(process, queue):
+    """The worker's result, or a failed result once it exits without sending one
+    (killed by the OOM killer, crashed in native code, ...)."""
+    while True:
+        try:
+            return queue.get(timeout=RESULT_POLL_S)
+        except Empty:
+            if process.is_alive():
+                continue
+        # The worker may have put its result right before exiting
+        try:
+            return queue.get(timeout=RESULT_POLL_S)
+        except Empty:
+            return {
+                "status": "failed",
+                "reason": f"worker exited with code {process.exitcode} without a result",
+            }
+
+
+def run_stage(stage, workdir: Path, video_path: Path, num_frames: int):
+    """Run one stage in its own process so peak RSS is attributable to it."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=stage_worker, args=(stage, workdir, video_path, queue))
+    process.start()
+    result = wait_for_result(process, queue)
+    process.join()
+
+    if result["status"] != "ok":
+        return result
+
+    frames = result.pop("frames") or num_frames
+    outputs = result.pop("outputs")
+    result.update(
+        {
+            "frames": frames,
+            "frames_per_sec": round(frames / result["elapsed"], 2),
+            "elapsed": round(result["elapsed"], 4),
+            "bytes_written": dir_size(workdir / Path(p) for p in outputs),
+        }
+    )
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "-C", str(PROJ_ROOT), "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@app.command()
+def main(
+    width: int = 640,
+    height: int = 480,
+    fps: int = 25,
+    duration: float = 20.0,
+    stages: list[str] = STAGES_OPTION,
+    output: Path = REPORTS_DIR / "benchmarks" / "pipeline.json",
+):
+    """Benchmark each pipeline stage on a synthetic video and write a diffable JSON report."""
+    with tempfile.TemporaryDirectory(prefix="objectmd-bench-") as tmp:
+        workdir = Path(tmp)
+        video_dir = workdir / "data" / "raw" / "synthetic"
+        video_dir.mkdir(parents=True)
+        video_path = video_dir / f"{VIDEO_NAME}.mp4"
+        num_frames = make_synthetic_video(video_path, width, height, fps, duration)
+        write_labels(workdir / "data" / "processed" / "labels.json", fps, duration)
+        print(f"[INFO] Synthetic video: {num_frames} frames, {width}x{height} @ {fps} fps")
+
+        results = {}
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            results[stage] = run_stage(stage, workdir, video_path, num_frames)
+            summary = results[stage]
+            if summary["status"] == "ok":
+                print(
+                    f"{stage:<20} {summary['frames_per_sec']:>10.1f} frames/sec | "
+                    f"peak RSS {summary['peak_rss_bytes'] / 2**20:7.1f} MiB | "
+                    f"{summary['bytes_written'] / 2**20:7.2f} MiB written"
+                )
+            else:
+                print(f"{stage:<20} {summary['status']}: {summary['reason']}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "video": {
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "duration": duration,
+            "frames": num_frames,
+        },
+        "stages": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"📁 Benchmark report saved to {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,121 @@
+import json
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import typer
+
+from ObjectMD.config import PROJ_ROOT, REPORTS_DIR
+
+# Modules with a CLI (`python -m <module> --help` must work)
+ENTRY_POINTS = [
+    "ObjectMD.catalog",
+    "ObjectMD.dataset",
+    "ObjectMD.events",
+    "ObjectMD.frames",
+    "ObjectMD.object_detection",
+    "ObjectMD.onnx_backend",
+    "ObjectMD.pose_estimation",
+    "ObjectMD.feature_extraction",
+    "ObjectMD.is_moving",
+    "ObjectMD.pipeline",
+    "ObjectMD.sample_frames",
+    "ObjectMD.storage",
+    "ObjectMD.streaming",
+    "ObjectMD.Visualization",
+    "ObjectMD.modeling.train",
+    "ObjectMD.modeling.predict",
+]
+# Dependencies that should only be loaded when a model or decoder is actually used
+HEAVY_MODULES = ["cv2", "ultralytics", "mediapipe", "torch", "onnxruntime"]
+ENTRY_POINTS_OPTION = typer.Option(ENTRY_POINTS)
+
+app = typer.Typer()
+
+
+def timed_run(args) -> tuple:
+    """Wall time of one fresh interpreter running `args`, plus its completed process."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, cwd=PROJ_ROOT, check=False
+    )  # callers check returncode
+    return time.perf_counter() - start, process
+
+
+def measure(args, repeats: int):
+    times, process = [], None
+    for _ in range(repeats):
+        elapsed, process = timed_run(args)
+        if process.returncode != 0:
+            return {"status": "failed", "reason": process.stderr.strip().splitlines()[-1:]}
+        times.append(elapsed)
+    return {
+        "status": "ok",
+        "median_s": round(statistics.median(times), 4),
+        "min_s": round(min(times), 4),
+        "stdout": process.stdout,
+    }
+
+
+def heavy_modules_loaded(module: str):
+    """Which HEAVY_MODULES end up in sys.modules after a bare `import module`."""
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    _, process = timed_run(["-c", code])
+    if process.returncode != 0:
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+@app.command()
+def main(
+    repeats: int = 5,
+    modules: list[str] = ENTRY_POINTS_OPTION,
+    output: Path = REPORTS_DIR / "benchmarks" / "startup.json",
+):
+    """Measure import and `--help` time of each entry point in a fresh interpreter."""
+    baseline = measure(["-c", "pass"], repeats)
+    print(f"{'interpreter':<30} {baseline['median_s'] * 1000:8.1f} ms")
+
+    results = {}
+    for module in modules:
+        imported = measure(["-c", f"import {module}"], repeats)
+        cli = measure(["-m", module, "--help"], repeats)
+        for summary in (imported, cli):
+            summary.pop("stdout", None)
+        results[module] = {
+            "import": imported,
+            "cli_help": cli,
+            "heavy_modules": heavy_modules_loaded(module),
+        }
+        if imported["status"] == "ok" and cli["status"] == "ok":
+            print(
+                f"{module:<30} {imported['median_s'] * 1000:8.1f} ms import | "
+                f"{cli['median_s'] * 1000:8.1f} ms --help | "
+                f"heavy: {results[module]['heavy_modules'] or '-'}"
+            )
+        else:
+            failed = imported if imported["status"] != "ok" else cli
+            print(f"{module:<30} failed: {failed['reason']}")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "interpreter": baseline,
+        "entry_points": results,
+    }
+    report["interpreter"].pop("stdout", None)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"📁 Startup report saved to {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,151 @@
+from collections import defaultdict
+import json
+from pathlib import Path
+import platform
+import tempfile
+import time
+
+import numpy as np
+import typer
+
+from ObjectMD.benchmarks.pipeline import StandInDetector, git_commit, make_synthetic_video
+from ObjectMD.config import REPORTS_DIR
+from ObjectMD.object_detection import DetectionStage, TrackingDetectionStage, get_model
+from ObjectMD.tracking import box_iou
+from ObjectMD.video_pipeline import run_stages
+
+DETECT_EVERY = [2, 4, 8, 16]
+IOU_THRESHOLD = 0.5
+VIDEO_OPTION = typer.Option(
+    None, help="Real video to run YOLO on; synthetic video + stand-in detector when omitted"
+)
+DETECT_EVERY_OPTION = typer.Option(DETECT_EVERY)
+
+app = typer.Typer()
+
+
+class SlowDetector:
+    """Wraps a detector and sleeps `delay_ms` per call, to emulate a heavier model."""
+
+    def __init__(self, model, delay_ms: float):
+        self.model = model
+        self.delay = delay_ms / 1000
+        self.names = model.names
+
+    def __call__(self, frames):
+        time.sleep(self.delay)
+        return self.model(frames)
+
+
+def by_frame(detections):
+    frames = defaultdict(list)
+    for det in detections:
+        frames[det["frame"]].append(det)
+    return frames
+
+
+def compare(reference, candidate, iou_threshold=IOU_THRESHOLD):
+    """Greedy per-frame, per-label IoU matching of `candidate` against `reference`."""
+    ref_frames, cand_frames = by_frame(reference), by_frame(candidate)
+    ious, matched = [], 0
+    for frame in set(ref_frames) | set(cand_frames):
+        pairs = sorted(
+            (
+                (box_iou(r["bbox"], c["bbox"]), i, j)
+                for i, r in enumerate(ref_frames[frame])
+                for j, c in enumerate(cand_frames[frame])
+                if r["label"] == c["label"]
+            ),
+            reverse=True,
+        )
+        used_ref, used_cand = set(), set()
+        for iou, i, j in pairs:
+            if i in used_ref or j in used_cand:
+                continue
+            used_ref.add(i)
+            used_cand.add(j)
+            ious.append(iou)
+            matched += iou >= iou_threshold
+    return {
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "recall": round(matched / len(reference), 4) if reference else None,
+        "precision": round(matched / len(candidate), 4) if candidate else None,
+    }
+
+
+def timed_run(video_path: Path, stage):
+    start = time.perf_counter()
+    results = run_stages(video_path, [stage])
+    elapsed = time.perf_counter() - start
+    if results is None:
+        raise typer.Exit(1)
+    return results[0], elapsed
+
+
+@app.command()
+def main(
+    video: Path | None = VIDEO_OPTION,
+    detect_every: list[int] = DETECT_EVERY_OPTION,
+    detector_ms: float = typer.Option(
+        0.0,
+        help="Extra latency per detector call, to emulate YOLO cost with the stand-in detector",
+    ),
+    output: Path = REPORTS_DIR / "benchmarks" / "tracking.json",
+):
+    """Accuracy vs speed of detect-then-track against full per-frame detection."""
+    with tempfile.TemporaryDirectory(prefix="objectmd-tracking-") as tmp:
+        output_dir = Path(tmp)
+        if video is None:
+            video_path = output_dir / "synthetic.mp4"
+            make_synthetic_video(video_path, 640, 480, 25, 20.0)
+            model = StandInDetector()
+        else:
+            video_path = video
+            model = get_model()
+        if detector_ms:
+            model = SlowDetector(model, detector_ms)
+
+        reference, ref_elapsed = timed_run(video_path, DetectionStage(None, model=model))
+        num_frames = len({det["frame"] for det in reference}) or 1
+        print(f"{'full detection':<16} {ref_elapsed:8.2f}s | {len(reference)} boxes")
+
+        runs = {}
+        for k in detect_every:
+            stage = TrackingDetectionStage(None, detect_every=k, model=model)
+            detections, elapsed = timed_run(video_path, stage)
+            runs[str(k)] = {
+                "elapsed": round(elapsed, 4),
+                "speedup": round(ref_elapsed / elapsed, 3),
+                "detector_calls": stage.detector_calls,
+                "tracked_boxes": sum(det["source"] == "track" for det in detections),
+                **compare(reference, detections),
+            }
+            summary = runs[str(k)]
+            print(
+                f"{f'detect every {k}':<16} {elapsed:8.2f}s | x{summary['speedup']:<6} | "
+                f"{stage.detector_calls} detector calls | mean IoU {summary['mean_iou']} | "
+                f"recall {summary['recall']} | precision {summary['precision']}"
+            )
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "video": str(video) if video is not None else "synthetic",
+        "detector_ms": detector_ms,
+        "iou_threshold": IOU_THRESHOLD,
+        "full_detection": {
+            "elapsed": round(ref_elapsed, 4),
+            "boxes": len(reference),
+            "frames_with_boxes": num_frames,
+        },
+        "detect_then_track": runs,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"📁 Tracking report saved to {output}")
+
+
+if __name__ == "__main__":
+    app()
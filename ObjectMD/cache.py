@@ -0,0 +1,164 @@
+from collections.abc import Iterable
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from ObjectMD.parallel import raise_failures, run_per_video
+
+# Manifests live next to the artifacts they describe
+CACHE_DIR = Path("data/processed/.cache")
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_stat(path: Path):
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Manifest-based skip-if-up-to-date cache for one pipeline stage.
+
+    An entry is up to date when the content hashes of its inputs, the stage
+    parameters and its own item parameters (settings that only concern that
+    one item) are unchanged since it was recorded, and its outputs still exist
+    untouched. File hashes are memoized by (size, mtime) so unchanged videos
+    are not re-read on every run.
+
+    The manifest is only read and written by the parent process: check and
+    record around `run_per_video`, never inside workers.
+    """
+
+    def __init__(
+        self, stage: str, params: dict, cache_dir: Path = CACHE_DIR, enabled: bool = True
+    ):
+        self.stage = stage
+        self.params = params
+        self.enabled = enabled
+        self.path = Path(cache_dir) / f"{stage}.json"
+        self.manifest = {"entries": {}, "hashes": {}}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                self.manifest = json.load(f)
+
+    def file_hash(self, path: Path) -> str:
+        key = str(path)
+        stat = file_stat(path)
+        memo = self.manifest["hashes"].get(key)
+        if memo and memo[:2] == stat:
+            return memo[2]
+        digest = hash_file(path)
+        self.manifest["hashes"][key] = stat + [digest]
+        return digest
+
+    def fingerprint(self, inputs: Iterable[Path], item_params: dict | None = None) -> str:
+        payload = {
+            "params": self.params,
+            "inputs": [[Path(p).name, self.file_hash(p)] for p in inputs],
+        }
+        if item_params is not None:
+            payload["item_params"] = item_params
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def is_up_to_date(
+        self,
+        name: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        item_params: dict | None = None,
+    ) -> bool:
+        if not self.enabled:
+            return False
+        entry = self.manifest["entries"].get(name)
+        if entry is None:
+            return False
+        for path in map(Path, outputs):
+            if not path.exists() or entry["outputs"].get(str(path)) != file_stat(path):
+                return False
+        return entry["fingerprint"] == self.fingerprint(inputs, item_params)
+
+    def record(
+        self,
+        name: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        item_params: dict | None = None,
+    ):
+        self.manifest["entries"][name] = {
+            "fingerprint": self.fingerprint(inputs, item_params),
+            "outputs": {str(path): file_stat(path) for path in outputs if Path(path).exists()},
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def item_params_of(params_fn, item):
+    return params_fn(item) if params_fn is not None else None
+
+
+def split_stale(cache: StageCache, items, name_fn, inputs_fn, outputs_fn, params_fn=None):
+    """Split `items` into (stale, fresh) according to `cache`."""
+    stale, fresh = [], []
+    for item in items:
+        name = name_fn(item)
+        if cache.is_up_to_date(
+            name, inputs_fn(item), outputs_fn(item), item_params_of(params_fn, item)
+        ):
+            fresh.append(item)
+        else:
+            stale.append(item)
+    return stale, fresh
+
+
+def record_results(
+    cache: StageCache, results: dict, name_fn, inputs_fn, outputs_fn, params_fn=None
+):
+    """Record every item of a `run_per_video` results dict whose result is not
+    None (i.e. that actually produced output), then save the manifest."""
+    for item, result in results.items():
+        if result is not None:
+            cache.record(
+                name_fn(item), inputs_fn(item), outputs_fn(item), item_params_of(params_fn, item)
+            )
+    cache.save()
+
+
+def run_cached(
+    cache: StageCache,
+    fn,
+    items,
+    name_fn,
+    inputs_fn,
+    outputs_fn,
+    workers: int = 1,
+    desc: str | None = None,
+    params_fn=None,
+):
+    """`run_per_video` over the items whose cache entry is stale, recording the
+    ones that succeed. `params_fn(item)` gives per-item parameters for its
+    fingerprint, so changing them reruns that item only. Returns
+    `(results, failures)` for the items that ran; if any failed, raises
+    `ItemsFailed` once the successes are recorded."""
+    stale, fresh = split_stale(cache, items, name_fn, inputs_fn, outputs_fn, params_fn)
+    if fresh:
+        print(f"⏭️ {len(fresh)} up to date, {len(stale)} to process")
+    results, failures = run_per_video(
+        fn, stale, workers=workers, desc=desc, metrics=cache.stage, name_fn=name_fn
+    )
+    record_results(cache, results, name_fn, inputs_fn, outputs_fn, params_fn)
+    raise_failures(failures)
+    return results, failures
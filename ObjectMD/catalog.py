@@ -0,0 +1,223 @@
+from collections import defaultdict
+import json
+import os
+from pathlib import Path
+
+from tqdm import tqdm
+import typer
+
+RAW_DATA_DIR = Path("data/raw")
+CATALOG_PATH = Path("data/processed/catalog.json")
+LABELS_PATH = Path("data/processed/labels.json")
+VIDEO_SUFFIX = ".mp4"
+CATALOG_VERSION = 2  # catalogs saved with another version are rebuilt
+
+app = typer.Typer()
+
+
+def probe_video(path: Path) -> dict | None:
+    """fps, frame count, resolution and duration from the container header."""
+    from ObjectMD.video_pipeline import open_video
+
+    cap, info = open_video(path)
+    if cap is None:
+        return None
+    cap.release()
+    return {
+        "fps": info.fps,
+        "frame_count": info.frame_count,
+        "width": info.width,
+        "height": info.height,
+        "duration": round(info.frame_count / info.fps, 3) if info.fps else None,
+    }
+
+
+class VideoCatalog:
+    """Persistent index of the raw videos: name -> path, stream metadata and
+    label entries (every entry of the labels file for that video, one per
+    labeled action), saved in `catalog_path`.
+
+    `refresh` only lists directories whose mtime changed since the last
+    refresh (adding, removing or renaming a file changes its directory's
+    mtime), and only probes videos that are new or whose size/mtime changed.
+    Files edited in place don't touch their directory, so `verify=True`
+    stats every known video as well. Labels are re-attached whenever the
+    labels file changes.
+
+    Like the stage caches, the catalog is only read and written by the parent
+    process.
+    """
+
+    def __init__(
+        self,
+        root: Path = RAW_DATA_DIR,
+        catalog_path: Path = CATALOG_PATH,
+        labels_path: Path = LABELS_PATH,
+    ):
+        self.root = Path(root)
+        self.catalog_path = Path(catalog_path)
+        self.labels_path = Path(labels_path)
+        self.data = {
+            "version": CATALOG_VERSION,
+            "root": str(self.root),
+            "dirs": {},
+            "videos": {},
+            "labels_mtime": None,
+        }
+        if self.catalog_path.exists():
+            with open(self.catalog_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION and data.get("root") == str(self.root):
+                self.data = data
+        self.changed = False
+
+    @property
+    def videos(self) -> dict[str, dict]:
+        return self.data["videos"]
+
+    # === REFRESH ===
+    def scan_dir(self, rel_dir: str, seen_dirs, found_files, listed_files):
+        """Walk `rel_dir`, re-listing only the directories whose mtime changed
+        (their files are also added to `listed_files`)."""
+        path = self.root / rel_dir
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        cached = self.data["dirs"].get(rel_dir)
+        if cached is None or cached["mtime_ns"] != mtime:
+            subdirs, files = [], []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    rel_path = str(Path(rel_dir) / entry.name) if rel_dir else entry.name
+                    if entry.is_dir():
+                        subdirs.append(rel_path)
+                    elif entry.name.endswith(VIDEO_SUFFIX):
+                        files.append(rel_path)
+            cached = {"mtime_ns": mtime, "dirs": sorted(subdirs), "files": sorted(files)}
+            self.data["dirs"][rel_dir] = cached
+            self.changed = True
+            listed_files.update(files)
+        seen_dirs.add(rel_dir)
+        found_files.extend(cached["files"])
+        for subdir in cached["dirs"]:
+            self.scan_dir(subdir, seen_dirs, found_files, listed_files)
+
+    def refresh(self, verify: bool = False) -> "VideoCatalog":
+        seen_dirs, found_files, listed_files = set(), [], set()
+        self.scan_dir("", seen_dirs, found_files, listed_files)
+        for rel_dir in set(self.data["dirs"]) - seen_dirs:
+            del self.data["dirs"][rel_dir]
+            self.changed = True
+
+        known = {entry["path"]: name for name, entry in self.videos.items()}
+        found = set(found_files)
+        for rel_path, name in known.items():
+            if rel_path not in found:
+                del self.videos[name]
+                self.changed = True
+
+        to_probe, kept = [], {}
+        for rel_path in found_files:
+            name = Path(rel_path).name
+            entry = self.videos.get(name)
+            # The first path seen keeps the name, also when both are new in this refresh
+            kept_path = kept.setdefault(name, entry["path"] if entry is not None else rel_path)
+            if kept_path != rel_path:
+                print(f"⚠️ Duplicate video name {name}: keeping {kept_path}, ignoring {rel_path}")
+                continue
+            if entry is None or verify or rel_path in listed_files:
+                stat = (self.root / rel_path).stat()
+                if entry is None or entry["stat"] != [stat.st_size, stat.st_mtime_ns]:
+                    to_probe.append((rel_path, [stat.st_size, stat.st_mtime_ns]))
+
+        for rel_path, stat in tqdm(to_probe, desc="Probing videos", disable=not to_probe):
+            metadata = probe_video(self.root / rel_path)
+            if metadata is None:
+                print(f"⚠️ Failed to open {rel_path}")
+            self.videos[Path(rel_path).name] = {
+                "path": rel_path,
+                "stat": stat,
+                **(metadata or {}),
+                "labels": [],
+            }
+            self.changed = True
+
+        self.attach_labels(force=bool(to_probe))
+        return self
+
+    def attach_labels(self, force: bool = False):
+        labels_mtime = self.labels_path.stat().st_mtime_ns if self.labels_path.exists() else None
+        if not force and labels_mtime == self.data["labels_mtime"]:
+            return
+        labels = defaultdict(list)
+        if labels_mtime is not None:
+            with open(self.labels_path, "r") as f:
+                for label in json.load(f):
+                    labels[label["video"]].append(label)
+        for name, entry in self.videos.items():
+            entry["labels"] = labels.get(name, [])
+        self.data["labels_mtime"] = labels_mtime
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        self.catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.catalog_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.catalog_path)
+        self.changed = False
+
+    # === QUERIES ===
+    def get(self, name: str) -> dict | None:
+        """Entry for a video file name (e.g. "x.mp4"), or None."""
+        return self.videos.get(name)
+
+    def path_of(self, name: str) -> Path | None:
+        entry = self.get(name)
+        return self.root / entry["path"] if entry is not None else None
+
+    def paths(self, labeled_only: bool = False) -> list[Path]:
+        return sorted(
+            self.root / entry["path"]
+            for entry in self.videos.values()
+            if entry["labels"] or not labeled_only
+        )
+
+    def fps_of(self, name: str) -> float | None:
+        entry = self.get(name)
+        return entry.get("fps") if entry is not None else None
+
+
+def load_catalog(root: Path = RAW_DATA_DIR, verify: bool = False) -> VideoCatalog:
+    """The refreshed (and saved) catalog of `root`."""
+    catalog = VideoCatalog(root).refresh(verify)
+    catalog.save()
+    return catalog
+
+
+def list_videos(labeled_only: bool = False) -> list[str]:
+    """Raw video paths from the refreshed catalog, as the stages used to glob them."""
+    return [str(path) for path in load_catalog().paths(labeled_only)]
+
+
+@app.command()
+def main(
+    verify: bool = typer.Option(
+        False, help="Also stat every known video, to catch files replaced in place"
+    ),
+    rebuild: bool = typer.Option(False, help="Drop the catalog and scan from scratch"),
+):
+    """Build or refresh the catalog of raw videos."""
+    if rebuild:
+        CATALOG_PATH.unlink(missing_ok=True)
+    catalog = load_catalog(verify=verify)
+    labeled = sum(bool(entry["labels"]) for entry in catalog.videos.values())
+    hours = sum(entry.get("duration") or 0 for entry in catalog.videos.values()) / 3600
+    print(f"✅ {len(catalog.videos)} videos ({labeled} labeled, {hours:.1f} h) in {CATALOG_PATH}")
+
+
+if __name__ == "__main__":
+    app()
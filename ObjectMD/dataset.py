@@ -1,6 +1,9 @@
 import json
 from pathlib import Path
-from typing import List
+
+import typer
+
+from ObjectMD.catalog import load_catalog
 
 # Configurable paths
 RAW_DATA_DIR = Path("data/raw")
@@ -8,22 +11,25 @@ PROCESSED_DATA_DIR = Path("data/processed")
 LABELS_FILE = RAW_DATA_DIR / "annotations.json"
 CLEANED_LABELS_FILE = PROCESSED_DATA_DIR / "labels.json"
 
-# 1. Gather all video filenames from all 6 folders
-def collect_all_video_files() -> List[str]:
-    video_files = []
-    for folder in RAW_DATA_DIR.iterdir():
-        if folder.is_dir():
-            for file in folder.glob("*.mp4"):
-                video_files.append(file.name)
-    return video_files
+app = typer.Typer()
+
+
+# 1. Gather all video filenames from all 6 folders (the catalog's videos one
+#    folder below data/raw, as the folder scan found them)
+def collect_all_video_files() -> set[str]:
+    catalog = load_catalog(RAW_DATA_DIR)
+    return {name for name, entry in catalog.videos.items() if len(Path(entry["path"]).parts) == 2}
+
 
 # 2. Load the original label file
 def load_labels():
     with open(LABELS_FILE, "r") as f:
         return json.load(f)
 
+
 # 3. Filter labels whose video files exist
 def filter_valid_labels(labels, valid_video_names):
+    valid_video_names = set(valid_video_names)  # O(1) lookups per label entry
     valid_labels = []
     missing_videos = []
 
@@ -36,13 +42,16 @@ def filter_valid_labels(labels, valid_video_names):
 
     return valid_labels, missing_videos
 
+
 # 4. Save the cleaned labels
 def save_cleaned_labels(labels):
     PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
     with open(CLEANED_LABELS_FILE, "w") as f:
         json.dump(labels, f, indent=4)
 
+
 # 5. Main function
+@app.command()
 def main():
     print("🔍 Scanning for video files...")
     valid_videos = collect_all_video_files()
@@ -67,5 +76,6 @@ def main():
         for m in missing:
             print(f" - {m}")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
@@ -0,0 +1,253 @@
+from functools import partial
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import typer
+
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.catalog import load_catalog
+from ObjectMD.metrics import count, timer
+from ObjectMD.storage import FEATURE_FORMATS, glob_artifacts, load_features, video_name_of
+
+# === CONFIG ===
+FEATURES_DIR = Path("data/processed/features")
+PREDICTIONS_DIR = Path("data/processed/predictions")
+EVENTS_DIR = Path("data/processed/events")
+DEFAULT_FPS = 30  # only for videos missing from the catalog
+
+# Per source: (directory, file prefix, formats, enter and exit thresholds).
+# Features are scored by box-center speed (normalized units per second, as in
+# streaming), predictions by their is_moving probability.
+SOURCES = {
+    "features": (FEATURES_DIR, "features_", FEATURE_FORMATS, 0.05, 0.03),
+    "predictions": (PREDICTIONS_DIR, "predictions_", ("csv",), 0.6, 0.4),
+}
+SMOOTHING = 0.5  # EMA weight of the newest score sample
+MIN_DURATION_S = 0.5  # shorter events are dropped
+MERGE_GAP_S = 1.0  # events closer than this are merged
+
+app = typer.Typer()
+
+
+class EventSegmenter:
+    """Turns a per-frame score into movement events, online, with O(1) work and
+    state per sample.
+
+    The score is smoothed with an EMA. An event opens when the smoothed score
+    reaches `enter_threshold` and closes when it drops below `exit_threshold`
+    (hysteresis), or when no sample arrives for `merge_gap_s`. A closed event
+    is held back for `merge_gap_s` so that an event opening within the gap
+    extends it; once the gap has passed it is emitted if it lasted at least
+    `min_duration_s`.
+
+    `confidence` is the share of the event's samples whose smoothed score was
+    at or above `enter_threshold`.
+    """
+
+    def __init__(
+        self,
+        enter_threshold: float,
+        exit_threshold: float,
+        smoothing: float = SMOOTHING,
+        min_duration_s: float = MIN_DURATION_S,
+        merge_gap_s: float = MERGE_GAP_S,
+        video=None,
+    ):
+        if exit_threshold > enter_threshold:
+            raise ValueError(
+                f"exit threshold {exit_threshold} is above enter threshold {enter_threshold}"
+            )
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.smoothing = smoothing
+        self.min_duration_s = min_duration_s
+        self.merge_gap_s = merge_gap_s
+        self.video = video
+        self.smoothed = None
+        self.last_time = None
+        self.open = None  # event being extended
+        self.pending = None  # closed event that may still merge with the next one
+
+    def update(self, time_s: float, score: float, frame=None):
+        """Feeds one sample; returns the events it finalizes (usually none)."""
+        if math.isnan(score):
+            return []
+        events = []
+        if self.last_time is not None and time_s - self.last_time > self.merge_gap_s:
+            self.smoothed = None
+            self.close()
+        if self.pending is not None and time_s - self.pending["end_s"] > self.merge_gap_s:
+            events.extend(self.emit_pending())
+
+        if self.smoothed is None:
+            self.smoothed = score
+        else:
+            self.smoothed = self.smoothing * score + (1 - self.smoothing) * self.smoothed
+        self.last_time = time_s
+
+        threshold = self.exit_threshold if self.open is not None else self.enter_threshold
+        if self.smoothed >= threshold:
+            if self.open is None:
+                self.open = self.pending or {
+                    "start_s": time_s,
+                    "start_frame": frame,
+                    "samples": 0,
+                    "strong": 0,
+                    "score_sum": 0.0,
+                    "peak": self.smoothed,
+                }
+                self.pending = None
+            event = self.open
+            event["end_s"], event["end_frame"] = time_s, frame
+            event["samples"] += 1
+            event["strong"] += self.smoothed >= self.enter_threshold
+            event["score_sum"] += self.smoothed
+            event["peak"] = max(event["peak"], self.smoothed)
+        elif self.open is not None:
+            self.close()
+        return events
+
+    def close(self):
+        if self.open is not None:
+            self.pending, self.open = self.open, None
+
+    def emit_pending(self):
+        event, self.pending = self.pending, None
+        if event["end_s"] - event["start_s"] < self.min_duration_s:
+            return []
+        return [self.record(event)]
+
+    def finish(self):
+        """Closes the stream; returns the events still held back."""
+        self.close()
+        return self.emit_pending() if self.pending is not None else []
+
+    def record(self, event):
+        return {
+            "video": self.video,
+            "start_frame": event["start_frame"],
+            "end_frame": event["end_frame"],
+            "start_s": round(event["start_s"], 3),
+            "end_s": round(event["end_s"], 3),
+            "duration_s": round(event["end_s"] - event["start_s"], 3),
+            "confidence": round(event["strong"] / event["samples"], 3),
+            "mean_score": round(event["score_sum"] / event["samples"], 5),
+            "peak_score": round(event["peak"], 5),
+        }
+
+
+def segmenter_for(source: str, video=None, **kwargs) -> EventSegmenter:
+    """EventSegmenter with the default thresholds of a source ("features" or
+    "predictions"); keyword arguments override them."""
+    _, _, _, enter_threshold, exit_threshold = SOURCES[source]
+    return EventSegmenter(
+        **{
+            "enter_threshold": enter_threshold,
+            "exit_threshold": exit_threshold,
+            "video": video,
+            **kwargs,
+        }
+    )
+
+
+# === BATCH ===
+def frame_scores(df, source: str, fps: float):
+    """Per-frame `(frames, times, scores)` of one feature or prediction table,
+    sorted by frame. Frames with several rows (one per tracked box) keep the
+    highest probability or the fastest box."""
+    if source == "predictions":
+        per_frame = df.groupby("frame", sort=True)["probability"].max()
+    else:
+        if "track_id" not in df.columns:
+            df = df.drop_duplicates("frame").assign(track_id=0)
+        df = df.sort_values(["track_id", "frame"], kind="stable")
+        tracks = df.groupby("track_id", sort=False)
+        step = np.hypot(tracks["box_cx"].diff(), tracks["box_cy"].diff())
+        speed = (step / (tracks["frame"].diff() / fps)).fillna(0.0)
+        per_frame = speed.groupby(df["frame"]).max().sort_index()
+    frames = per_frame.index.to_numpy(dtype=np.int64)
+    scores = per_frame.to_numpy(dtype=np.float64)
+    return frames, frames / fps, scores
+
+
+def segment(frames, times, scores, segmenter: EventSegmenter):
+    events = []
+    for frame, time_s, score in zip(frames.tolist(), times.tolist(), scores.tolist()):
+        events.extend(segmenter.update(time_s, score, frame))
+    return events + segmenter.finish()
+
+
+def events_path(output_dir: Path, video_name: str) -> Path:
+    return Path(output_dir) / f"events_{video_name}.json"
+
+
+def fps_of(video_fps, video_name: str) -> float:
+    """The fps frames of `video_name` are converted to seconds with."""
+    return video_fps.get(video_name) or DEFAULT_FPS
+
+
+def segment_file(path: Path, source: str, video_fps, output_dir=EVENTS_DIR, **kwargs):
+    """Writes the events of one feature or prediction file; returns how many."""
+    video_name = video_name_of(path)
+    fps = fps_of(video_fps, video_name)
+    with timer("deserialize"):
+        df = load_features(path)
+    events = []
+    if len(df):
+        with timer("segment"):
+            frames, times, scores = frame_scores(df, source, fps)
+            events = segment(
+                frames, times, scores, segmenter_for(source, video=video_name, **kwargs)
+            )
+        count("frames", len(frames))
+    count("events", len(events))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with timer("serialize"), open(events_path(output_dir, video_name), "w") as f:
+        json.dump(events, f, indent=2)
+    print(f"{video_name}: {len(events)} movement event(s)")
+    return len(events)
+
+
+@app.command()
+def main(
+    source: str = "features",
+    enter_threshold: float | None = None,
+    exit_threshold: float | None = None,
+    min_duration_s: float = MIN_DURATION_S,
+    merge_gap_s: float = MERGE_GAP_S,
+    workers: int = 1,
+    force: bool = False,
+):
+    """Segment every feature (or prediction) file into movement events."""
+    if source not in SOURCES:
+        raise typer.BadParameter(f"source must be one of {sorted(SOURCES)}")
+    input_dir, prefix, formats, default_enter, default_exit = SOURCES[source]
+    settings = {
+        "enter_threshold": default_enter if enter_threshold is None else enter_threshold,
+        "exit_threshold": default_exit if exit_threshold is None else exit_threshold,
+        "min_duration_s": min_duration_s,
+        "merge_gap_s": merge_gap_s,
+    }
+
+    catalog = load_catalog()
+    video_fps = {Path(name).stem: entry.get("fps") for name, entry in catalog.videos.items()}
+    paths = glob_artifacts(input_dir, f"{prefix}*", formats)
+    run_cached(
+        StageCache(f"events_{source}", {"smoothing": SMOOTHING, **settings}, enabled=not force),
+        partial(segment_file, source=source, video_fps=video_fps, **settings),
+        paths,
+        name_fn=video_name_of,
+        inputs_fn=lambda path: [path],
+        outputs_fn=lambda path: [events_path(EVENTS_DIR, video_name_of(path))],
+        workers=workers,
+        desc="Segmenting events",
+        # Event times depend on the video's fps: resegment a video once it's known or changes
+        params_fn=lambda path: {"fps": fps_of(video_fps, video_name_of(path))},
+    )
+    print(f"✅ Movement events saved to {EVENTS_DIR}")
+
+
+if __name__ == "__main__":
+    app()
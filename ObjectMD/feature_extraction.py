@@ -1,187 +1,321 @@
+from functools import partial
 import json
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
+import typer
+
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.metrics import count, timer
+from ObjectMD.storage import (
+    POSE_FORMATS,
+    detections_to_frame,
+    features_path,
+    find_detections,
+    glob_artifacts,
+    load_detections,
+    load_pose,
+    pose_to_frame,
+    save_features,
+    video_name_of,
+)
+from ObjectMD.tracking import MAX_TRACK_AGE, assign_track_ids
 
 # === CONFIG ===
 POSE_DIR = Path("data/processed/pose_data")
 BOX_DIR = Path("data/processed/objects")
 LABEL_FILE = Path("data/processed/labels.json")  # optional
 OUTPUT_DIR = Path("data/processed/features")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Frame size assumed for detections saved without their source frame size
 IMAGE_WIDTH = 640
 IMAGE_HEIGHT = 480
+OUTPUT_FORMAT = "csv"  # csv, parquet or npz
+
+app = typer.Typer()
+
 
 # === HELPERS ===
 def load_json(path):
     with open(path, "r") as f:
         return json.load(f)
 
+
 def euclidean(p1, p2):
     return np.linalg.norm(np.array(p1) - np.array(p2))
 
-def normalize_coordinates(x, y):
+
+def normalize_coordinates(x, y, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
     """Normalize pixel coordinates to 0-1 range"""
-    return x / IMAGE_WIDTH, y / IMAGE_HEIGHT
+    return x / width, y / height
+
 
-def normalize_dimensions(w, h):
+def normalize_dimensions(w, h, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
     """Normalize width and height to 0-1 range"""
-    return w / IMAGE_WIDTH, h / IMAGE_HEIGHT
+    return w / width, h / height
+
 
-def compute_box_center(bbox):
-    """Compute box center and dimensions in pixel space, then normalize"""
+def compute_box_center(bbox, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    """Compute box center and dimensions in pixel space, then normalize by the
+    size of the frame the bbox was detected in"""
     x1, y1, x2, y2 = bbox
     cx = (x1 + x2) / 2
     cy = (y1 + y2) / 2
     w = x2 - x1
     h = y2 - y1
-    
+
     # Normalize all values
-    cx_norm, cy_norm = normalize_coordinates(cx, cy)
-    w_norm, h_norm = normalize_dimensions(w, h)
-    
+    cx_norm, cy_norm = normalize_coordinates(cx, cy, width, height)
+    w_norm, h_norm = normalize_dimensions(w, h, width, height)
+
     return cx_norm, cy_norm, w_norm, h_norm
 
+
+FEATURE_COLUMNS = [
+    "frame",
+    "track_id",
+    "box_cx",
+    "box_cy",
+    "box_w",
+    "box_h",
+    "box_dx",
+    "box_dy",
+    "left_wrist_x",
+    "left_wrist_y",
+    "right_wrist_x",
+    "right_wrist_y",
+    "dist_left_to_box",
+    "dist_right_to_box",
+    "min_hand_dist",
+    "nearest_hand",
+    "is_hand_target",
+]
+NO_HAND, LEFT_HAND, RIGHT_HAND = -1, 0, 1  # values of nearest_hand
+
+
+def row_distances(x1, y1, x2, y2):
+    """Row-wise euclidean distance between two point arrays.
+
+    Uses a batched dot product so every row goes through the same kernel as
+    `euclidean` (np.linalg.norm) and gives bit-identical results.
+    """
+    d = np.stack([x1 - x2, y1 - y2], axis=1)
+    return np.sqrt((d[:, None, :] @ d[:, :, None])[:, 0, 0])
+
+
+def normalize_wrists(x, y, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    """Wrist columns in normalized space; a wrist missing either coordinate is NaN.
+    Wrists that look like pixel coordinates (>1) are normalized by the frame
+    size (scalars or one value per row)."""
+    missing = np.isnan(x) | np.isnan(y)
+    pixel = (x > 1) | (y > 1)
+    x = np.where(missing, np.nan, np.where(pixel, x / width, x))
+    y = np.where(missing, np.nan, np.where(pixel, y / height, y))
+    return x, y
+
+
+def track_deltas(track_ids, frames, cx, cy):
+    """Box-center motion of every row relative to the previous row of the same
+    track (0 for the first box of a track)."""
+    order = np.lexsort((frames, track_ids))
+    same_track = np.diff(track_ids[order], prepend=-1) == 0
+    dx, dy = np.zeros(len(cx)), np.zeros(len(cy))
+    dx[order] = np.where(same_track, np.diff(cx[order], prepend=0.0), 0.0)
+    dy[order] = np.where(same_track, np.diff(cy[order], prepend=0.0), 0.0)
+    return dx, dy
+
+
+def nearest_hand(dist_left, dist_right):
+    """Which wrist is closer to each box: LEFT_HAND, RIGHT_HAND or NO_HAND."""
+    return np.where(
+        np.isnan(dist_left) & np.isnan(dist_right),
+        NO_HAND,
+        np.where(np.isnan(dist_right) | (dist_left <= dist_right), LEFT_HAND, RIGHT_HAND),
+    ).astype(np.int8)
+
+
+def hand_targets(frames, dist_left, dist_right):
+    """1 for the boxes that are the closest one of their frame to a wrist."""
+    distances = pd.DataFrame({"frame": frames, "left": dist_left, "right": dist_right})
+    closest = distances.groupby("frame")[["left", "right"]].transform("min")
+    target = (dist_left == closest["left"].to_numpy()) | (
+        dist_right == closest["right"].to_numpy()
+    )
+    return target.astype(np.int8)
+
+
+def source_dimensions(boxes):
+    """Per-row source frame size of a detection table; IMAGE_WIDTH x IMAGE_HEIGHT
+    where it was not recorded."""
+    sizes = []
+    for column, default in (("image_width", IMAGE_WIDTH), ("image_height", IMAGE_HEIGHT)):
+        size = (
+            boxes[column].to_numpy(dtype=np.float64)
+            if column in boxes.columns
+            else np.zeros(len(boxes))
+        )
+        sizes.append(np.where(size > 0, size, default))
+    return sizes
+
+
+def pose_table(pose_data):
+    """Pose output (legacy {"frames": [...]} dict or storage DataFrame) as columns."""
+    if isinstance(pose_data, dict):
+        return pose_to_frame(pose_data.get("frames", []), float_dtype=np.float64)
+    return pose_data
+
+
+def box_table(box_data):
+    """Detections (legacy list of dicts or storage DataFrame) as columns."""
+    if isinstance(box_data, pd.DataFrame):
+        return box_data
+    return detections_to_frame(box_data, float_dtype=np.float64)
+
+
 def extract_features(pose_data, box_data):
-    features = []
-    last_cx, last_cy = None, None
-    
+    """One feature row per detection, joined with the pose of the same frame.
+
+    Detections are linked across frames into tracks (`track_id`), so box
+    motion is measured per object even when several boxes are in view.
+
+    Accepts the legacy JSON structures or the DataFrames from `ObjectMD.storage`.
+    """
+    pose = pose_table(pose_data)
+    boxes = box_table(box_data)
+
     print(f"Processing {len(box_data)} frames")
-    
-    # Extract frames data from pose_data
-    pose_frames = pose_data.get('frames', [])
-    print(f"Pose frames available: {len(pose_frames)}")
-    
-    # Create a lookup dictionary for pose frames by frame_index
-    pose_lookup = {}
-    for pose_frame in pose_frames:
-        frame_idx = pose_frame.get('frame_index')
-        if frame_idx is not None:
-            pose_lookup[frame_idx] = pose_frame
-    
-    print(f"Pose lookup created for frames: {sorted(pose_lookup.keys())[:10]}...")  # Show first 10
-    
-    for box_frame in box_data:
-        frame_idx = box_frame.get('frame')
-        
-        if frame_idx is None:
-            print(f"Warning: Box frame missing 'frame' key: {box_frame}")
-            continue
-        
-        # Look for pose data for this frame
-        pose_frame = pose_lookup.get(frame_idx, {})
-        
-        if not box_frame.get("bbox"):
-            print(f"Frame {frame_idx}: No bbox found")
-            continue
-
-        # Box info - compute normalized center and dimensions
-        bbox = box_frame["bbox"]
-        cx, cy, w, h = compute_box_center(bbox)
-
-        # Box motion
-        if last_cx is not None:
-            dx = cx - last_cx
-            dy = cy - last_cy
-        else:
-            dx = dy = 0
-        last_cx, last_cy = cx, cy
-
-        # Wrist positions
-        lw = pose_frame.get("left_wrist")
-        rw = pose_frame.get("right_wrist")
-
-        # Process left wrist
-        if lw and len(lw) >= 2 and lw[0] is not None and lw[1] is not None:
-            lwx, lwy = lw[0], lw[1]
-            # If coordinates seem to be in pixel space (>1), normalize them
-            if lwx > 1 or lwy > 1:
-                lwx, lwy = normalize_coordinates(lwx, lwy)
-        else:
-            lwx = lwy = np.nan
-
-        # Process right wrist
-        if rw and len(rw) >= 2 and rw[0] is not None and rw[1] is not None:
-            rwx, rwy = rw[0], rw[1]
-            # If coordinates seem to be in pixel space (>1), normalize them
-            if rwx > 1 or rwy > 1:
-                rwx, rwy = normalize_coordinates(rwx, rwy)
-        else:
-            rwx = rwy = np.nan
-
-        # Debug print for first few frames
-        if frame_idx < 3:
-            print(f"Frame {frame_idx}:")
-            print(f"  Box center: ({cx:.3f}, {cy:.3f})")
-            print(f"  Pose frame found: {bool(pose_frame)}")
-            print(f"  Pose frame keys: {list(pose_frame.keys()) if pose_frame else 'None'}")
-            print(f"  Left wrist raw: {lw}")
-            print(f"  Right wrist raw: {rw}")
-            print(f"  Left wrist processed: ({lwx}, {lwy})")
-            print(f"  Right wrist processed: ({rwx}, {rwy})")
-
-        # Distances (now both coordinates are in same normalized space)
-        dist_left = euclidean([lwx, lwy], [cx, cy]) if not np.isnan(lwx) else np.nan
-        dist_right = euclidean([rwx, rwy], [cx, cy]) if not np.isnan(rwx) else np.nan
-        min_dist = np.nanmin([dist_left, dist_right])
-
-        features.append({
-            "frame": frame_idx,
-            "box_cx": cx,
-            "box_cy": cy,
-            "box_w": w,
-            "box_h": h,
-            "box_dx": dx,
-            "box_dy": dy,
-            "left_wrist_x": lwx,
-            "left_wrist_y": lwy,
-            "right_wrist_x": rwx,
-            "right_wrist_y": rwy,
-            "dist_left_to_box": dist_left,
-            "dist_right_to_box": dist_right,
-            "min_hand_dist": min_dist
-        })
-
-    return pd.DataFrame(features)
+    print(f"Pose frames available: {len(pose)}")
+
+    if len(boxes) < len(box_data):
+        print(f"Skipped {len(box_data) - len(boxes)} detections without frame or bbox")
+    if len(boxes) == 0:
+        return pd.DataFrame()
+
+    # Box info - compute normalized center and dimensions
+    frames = boxes["frame"].to_numpy(dtype=np.int64)
+    x1, y1, x2, y2 = (boxes[c].to_numpy() for c in ("x1", "y1", "x2", "y2"))
+    width, height = source_dimensions(boxes)
+    cx, cy, w, h = compute_box_center((x1, y1, x2, y2), width, height)
+
+    # Box motion relative to the previous box of the same track
+    track_ids = assign_track_ids(frames, np.stack([x1, y1, x2, y2], axis=1))
+    dx, dy = track_deltas(track_ids, frames, cx, cy)
+
+    # Join wrist positions on frame index (last pose entry wins for duplicates)
+    wrist_columns = ["left_wrist_x", "left_wrist_y", "right_wrist_x", "right_wrist_y"]
+    pose = pose.drop_duplicates("frame_index", keep="last").set_index("frame_index")
+    wrists = pose[wrist_columns].astype(np.float64).reindex(frames).to_numpy()
+
+    # Pixel wrists come from the same source frame as the box on their row
+    lwx, lwy = normalize_wrists(wrists[:, 0], wrists[:, 1], width, height)
+    rwx, rwy = normalize_wrists(wrists[:, 2], wrists[:, 3], width, height)
+
+    # Distances (now both coordinates are in same normalized space)
+    dist_left = row_distances(lwx, lwy, cx, cy)
+    dist_right = row_distances(rwx, rwy, cx, cy)
+    min_dist = np.fmin(dist_left, dist_right)
+    nearest = nearest_hand(dist_left, dist_right)
+    is_hand_target = hand_targets(frames, dist_left, dist_right)
+
+    return pd.DataFrame(
+        dict(
+            zip(
+                FEATURE_COLUMNS,
+                [
+                    frames,
+                    track_ids,
+                    cx,
+                    cy,
+                    w,
+                    h,
+                    dx,
+                    dy,
+                    lwx,
+                    lwy,
+                    rwx,
+                    rwy,
+                    dist_left,
+                    dist_right,
+                    min_dist,
+                    nearest,
+                    is_hand_target,
+                ],
+            )
+        )
+    )
+
 
 # === MAIN ===
-pose_files = sorted(POSE_DIR.glob("*_pose.json"))
+def extract_features_for_video(pose_file: Path, output_format=OUTPUT_FORMAT):
+    """Extracts and saves features for one video; returns the number of rows saved."""
+    video_name = video_name_of(pose_file)
+    box_file = find_detections(BOX_DIR, video_name)
 
-for pose_file in tqdm(pose_files, desc="Extracting features"):
-    video_name = pose_file.stem.replace("_pose", "")
-    box_file = BOX_DIR / f"detections_{video_name}.json"
-    
-    if not box_file.exists():
+    if box_file is None:
         print(f"Skipping {video_name}: box file not found")
-        continue
+        return None
 
     print(f"\nProcessing {video_name}")
-    
-    pose_data = load_json(pose_file)
-    box_data = load_json(box_file)
-    
-    print(f"Pose data structure: {type(pose_data)}")
-    print(f"Pose data keys: {list(pose_data.keys())}")
+
+    with timer("deserialize"):
+        pose_data = load_pose(pose_file)
+        box_data = load_detections(box_file)
+
+    print(f"Pose data columns: {list(pose_data.columns)}")
     print(f"Box data length: {len(box_data)}")
 
-    df = extract_features(pose_data, box_data)
-    
-    # Check if we got any valid data
+    with timer("features"):
+        df = extract_features(pose_data, box_data)
+    count("feature_rows", len(df))
+
+    # Check if we got any valid data; an empty file still marks the video as done
     if len(df) == 0:
         print(f"Warning: No features extracted for {video_name}")
-        continue
-    
-    # Print summary of extracted features
-    print(f"Extracted {len(df)} feature rows")
-    print(f"Valid left wrist positions: {df['left_wrist_x'].notna().sum()}")
-    print(f"Valid right wrist positions: {df['right_wrist_x'].notna().sum()}")
-    
+        df = pd.DataFrame(columns=FEATURE_COLUMNS)
+    else:
+        # Print summary of extracted features
+        print(f"Extracted {len(df)} feature rows")
+        print(f"Valid left wrist positions: {df['left_wrist_x'].notna().sum()}")
+        print(f"Valid right wrist positions: {df['right_wrist_x'].notna().sum()}")
+
     # Save the features
-    output_file = OUTPUT_DIR / f"features_{video_name}.csv"
-    df.to_csv(output_file, index=False)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = features_path(OUTPUT_DIR, video_name, output_format)
+    with timer("serialize"):
+        save_features(df, output_file)
     print(f"Saved to {output_file}")
+    return len(df)
+
+
+def features_inputs(pose_file: Path):
+    box_file = find_detections(BOX_DIR, video_name_of(pose_file))
+    return [pose_file] + ([box_file] if box_file is not None else [])
+
+
+@app.command()
+def main(workers: int = 1, output_format: str = OUTPUT_FORMAT, force: bool = False):
+    pose_files = glob_artifacts(POSE_DIR, "*_pose", POSE_FORMATS)
+    params = {
+        "image_width": IMAGE_WIDTH,
+        "image_height": IMAGE_HEIGHT,
+        "output_format": output_format,
+        "max_track_age": MAX_TRACK_AGE,
+    }
+    run_cached(
+        StageCache("features", params, enabled=not force),
+        partial(extract_features_for_video, output_format=output_format),
+        pose_files,
+        name_fn=video_name_of,
+        inputs_fn=features_inputs,
+        outputs_fn=lambda pose_file: [
+            features_path(OUTPUT_DIR, video_name_of(pose_file), output_format)
+        ],
+        workers=workers,
+        desc="Extracting features",
+    )
+    print("✅ Feature extraction complete.")
+
 
-print("✅ Feature extraction complete.")
\ No newline at end of file
+if __name__ == "__main__":
+    app()
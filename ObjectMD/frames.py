@@ -1,66 +1,294 @@
 # src/data/extract_frames.py
 
+from contextlib import suppress
+from functools import partial
 import json
+import os
 from pathlib import Path
 
-import cv2
-from tqdm import tqdm
+import numpy as np
+import typer
+
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.catalog import load_catalog
+from ObjectMD.metrics import count, timer
+from ObjectMD.video_pipeline import AsyncWriter, FrameStage, run_stages, sampling_stride
 
 # --- Configuration ---
 VIDEOS_DIR = Path("data/raw")
-LABELS_PATH = Path("data/processed/labels.json")
 OUTPUT_DIR = Path("data/processed/frames")
 FPS = 5  # frames per second to extract
 
-def extract_frames_from_video(video_path: Path, output_folder: Path, fps: int):
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        print(f"⚠️ Failed to open {video_path}")
-        return
+# "jpeg": one frame_XXXX.jpg per frame (what Roboflow uploads need);
+# "memmap": one raw uint8 array per video, read back as a memory map
+BACKEND = "jpeg"
+STORE_DIR = Path("data/processed/frame_store")
+STORE_MAX_SIDE = None  # downscale stored frames so neither side exceeds this
+
+app = typer.Typer()
+
+
+def write_jpeg(path: Path, image):
+    import cv2
+
+    with timer("serialize"):
+        cv2.imwrite(str(path), image)
+
+
+class FrameExportStage(FrameStage):
+    """Writes one frame every `interval` source frames as frame_XXXX.jpg into
+    `output_dir/<video>`, or into `output_folder` when given.
+
+    Works whether the decoder hands over every frame or already samples them.
+    With `async_write` the JPEG encoding and writing happen on a writer thread.
+    """
+
+    def __init__(self, output_dir=OUTPUT_DIR, fps=FPS, output_folder=None, async_write=True):
+        self.output_dir = Path(output_dir)
+        self.fps = fps
+        self.fixed_folder = Path(output_folder) if output_folder is not None else None
+        self.async_write = async_write
+
+    def start(self, video):
+        self.video = video
+        self.interval = sampling_stride(video.fps, target_fps=self.fps)
+        self.output_folder = self.fixed_folder or self.output_dir / video.name
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+        self.next_frame = 0
+        self.saved_idx = 0
+        self.writer = AsyncWriter() if self.async_write else None
+
+    def process(self, frame):
+        if frame.index >= self.next_frame:
+            frame_name = f"frame_{self.saved_idx:04d}.jpg"
+            frame_path = self.output_folder / frame_name
+            if self.writer is not None:
+                self.writer.submit(write_jpeg, frame_path, frame.image)
+            else:
+                write_jpeg(frame_path, frame.image)
+            count("frames_written")
+            self.saved_idx += 1
+            self.next_frame = frame.index + self.interval
+
+    def finish(self):
+        if self.writer is not None:
+            self.writer.close()
+        print(f"✅ Extracted {self.saved_idx} frames from {self.video.path.name}")
+        return self.saved_idx
+
+    def abort(self):
+        if self.writer is not None:
+            with suppress(Exception):  # the run is already failing with its own error
+                self.writer.close()
+
+
+def store_paths(store_dir: Path, video_name: str):
+    """<video>.frames holds the pixels, <video>.json their shape and frame indices."""
+    return Path(store_dir) / f"{video_name}.frames", Path(store_dir) / f"{video_name}.json"
+
+
+def fit_to(image, max_side: int | None):
+    height, width = image.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return image
+    import cv2
+
+    scale = max_side / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+class FrameStoreStage(FrameStage):
+    """Stores the same frames FrameExportStage would export, but appended as
+    raw uint8 pixels to one <video>.frames file in `store_dir` instead of one
+    JPEG each, optionally downscaled to `max_side`.
+
+    Nothing is encoded, and `finish` writes the <video>.json metadata that
+    FrameStore needs to map the file. Both files only appear once complete;
+    a failed run removes the .tmp file it was writing.
+    """
 
-    video_fps = cap.get(cv2.CAP_PROP_FPS)
-    interval = int(video_fps / fps) if video_fps > fps else 1
+    def __init__(self, store_dir=STORE_DIR, fps=FPS, max_side=STORE_MAX_SIDE):
+        self.store_dir = Path(store_dir)
+        self.fps = fps
+        self.max_side = max_side
 
-    output_folder.mkdir(parents=True, exist_ok=True)
+    def start(self, video):
+        self.video = video
+        self.interval = sampling_stride(video.fps, target_fps=self.fps)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path, self.meta_path = store_paths(self.store_dir, video.name)
+        self.tmp_path = self.data_path.with_name(self.data_path.name + ".tmp")
+        self.file = open(self.tmp_path, "wb")  # noqa: SIM115 - closed by finish or abort
+        self.shape = None
+        self.frame_indices = []
+        self.next_frame = 0
 
-    frame_idx = 0
-    saved_idx = 0
+    def process(self, frame):
+        if frame.index < self.next_frame:
+            return
+        with timer("resize"):
+            image = np.ascontiguousarray(fit_to(frame.image, self.max_side), dtype=np.uint8)
+        if self.shape is None:
+            self.shape = image.shape
+        elif image.shape != self.shape:
+            raise ValueError(
+                f"{self.video.path.name}: frame {frame.index} has shape "
+                f"{image.shape}, expected {self.shape}"
+            )
+        with timer("serialize"):
+            self.file.write(image.data)
+        count("frames_written")
+        self.frame_indices.append(frame.index)
+        self.next_frame = frame.index + self.interval
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def finish(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.data_path)
+        meta = {
+            "video": self.video.path.name,
+            "source_fps": self.video.fps,
+            "fps": self.fps,
+            "max_side": self.max_side,
+            "dtype": "uint8",
+            "shape": [len(self.frame_indices), *(self.shape or (0, 0, 3))],
+            "frame_indices": self.frame_indices,
+        }
+        with open(self.meta_path, "w") as f:
+            json.dump(meta, f)
+        print(f"✅ Stored {len(self.frame_indices)} frames from {self.video.path.name}")
+        return len(self.frame_indices)
 
-        if frame_idx % interval == 0:
-            frame_name = f"frame_{saved_idx:04d}.jpg"
-            frame_path = output_folder / frame_name
-            cv2.imwrite(str(frame_path), frame)
-            saved_idx += 1
+    def abort(self):
+        self.file.close()
+        self.tmp_path.unlink(missing_ok=True)
 
-        frame_idx += 1
 
-    cap.release()
-    print(f"✅ Extracted {saved_idx} frames from {video_path.name}")
+class FrameStore:
+    """Read access to the frames FrameStoreStage stored for one video.
 
-def load_labeled_video_names(label_path: Path):
-    with open(label_path, "r") as f:
-        labels = json.load(f)
-    return {entry["video"] for entry in labels}
+    `store[i]` is the i-th stored frame and `store.frame(index)` the one taken
+    from source frame `index`. Both are read-only views into a memory map, so
+    nothing is copied or decoded, and only the pages touched are read.
+    """
 
-def main():
+    def __init__(self, store_dir: Path, video_name: str):
+        self.name = video_name
+        data_path, meta_path = store_paths(store_dir, video_name)
+        with open(meta_path, "r") as f:
+            self.meta = json.load(f)
+        self.frame_indices = np.asarray(self.meta["frame_indices"], dtype=np.int64)
+        shape = tuple(self.meta["shape"])
+        if shape[0]:
+            self.frames = np.memmap(data_path, dtype=self.meta["dtype"], mode="r", shape=shape)
+        else:
+            self.frames = np.empty(shape, dtype=self.meta["dtype"])  # can't map empty files
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def __getitem__(self, position):
+        return self.frames[position]
+
+    def frame(self, frame_index: int):
+        position = np.searchsorted(self.frame_indices, frame_index)
+        if position == len(self) or self.frame_indices[position] != frame_index:
+            raise KeyError(f"Frame {frame_index} of {self.name} is not in the store")
+        return self.frames[position]
+
+    def export_jpegs(self, output_folder: Path, positions=None, prefix: str = ""):
+        """Write stored frames as <prefix>frame_XXXX.jpg, as FrameExportStage names them."""
+        import cv2
+
+        output_folder = Path(output_folder)
+        output_folder.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for position in range(len(self)) if positions is None else positions:
+            path = output_folder / f"{prefix}frame_{position:04d}.jpg"
+            cv2.imwrite(str(path), self.frames[position])
+            paths.append(path)
+        return paths
+
+
+def list_frame_stores(store_dir: Path = STORE_DIR):
+    """Names of the videos with a complete store in `store_dir`."""
+    return sorted(
+        path.stem
+        for path in Path(store_dir).glob("*.json")
+        if store_paths(store_dir, path.stem)[0].exists()
+    )
+
+
+def frame_stage(backend=BACKEND, max_side=STORE_MAX_SIDE):
+    """The stage that writes frames with `backend` into its default location."""
+    if backend == "memmap":
+        return FrameStoreStage(max_side=max_side)
+    if backend != "jpeg":
+        raise ValueError(f"Unsupported frame backend: {backend}")
+    return FrameExportStage()
+
+
+def extract_frames_from_video(video_path: Path, output_folder: Path, fps: int):
+    # Only the exported frames need decoding, so let the decoder skip the rest
+    results = run_stages(
+        video_path, [FrameExportStage(fps=fps, output_folder=output_folder)], target_fps=fps
+    )
+    return results[0] if results is not None else None
+
+
+def extract_frames_for_video(video_file: Path, backend=BACKEND, max_side=STORE_MAX_SIDE):
+    if backend == "jpeg":
+        output_path = OUTPUT_DIR / video_file.stem
+        return extract_frames_from_video(video_file, output_path, FPS)
+    results = run_stages(video_file, [frame_stage(backend, max_side)], target_fps=FPS)
+    return results[0] if results is not None else None
+
+
+def frames_cache(force=False, backend=BACKEND, max_side=STORE_MAX_SIDE):
+    if backend == "jpeg":
+        return StageCache("frames", {"fps": FPS}, enabled=not force)
+    return StageCache("frame_store", {"fps": FPS, "max_side": max_side}, enabled=not force)
+
+
+def frames_outputs(video_file, backend=BACKEND):
+    if backend == "jpeg":
+        return [OUTPUT_DIR / Path(video_file).stem]
+    return list(store_paths(STORE_DIR, Path(video_file).stem))
+
+
+@app.command()
+def main(
+    workers: int = 1,
+    force: bool = False,
+    backend: str = typer.Option(
+        BACKEND, help="jpeg: one file per frame; memmap: one memory-mapped array per video"
+    ),
+    max_side: int | None = typer.Option(
+        STORE_MAX_SIDE, help="Downscale memmap frames so neither side exceeds this"
+    ),
+):
     print("🔍 Starting frame extraction...")
-    labeled_videos = load_labeled_video_names(LABELS_PATH)
+    catalog = load_catalog(VIDEOS_DIR)
 
-    for video_file in tqdm(list(VIDEOS_DIR.rglob("*.mp4"))):
-        if video_file.name not in labeled_videos:
+    video_files = []
+    for video_file in catalog.paths():
+        if not catalog.get(video_file.name)["labels"]:
             print(f"⏭️ Skipping {video_file.name} — not in labels")
             continue
+        video_files.append(video_file)
 
-        video_stem = video_file.stem
-        output_path = OUTPUT_DIR / video_stem
-        extract_frames_from_video(video_file, output_path, FPS)
+    run_cached(
+        frames_cache(force, backend, max_side),
+        partial(extract_frames_for_video, backend=backend, max_side=max_side),
+        video_files,
+        name_fn=lambda video_file: video_file.stem,
+        inputs_fn=lambda video_file: [video_file],
+        outputs_fn=partial(frames_outputs, backend=backend),
+        workers=workers,
+    )
 
     print("✅ All done.")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
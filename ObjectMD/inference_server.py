@@ -0,0 +1,354 @@
+from concurrent.futures import Future
+from functools import partial
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import os
+from pathlib import Path
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import typer
+
+DEFAULT_ADDRESS = str(Path(tempfile.gettempdir()) / "objectmd-inference.sock")
+# Messages are pickled, so both ends must prove they know this shared secret
+AUTHKEY_ENV = "OBJECTMD_INFERENCE_KEY"
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost"}
+MAX_BATCH = 16  # frames per model call
+MAX_LATENCY_MS = 10.0  # how long the first queued request may wait for company
+WARMUP_SHAPE = (480, 640, 3)
+
+# Shared by every CLI that can send its frames to a running server
+SERVER_OPTION = typer.Option(None, help="Inference server address to use")
+
+app = typer.Typer()
+
+
+def auth_key() -> bytes:
+    """The shared secret from $OBJECTMD_INFERENCE_KEY; there is no default."""
+    key = os.environ.get(AUTHKEY_ENV)
+    if not key:
+        raise RuntimeError(
+            f"Set {AUTHKEY_ENV} to a shared secret to use the inference "
+            "server (the same value for the server and its clients)"
+        )
+    return key.encode()
+
+
+def parse_address(address: str, allow_remote: bool = False):
+    """ "host:port" for TCP, anything else is a Unix socket path.
+
+    TCP hosts other than loopback are rejected unless `allow_remote`.
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        host = host or "127.0.0.1"
+        if host not in LOOPBACK_HOSTS and not allow_remote:
+            raise ValueError(
+                f"Refusing non-loopback address {address}; pass "
+                "--allow-remote to expose the server on the network"
+            )
+        return (host, int(port)), "AF_INET"
+    return address, "AF_UNIX"
+
+
+def listen(address: str, allow_remote: bool = False) -> Listener:
+    """Listener on `address`; a Unix socket is created readable by its owner only."""
+    address, family = parse_address(address, allow_remote)
+    if family == "AF_INET":
+        return Listener(address, family=family, authkey=auth_key())
+    if Path(address).exists():
+        Path(address).unlink()  # stale socket from a previous run
+    umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family=family, authkey=auth_key())
+    finally:
+        os.umask(umask)
+    os.chmod(address, 0o600)
+    return listener
+
+
+class MicroBatcher:
+    """Collects requests from many connections into one model call.
+
+    A batch is closed when it holds `max_batch` frames or when its first
+    request has waited `max_latency_ms`, whichever comes first. `fn` takes the
+    flat list of items of all requests in the batch and returns one output per
+    item; each request's Future gets back the slice for its own items.
+    """
+
+    def __init__(self, name, fn, max_batch=MAX_BATCH, max_latency_ms=MAX_LATENCY_MS):
+        self.name = name
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.queue = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "frames": 0, "busy_s": 0.0}
+        self.thread = threading.Thread(target=self.run, name=f"{name}-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, items) -> Future:
+        future = Future()
+        self.queue.put((list(items), future))
+        return future
+
+    def collect(self):
+        """Block for the next batch of requests; None once stopped."""
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_latency
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self.queue.put(None)  # stop after this batch
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            if batch is None:
+                return
+            items = [item for request_items, _ in batch for item in request_items]
+            start = time.perf_counter()
+            try:
+                outputs = self.fn(items)
+            except Exception as e:  # noqa: BLE001 - handed to every waiting client
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["busy_s"] += time.perf_counter() - start
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["frames"] += len(items)
+
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(outputs[offset : offset + len(request_items)])
+                offset += len(request_items)
+
+    def summary(self):
+        batches = max(self.stats["batches"], 1)
+        return {**self.stats, "mean_batch_frames": round(self.stats["frames"] / batches, 2)}
+
+    def stop(self):
+        self.queue.put(None)
+
+
+# === MODEL BACKENDS ===
+def detect_items(items, backend="torch"):
+    """items: (frame, frame_idx, sample_idx) from any number of clients."""
+    from ObjectMD.object_detection import detect_objects_in_batch, get_model
+
+    frames, frame_indices, sample_indices = zip(*items)
+    return detect_objects_in_batch(frames, frame_indices, sample_indices, get_model(backend))
+
+
+def pose_items(items):
+    """items: frames. MediaPipe has no batch API and frames from different
+    clients interleave, so every frame is run on its own in static image mode."""
+    from ObjectMD.pose_estimation import estimate_keypoints
+
+    return [estimate_keypoints(frame, static_image_mode=True) for frame in items]
+
+
+def model_info(detect=True, pose=True, detector_backend="torch"):
+    """What the served models are, for the clients' cache and resume keys."""
+    info = {}
+    if detect:
+        from ObjectMD.object_detection import detector_info
+
+        info["detect"] = detector_info(detector_backend)
+    if pose:
+        from ObjectMD.pose_estimation import pose_info
+
+        info["pose"] = pose_info()
+    return info
+
+
+class InferenceServer:
+    def __init__(
+        self,
+        address=DEFAULT_ADDRESS,
+        detect=True,
+        pose=True,
+        max_batch=MAX_BATCH,
+        max_latency_ms=MAX_LATENCY_MS,
+        detector_backend="torch",
+        allow_remote=False,
+    ):
+        self.address = address
+        self.allow_remote = allow_remote
+        self.models = model_info(detect, pose, detector_backend)
+        self.detect_fn = partial(detect_items, backend=detector_backend)
+        self.batchers = {}
+        if detect:
+            self.batchers["detect"] = MicroBatcher(
+                "detect", self.detect_fn, max_batch, max_latency_ms
+            )
+        if pose:
+            self.batchers["pose"] = MicroBatcher("pose", pose_items, max_batch, max_latency_ms)
+
+    def warm_up(self):
+        """Load the models and run them once so the first client doesn't pay for it."""
+        blank = np.zeros(WARMUP_SHAPE, dtype=np.uint8)
+        if "detect" in self.batchers:
+            self.detect_fn([(blank, 0, 0)])
+        if "pose" in self.batchers:
+            pose_items([blank])
+
+    def handle(self, conn):
+        """Serve one client connection until it disconnects."""
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if op == "stats":
+                        result = self.stats()
+                    elif op in self.batchers:
+                        result = self.batchers[op].submit(payload).result()
+                    else:
+                        raise ValueError(f"Unsupported operation: {op}")
+                    conn.send((True, result))
+                except Exception as e:  # noqa: BLE001 - reported back to the client
+                    conn.send((False, repr(e)))
+
+    def stats(self):
+        """Batching stats per model, plus the served models under "models"."""
+        return {
+            **{name: batcher.summary() for name, batcher in self.batchers.items()},
+            "models": self.models,
+        }
+
+    def serve_forever(self):
+        with listen(self.address, self.allow_remote) as listener:
+            print(
+                f"🚀 Inference server listening on {self.address} ({', '.join(self.batchers)})",
+                file=sys.stderr,
+            )
+            try:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except (AuthenticationError, EOFError, OSError) as e:  # e.g. a wrong key
+                        print(f"⚠️ Rejected connection: {e!r}", file=sys.stderr)
+                        continue
+                    threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                for batcher in self.batchers.values():
+                    batcher.stop()
+                print(f"✅ Inference server stopped: {self.stats()}", file=sys.stderr)
+
+
+class InferenceClient:
+    """Client backend for DetectionStage / PoseStage.
+
+    Results are the same structures the local code produces: detection lists
+    per frame and wrist keypoint dicts per frame.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        # Connecting out is the user's choice, so any host is fine here
+        address, family = parse_address(address, allow_remote=True)
+        self.conn = Client(address, family=family, authkey=auth_key())
+
+    def request(self, op, payload=None):
+        self.conn.send((op, payload))
+        ok, result = self.conn.recv()
+        if not ok:
+            raise RuntimeError(f"Inference server failed on {op}: {result}")
+        return result
+
+    def detect(self, frames, frame_indices, sample_indices=None):
+        if sample_indices is None:
+            sample_indices = frame_indices
+        return self.request("detect", list(zip(frames, frame_indices, sample_indices)))
+
+    def pose(self, frames):
+        return self.request("pose", list(frames))
+
+    def stats(self):
+        return self.request("stats")
+
+    def models(self):
+        """Backend and weights of the served models (see `model_info`)."""
+        return self.stats()["models"]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def connect(server: str | None):
+    """InferenceClient for `server` (socket path or host:port), or None to run locally."""
+    return InferenceClient(server) if server is not None else None
+
+
+def served_model(server: str, op: str):
+    """`model_info` entry of the model `server` runs for `op` ("detect" or "pose")."""
+    with InferenceClient(server) as client:
+        models = client.models()
+    if op not in models:
+        raise RuntimeError(f"Inference server at {server} does not serve {op}")
+    return models[op]
+
+
+@app.command()
+def main(
+    address: str = DEFAULT_ADDRESS,
+    detect: bool = True,
+    pose: bool = True,
+    max_batch: int = MAX_BATCH,
+    max_latency_ms: float = MAX_LATENCY_MS,
+    warm_up: bool = True,
+    detector_backend: str = typer.Option("torch", help="torch, onnx or onnx-int8"),
+    allow_remote: bool = typer.Option(
+        False,
+        help="Allow listening on a non-loopback TCP host (anyone who has the key can run code)",
+    ),
+):
+    """Keep YOLO and MediaPipe Pose warm and micro-batch requests from many clients.
+
+    Listens on a Unix socket path (owner-only), or on loopback TCP when given
+    "host:port". Requests are pickled, so $OBJECTMD_INFERENCE_KEY must be set
+    to a shared secret here and for every client. Point object_detection /
+    pose_estimation / pipeline at it with --server.
+    """
+    auth_key()  # fail before loading the models
+    parse_address(address, allow_remote)
+    server = InferenceServer(
+        address, detect, pose, max_batch, max_latency_ms, detector_backend, allow_remote
+    )
+    if warm_up:
+        start = time.perf_counter()
+        server.warm_up()
+        print(f"🔥 Models warm in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    app()
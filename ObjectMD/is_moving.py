@@ -1,45 +1,153 @@
+from collections import defaultdict
+from functools import partial
 import json
 from pathlib import Path
 
-import pandas as pd
+import numpy as np
+import typer
+
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.catalog import load_catalog
+from ObjectMD.metrics import count, timer
+from ObjectMD.storage import (
+    FEATURE_FORMATS,
+    glob_artifacts,
+    load_features,
+    save_features,
+    video_name_of,
+)
 
 FEATURES_DIR = Path("data/processed/features")
+LABELED_DIR = Path("data/processed/labeled_features")
 LABEL_FILE = Path("data/processed/labels.json")
-FPS = 5  # frames per second
+DEFAULT_FPS = 30  # only for labeled videos missing from the catalog
+
+app = typer.Typer()
+
 
 def load_label_data(label_file):
     with open(label_file, "r") as f:
         return json.load(f)
 
-def build_video_label_dict(label_data):
-    video_labels = {}
+
+def merge_intervals(intervals):
+    """Sorted, disjoint `(starts, ends)` frame arrays from inclusive (start, end)
+    rows; overlapping or touching intervals are merged."""
+    intervals = intervals[np.argsort(intervals[:, 0], kind="stable")]
+    reach = np.maximum.accumulate(intervals[:, 1])
+    new_group = np.ones(len(intervals), dtype=bool)
+    new_group[1:] = intervals[1:, 0] > reach[:-1] + 1
+    group_starts = np.flatnonzero(new_group)
+    return intervals[group_starts, 0], np.maximum.reduceat(intervals[:, 1], group_starts)
+
+
+def label_fps(label_data, video_fps=None):
+    """Labeled video file name -> the fps its seconds are converted with: its
+    own from `video_fps` (file name -> fps, e.g. from the catalog), else
+    DEFAULT_FPS."""
+    video_fps = video_fps or {}
+    resolved = {}
+    for entry in label_data:
+        resolved[entry["video"]] = video_fps.get(entry["video"]) or DEFAULT_FPS
+    missing = sum(not video_fps.get(video) for video in resolved)
+    if missing:
+        print(f"⚠️ No fps for {missing} labeled video(s); assuming {DEFAULT_FPS} fps")
+    return resolved
+
+
+def build_video_label_dict(label_data, video_fps=None):
+    """Video stem -> interval index `(starts, ends)` of its labeled actions, in
+    native frame indices. Every label entry of a video counts (one per action);
+    seconds are converted with the fps `label_fps` resolves for the video."""
+    actions = defaultdict(list)
     for entry in label_data:
-        video_name = Path(entry["video"]).stem
         start_sec = entry.get("action_start", {}).get("video_second")
         end_sec = entry.get("action_end", {}).get("video_second")
-        if start_sec is not None and end_sec is not None:
-            start_frame = int(start_sec * FPS)
-            end_frame = int(end_sec * FPS)
-            video_labels[video_name] = (start_frame, end_frame)
+        if start_sec is not None and end_sec is not None and start_sec <= end_sec:
+            actions[entry["video"]].append((start_sec, end_sec))
+
+    fps = label_fps(label_data, video_fps)
+    video_labels = {}
+    for video, seconds in actions.items():
+        frames = np.floor(np.array(seconds, dtype=np.float64) * fps[video]).astype(np.int64)
+        video_labels[Path(video).stem] = merge_intervals(frames)
     return video_labels
 
-def label_features_with_movement(features_dir, video_labels):
-    for feature_file in features_dir.glob("features_*.csv"):
-        video_name = feature_file.stem.replace("features_", "")
-        if video_name not in video_labels:
-            print(f"Skipping {video_name}: no label info")
-            continue
-        start_frame, end_frame = video_labels[video_name]
-        df = pd.read_csv(feature_file)
-        df["is_moving"] = df["frame"].apply(lambda f: 1 if start_frame <= f <= end_frame else 0)
-        df.to_csv(feature_file, index=False)
-        print(f"Labeled {video_name} with is_moving from frame {start_frame} to {end_frame}")
-
-def main():
+
+def label_frames(frames, intervals):
+    """1 for the frames inside one of the `(starts, ends)` intervals, else 0."""
+    starts, ends = intervals
+    frames = np.asarray(frames, dtype=np.int64)
+    if len(starts) == 0:
+        return np.zeros(len(frames), dtype=np.int64)
+    idx = np.searchsorted(starts, frames, side="right") - 1
+    inside = (idx >= 0) & (frames <= ends[np.maximum(idx, 0)])
+    return inside.astype(np.int64)
+
+
+def label_feature_file(feature_file, video_labels, output_dir=LABELED_DIR):
+    """Writes a labeled copy of one feature file to `output_dir`; the feature file
+    itself is left untouched. Returns the output path, or None if unlabeled."""
+    video_name = video_name_of(feature_file)
+    if video_name not in video_labels:
+        print(f"Skipping {video_name}: no label info")
+        return None
+    intervals = video_labels[video_name]
+    with timer("deserialize"):
+        df = load_features(feature_file)
+    with timer("label"):
+        df["is_moving"] = label_frames(df["frame"].to_numpy(), intervals)
+    count("labeled_rows", len(df))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with timer("serialize"):
+        output_file = save_features(df, output_dir / feature_file.name)
+    print(f"Labeled {video_name} with is_moving over {len(intervals[0])} action interval(s)")
+    return output_file
+
+
+def video_label_params(feature_file, video_labels, fps=None):
+    """Cache params of one feature file: the fps and merged label intervals of
+    its own video, so labeling another video or learning its fps doesn't
+    relabel this one."""
+    video_name = video_name_of(feature_file)
+    video_fps = {Path(video).stem: value for video, value in (fps or {}).items()}
+    intervals = video_labels.get(video_name)
+    return {
+        "fps": video_fps.get(video_name),
+        "intervals": None if intervals is None else [bounds.tolist() for bounds in intervals],
+    }
+
+
+def label_features_with_movement(
+    features_dir, video_labels, output_dir=LABELED_DIR, force=False, workers=1, fps=None
+):
+    """Labels every feature file; `fps` (labeled video -> fps used, see
+    `label_fps`) and the label intervals of each video are part of that
+    video's cache entry."""
+    feature_files = glob_artifacts(features_dir, "features_*", FEATURE_FORMATS)
+    run_cached(
+        StageCache("is_moving", {}, enabled=not force),
+        partial(label_feature_file, video_labels=video_labels, output_dir=output_dir),
+        feature_files,
+        name_fn=video_name_of,
+        inputs_fn=lambda feature_file: [feature_file],
+        outputs_fn=lambda feature_file: [output_dir / feature_file.name],
+        workers=workers,
+        desc="Labeling features",
+        params_fn=partial(video_label_params, video_labels=video_labels, fps=fps),
+    )
+
+
+@app.command()
+def main(workers: int = 1, force: bool = False):
     label_data = load_label_data(LABEL_FILE)
-    video_labels = build_video_label_dict(label_data)
-    label_features_with_movement(FEATURES_DIR, video_labels)
+    catalog = load_catalog()
+    video_fps = {name: entry.get("fps") for name, entry in catalog.videos.items()}
+    fps = label_fps(label_data, video_fps)
+    video_labels = build_video_label_dict(label_data, fps)
+    label_features_with_movement(FEATURES_DIR, video_labels, force=force, workers=workers, fps=fps)
     print("✅ Movement labeling complete.")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
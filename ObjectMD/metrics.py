@@ -0,0 +1,213 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import resource
+import tempfile
+import threading
+import time
+
+METRICS_DIR = Path("reports/metrics")
+# Per-video metrics and a run summary are only written with OBJECTMD_METRICS=1;
+# OBJECTMD_PROFILE=1 additionally dumps a cProfile file per video
+ENABLED = os.environ.get("OBJECTMD_METRICS", "0") != "0"
+PROFILE = os.environ.get("OBJECTMD_PROFILE", "0") != "0"
+TOP_VIDEOS = 5  # slowest videos listed in the run summary
+
+
+class Metrics:
+    """Timers and counters for the video currently being processed.
+
+    Timers add up wall time per name (`decode`, `inference`, ...) and count
+    their calls; counters add up events (`frames`, `detections`, ...). Both
+    are safe to update from the decode and writer threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timers = defaultdict(float)
+            self.calls = defaultdict(int)
+            self.counters = defaultdict(int)
+
+    def add_time(self, name: str, seconds: float):
+        with self.lock:
+            self.timers[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] += n
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "timers": {
+                    name: {"total_s": round(total, 6), "calls": self.calls[name]}
+                    for name, total in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+
+current = Metrics()  # one per process; workers handle one video at a time
+
+
+def timer(name: str):
+    """`with timer("inference"): ...` adds the block's wall time to the current video."""
+    return current.timer(name)
+
+
+def count(name: str, n: int = 1):
+    current.count(name, n)
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux; it is the peak of the whole process so far
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def item_name(item) -> str:
+    """File-friendly name of a `run_per_video` item (a path, or a job tuple
+    starting with one)."""
+    return Path(item[0] if isinstance(item, tuple) else item).stem
+
+
+class Measured:
+    """Wraps a per-video `fn` so it also returns that video's metrics.
+
+    Runs in the worker: resets the timers, optionally profiles the call into
+    `profile_dir/<item>.prof` (for snakeviz / pstats), and returns `(result,
+    metrics)`. Picklable as long as `fn` is.
+
+    Peak memory can only be read for the whole process: `process_peak_rss_bytes`
+    is the peak so far (possibly set by an earlier video in the same worker),
+    `peak_rss_growth_bytes` how much this video raised it.
+    """
+
+    def __init__(self, fn, profile_dir=None):
+        self.fn = fn
+        self.profile_dir = profile_dir
+
+    def __call__(self, item):
+        current.reset()
+        peak_before = peak_rss_bytes()
+        profiler = cProfile.Profile() if self.profile_dir is not None else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = self.fn(item)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(Path(self.profile_dir) / f"{item_name(item)}.prof")
+        peak_after = peak_rss_bytes()
+        return result, {
+            "elapsed_s": round(time.perf_counter() - start, 6),
+            "process_peak_rss_bytes": peak_after,
+            "peak_rss_growth_bytes": peak_after - peak_before,
+            "pid": os.getpid(),
+            **current.snapshot(),
+        }
+
+
+def summarize(videos, failures: int):
+    """Totals over the per-video metrics of a run, hottest timers first."""
+    timers, calls, counters = defaultdict(float), defaultdict(int), defaultdict(int)
+    for metrics in videos.values():
+        for name, timer_stats in metrics["timers"].items():
+            timers[name] += timer_stats["total_s"]
+            calls[name] += timer_stats["calls"]
+        for name, value in metrics["counters"].items():
+            counters[name] += value
+    elapsed = sum(metrics["elapsed_s"] for metrics in videos.values())
+    hot_path = sorted(timers, key=timers.get, reverse=True)
+    slowest = sorted(videos, key=lambda name: videos[name]["elapsed_s"], reverse=True)
+    return {
+        "videos": len(videos),
+        "failures": failures,
+        "elapsed_s": round(elapsed, 6),
+        "process_peak_rss_bytes": max(
+            (m["process_peak_rss_bytes"] for m in videos.values()), default=0
+        ),
+        "timers": {
+            name: {
+                "total_s": round(timers[name], 6),
+                "calls": calls[name],
+                "share": round(timers[name] / elapsed, 4) if elapsed else None,
+            }
+            for name in hot_path
+        },
+        "counters": dict(sorted(counters.items())),
+        "slowest_videos": {name: videos[name]["elapsed_s"] for name in slowest[:TOP_VIDEOS]},
+    }
+
+
+class RunMetrics:
+    """Collects the metrics of one `run_per_video` call into a new
+    `METRICS_DIR/<stage>-<timestamp>-<suffix>/` (unique even for runs started
+    in the same second): `videos/<name>.json` per video and a `summary.json`
+    for the run.
+
+    Timers overlap: decode runs on its own thread, and stage timers include
+    the inference and serialization timers of their stage.
+    """
+
+    def __init__(self, stage: str, name_fn=item_name, profile: bool = PROFILE):
+        self.stage = stage
+        self.name_fn = name_fn
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        self.run_dir = Path(
+            tempfile.mkdtemp(prefix=f"{stage}-{datetime.now():%Y%m%d-%H%M%S}-", dir=METRICS_DIR)
+        )
+        self.profile_dir = self.run_dir / "profiles" if profile else None
+        self.started = datetime.now().isoformat(timespec="seconds")
+
+    def wrap(self, fn):
+        return Measured(fn, self.profile_dir)
+
+    def finish(self, results, failures):
+        """Write the metrics; returns `results` with the bare per-video results."""
+        videos = {}
+        unwrapped = {}
+        for item, (result, metrics) in results.items():
+            unwrapped[item] = result
+            videos[self.name_fn(item)] = metrics
+
+        (self.run_dir / "videos").mkdir(parents=True, exist_ok=True)
+        for name, metrics in videos.items():
+            with open(self.run_dir / "videos" / f"{name}.json", "w") as f:
+                json.dump({"stage": self.stage, "video": name, **metrics}, f, indent=2)
+        summary = {
+            "stage": self.stage,
+            "started": self.started,
+            **summarize(videos, len(failures)),
+        }
+        with open(self.run_dir / "summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        hottest = ", ".join(
+            f"{name} {stats['total_s']:.2f}s"
+            for name, stats in list(summary["timers"].items())[:3]
+        )
+        print(
+            f"📊 {self.stage}: {len(videos)} videos in {summary['elapsed_s']:.2f}s"
+            f"{f' | {hottest}' if hottest else ''} | metrics in {self.run_dir}"
+        )
+        return unwrapped
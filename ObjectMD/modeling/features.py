@@ -0,0 +1,76 @@
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+from ObjectMD.storage import FEATURE_FORMATS, glob_artifacts, load_features, video_name_of
+
+WINDOWS = (5, 15)  # rolling window lengths in feature rows
+ROLLING_COLUMNS = ["box_dx", "box_dy", "box_speed", "min_hand_dist"]
+BASE_COLUMNS = [
+    "box_cx",
+    "box_cy",
+    "box_w",
+    "box_h",
+    "box_dx",
+    "box_dy",
+    "box_speed",
+    "left_wrist_x",
+    "left_wrist_y",
+    "right_wrist_x",
+    "right_wrist_y",
+    "dist_left_to_box",
+    "dist_right_to_box",
+    "min_hand_dist",
+]
+LABEL_COLUMN = "is_moving"
+
+
+def add_window_features(df: pd.DataFrame, windows: Sequence[int] = WINDOWS) -> pd.DataFrame:
+    """Add temporal context to the rows of one video, sorted by track and frame.
+
+    Rolling mean/std (trailing windows, so the same features are available in
+    a live stream) of box motion and hand distance, plus frame-to-frame deltas
+    of the hand distance, each within its own track (feature files without a
+    `track_id` are one track). Missing values stay NaN; the tree model
+    handles them.
+    """
+    if "track_id" not in df.columns:
+        df = df.assign(track_id=0)
+    df = df.sort_values(["track_id", "frame"], kind="stable").reset_index(drop=True)
+    df["box_speed"] = np.hypot(df["box_dx"], df["box_dy"])
+    tracks = df.groupby("track_id", sort=False)
+    df["min_hand_dist_delta"] = tracks["min_hand_dist"].diff()
+
+    new_columns = {}
+    for window in windows:
+        rolling = tracks[ROLLING_COLUMNS].rolling(window, min_periods=1)
+        means = rolling.mean().reset_index(level=0, drop=True).sort_index()
+        stds = rolling.std().reset_index(level=0, drop=True).sort_index()
+        for name in ROLLING_COLUMNS:
+            new_columns[f"{name}_mean_{window}"] = means[name]
+            new_columns[f"{name}_std_{window}"] = stds[name]
+    return pd.concat([df, pd.DataFrame(new_columns)], axis=1)
+
+
+def feature_columns(windows: Sequence[int] = WINDOWS):
+    columns = BASE_COLUMNS + ["min_hand_dist_delta"]
+    for window in windows:
+        for name in ROLLING_COLUMNS:
+            columns += [f"{name}_mean_{window}", f"{name}_std_{window}"]
+    return columns
+
+
+def load_feature_dir(features_dir, windows: Sequence[int] = WINDOWS) -> pd.DataFrame:
+    """All feature files in `features_dir`, with window features and a `video` column."""
+    frames = []
+    for feature_file in glob_artifacts(features_dir, "features_*", FEATURE_FORMATS):
+        df = load_features(feature_file)
+        if len(df) == 0:
+            continue
+        df = add_window_features(df, windows)
+        df["video"] = video_name_of(feature_file)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
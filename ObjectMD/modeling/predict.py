@@ -1,29 +1,75 @@
 from pathlib import Path
+import pickle
+import time
 
 from loguru import logger
-from tqdm import tqdm
+import numpy as np
+import pandas as pd
 import typer
 
 from ObjectMD.config import MODELS_DIR, PROCESSED_DATA_DIR
+from ObjectMD.modeling.features import load_feature_dir
 
 app = typer.Typer()
 
+BATCH_ROWS = 500_000  # rows scored per predict_proba call
+
+
+def predict_in_batches(model, X: np.ndarray, batch_rows: int = BATCH_ROWS) -> np.ndarray:
+    return (
+        np.concatenate(
+            [
+                model.predict_proba(X[start : start + batch_rows])[:, 1]
+                for start in range(0, len(X), batch_rows)
+            ]
+        )
+        if len(X)
+        else np.empty(0)
+    )
+
 
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    features_path: Path = PROCESSED_DATA_DIR / "test_features.csv",
+    features_dir: Path = PROCESSED_DATA_DIR / "features",
     model_path: Path = MODELS_DIR / "model.pkl",
-    predictions_path: Path = PROCESSED_DATA_DIR / "test_predictions.csv",
-    # -----------------------------------------
+    predictions_dir: Path = PROCESSED_DATA_DIR / "predictions",
+    threshold: float = 0.5,
+    batch_rows: int = BATCH_ROWS,
 ):
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
-    logger.info("Performing inference for model...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Inference complete.")
-    # -----------------------------------------
+    """Score every feature file in `features_dir` and write per-frame probabilities."""
+    with open(model_path, "rb") as f:
+        bundle = pickle.load(f)
+    model, columns = bundle["model"], bundle["feature_columns"]
+
+    logger.info(f"Loading features from {features_dir}...")
+    df = load_feature_dir(features_dir, bundle["windows"])
+    if len(df) == 0:
+        logger.warning("No feature files found.")
+        return
+
+    # Score all videos together in large batches rather than per file
+    X = df[columns].to_numpy(dtype=np.float32)
+    start = time.perf_counter()
+    proba = predict_in_batches(model, X, batch_rows)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Scored {len(X)} rows in {elapsed:.3f}s ({len(X) / elapsed:.0f} rows/sec).")
+
+    predictions = pd.DataFrame(
+        {
+            "video": df["video"],
+            "frame": df["frame"],
+            "probability": proba.astype(np.float32),
+            "is_moving_pred": (proba >= threshold).astype(np.int8),
+        }
+    )
+    predictions_dir.mkdir(parents=True, exist_ok=True)
+    for video_name, video_predictions in predictions.groupby("video", sort=False):
+        video_predictions.drop(columns="video").to_csv(
+            predictions_dir / f"predictions_{video_name}.csv", index=False
+        )
+    logger.success(
+        f"Predictions for {predictions['video'].nunique()} videos saved to {predictions_dir}"
+    )
 
 
 if __name__ == "__main__":
@@ -1,29 +1,84 @@
 from pathlib import Path
+import pickle
+import time
 
 from loguru import logger
-from tqdm import tqdm
+import numpy as np
 import typer
 
 from ObjectMD.config import MODELS_DIR, PROCESSED_DATA_DIR
+from ObjectMD.modeling.features import LABEL_COLUMN, WINDOWS, feature_columns, load_feature_dir
 
 app = typer.Typer()
 
 
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    features_path: Path = PROCESSED_DATA_DIR / "features.csv",
-    labels_path: Path = PROCESSED_DATA_DIR / "labels.csv",
+    features_dir: Path = PROCESSED_DATA_DIR / "labeled_features",
     model_path: Path = MODELS_DIR / "model.pkl",
-    # -----------------------------------------
+    test_size: float = 0.2,
+    max_iter: int = 200,
+    learning_rate: float = 0.1,
+    seed: int = 42,
 ):
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
-    logger.info("Training some model...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Modeling training complete.")
-    # -----------------------------------------
+    """Train a gradient-boosted is_moving classifier on the labeled feature files.
+
+    Train and test sets are split by video so frames of one recording never
+    end up on both sides.
+    """
+    # sklearn is only needed once training actually starts
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+    from sklearn.model_selection import GroupShuffleSplit
+
+    logger.info(f"Loading labeled features from {features_dir}...")
+    df = load_feature_dir(features_dir)
+    if len(df) == 0 or LABEL_COLUMN not in df:
+        logger.error("No labeled feature files found; run is_moving.py first.")
+        raise typer.Exit(1)
+
+    columns = feature_columns()
+    X = df[columns].to_numpy(dtype=np.float32)
+    y = df[LABEL_COLUMN].to_numpy()
+    groups = df["video"].to_numpy()
+    logger.info(f"{len(df)} rows from {df['video'].nunique()} videos, {int(y.sum())} moving rows.")
+
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=seed)
+    train_idx, test_idx = next(splitter.split(X, y, groups))
+
+    model = HistGradientBoostingClassifier(
+        max_iter=max_iter, learning_rate=learning_rate, random_state=seed
+    )
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Trained on {len(train_idx)} rows in {elapsed:.2f}s "
+        f"({len(train_idx) / elapsed:.0f} rows/sec)."
+    )
+
+    if len(test_idx):
+        start = time.perf_counter()
+        proba = model.predict_proba(X[test_idx])[:, 1]
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Scored {len(test_idx)} test rows in {elapsed:.3f}s "
+            f"({len(test_idx) / elapsed:.0f} rows/sec)."
+        )
+
+        y_test = y[test_idx]
+        pred = (proba >= 0.5).astype(int)
+        logger.info(
+            f"Test accuracy={accuracy_score(y_test, pred):.3f} "
+            f"f1={f1_score(y_test, pred, zero_division=0):.3f}"
+        )
+        if len(np.unique(y_test)) == 2:
+            logger.info(f"Test ROC AUC={roc_auc_score(y_test, proba):.3f}")
+
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(model_path, "wb") as f:
+        pickle.dump({"model": model, "feature_columns": columns, "windows": WINDOWS}, f)
+    logger.success(f"Model saved to {model_path}")
 
 
 if __name__ == "__main__":
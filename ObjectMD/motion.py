@@ -0,0 +1,102 @@
+import numpy as np
+import typer
+
+from ObjectMD.metrics import count
+from ObjectMD.video_pipeline import FrameStage
+
+MOTION_THRESHOLD = 0.002  # fraction of changed pixels below which a frame is static
+PIXEL_THRESHOLD = 15  # gray-level change that counts a pixel as changed
+GATE_WIDTH = 160  # frames are compared at this width
+MAX_STATIC_FRAMES = 30  # the models still run at least once every this many frames
+# Shared by every CLI that runs the models
+MOTION_THRESHOLD_OPTION = typer.Option(
+    None,
+    help="Reuse previous results on frames where less than this fraction of "
+    f"pixels changed (e.g. {MOTION_THRESHOLD}); off by default",
+)
+
+
+class MotionGateStage(FrameStage):
+    """Cheap pre-filter that marks frames without motion as `static`.
+
+    Each frame is downscaled, converted to grayscale, blurred and compared to
+    the last frame that was *not* static (the one the models last ran on), so
+    slow motion accumulates until it crosses the threshold. Place it before
+    the model stages; they reuse their previous results for static frames.
+    """
+
+    resume_frame = None  # keeps no output, so it can start wherever the models resume
+
+    def __init__(
+        self,
+        threshold=MOTION_THRESHOLD,
+        pixel_threshold=PIXEL_THRESHOLD,
+        max_static=MAX_STATIC_FRAMES,
+    ):
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.max_static = max_static
+
+    def start(self, video):
+        self.video = video
+        self.reference = None
+        self.static_run = 0
+        self.frames = 0
+        self.static_frames = 0
+
+    def small_gray(self, image):
+        import cv2
+
+        height, width = image.shape[:2]
+        size = (GATE_WIDTH, max(1, round(height * GATE_WIDTH / width)))
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+    def motion_score(self, small):
+        """Fraction of pixels that changed since the reference frame."""
+        import cv2
+
+        changed = cv2.absdiff(small, self.reference) > self.pixel_threshold
+        return np.count_nonzero(changed) / changed.size
+
+    def process(self, frame):
+        small = self.small_gray(frame.model_input)
+        frame.static = (
+            self.reference is not None
+            and self.static_run < self.max_static
+            and self.motion_score(small) < self.threshold
+        )
+        if frame.static:
+            self.static_run += 1
+            self.static_frames += 1
+            count("skipped_frames")
+        else:
+            self.reference = small
+            self.static_run = 0
+        self.frames += 1
+
+    def finish(self):
+        print(
+            f"⏭️ {self.video.name}: {self.static_frames}/{self.frames} static frames "
+            f"reused previous results"
+        )
+        return {"frames": self.frames, "static_frames": self.static_frames}
+
+
+def with_motion_gate(stages, motion_threshold=None):
+    """`stages` preceded by a MotionGateStage, or unchanged when the threshold is None."""
+    if motion_threshold is None:
+        return list(stages)
+    return [MotionGateStage(motion_threshold)] + list(stages)
+
+
+def motion_params(motion_threshold=None):
+    """Gate settings for a stage cache key (None when gating is off)."""
+    if motion_threshold is None:
+        return None
+    return {
+        "threshold": motion_threshold,
+        "pixel_threshold": PIXEL_THRESHOLD,
+        "gate_width": GATE_WIDTH,
+        "max_static": MAX_STATIC_FRAMES,
+    }
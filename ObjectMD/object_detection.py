@@ -1,79 +1,480 @@
-from glob import glob
-import json
+from functools import cache, partial
 from pathlib import Path
 
-import cv2
-from tqdm import tqdm
-from ultralytics import YOLO  # Make sure ultralytics is installed
+import typer
+
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.catalog import list_videos
+from ObjectMD.inference_server import SERVER_OPTION, connect, served_model
+from ObjectMD.metrics import count, timer
+from ObjectMD.motion import MOTION_THRESHOLD_OPTION, motion_params, with_motion_gate
+from ObjectMD.preprocess import (
+    INFERENCE_MAX_SIDE,
+    INFERENCE_MAX_SIDE_OPTION,
+    resize_params,
+    to_source,
+    with_resize,
+)
+from ObjectMD.storage import FLUSH_EVERY, detections_path, detections_writer
+from ObjectMD.tracking import BoxTracker, to_gray
+from ObjectMD.video_pipeline import FrameStage, run_stages
 
 CONFIDENCE_THRESHOLD = 0.5
+BATCH_SIZE = 1  # frames per model call; 1 keeps the original per-frame path
+DETECT_EVERY = 1  # >1 runs the detector every K frames and tracks boxes in between
+OUTPUT_FORMAT = "json"  # json, parquet or npz
 
 # Path setup
 VIDEO_DIR = Path("data/raw/")
 OUTPUT_DIR = Path("data/processed/objects/")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Load model
-model = YOLO("runs/detect/train/weights/best.pt")  
+WEIGHTS_PATH = Path("runs/detect/train/weights/best.pt")
+# Written by `python -m ObjectMD.onnx_backend [--int8]`
+ONNX_PATH = WEIGHTS_PATH.with_suffix(".onnx")
+ONNX_INT8_PATH = WEIGHTS_PATH.with_name(f"{WEIGHTS_PATH.stem}.int8.onnx")
+
+# torch: ultralytics; onnx / onnx-int8: ONNX Runtime on the CPU (see onnx_backend)
+DETECTOR_BACKEND = "torch"
+
+app = typer.Typer()
+
+
+def detector_weights(backend: str = DETECTOR_BACKEND) -> Path:
+    weights = {"torch": WEIGHTS_PATH, "onnx": ONNX_PATH, "onnx-int8": ONNX_INT8_PATH}
+    if backend not in weights:
+        raise ValueError(f"Unsupported detector backend: {backend}")
+    return weights[backend]
+
+
+def detector_info(backend: str = DETECTOR_BACKEND):
+    """Backend and weights (path and content hash) of the local detector."""
+    from ObjectMD.cache import hash_file
+
+    weights = detector_weights(backend)
+    return {
+        "backend": backend,
+        "weights": str(weights),
+        "weights_sha256": hash_file(weights) if weights.exists() else None,
+    }
+
+
+@cache
+def get_model(backend: str = DETECTOR_BACKEND):
+    """The trained detector for `backend`, loaded on first use and cached per process."""
+    if backend != "torch":
+        from ObjectMD.onnx_backend import OnnxDetector
+
+        return OnnxDetector(detector_weights(backend))
+    from ultralytics import YOLO  # Make sure ultralytics is installed
+
+    return YOLO(str(WEIGHTS_PATH))
+
 
-def detect_objects_in_video(video_path):
-    cap = cv2.VideoCapture(str(video_path))
-    frame_idx = 0
-    video_name = video_path.stem
+def results_to_detections(results, frame_idx, sample_idx, names):
     detections = []
-    
-    #Optional for saving demo video with box hgihlighted
-    '''fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    demo_out = cv2.VideoWriter(str(OUTPUT_DIR / f"demo_{video_name}.mp4"), fourcc, fps, (width, height))'''
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Run YOLO detection
-        results = model(frame)[0]  # Only take first result
+    for result in results.boxes:
+        cls_id = int(result.cls)
+        label = names[cls_id]
 
-        for result in results.boxes:
-            cls_id = int(result.cls)
-            label = model.names[cls_id]
-
-            # Filter detections to include only box or package and confidence threshold
-            if label.lower() in ["box", "package"]:
-                conf = float(result.conf[0])
-                if conf < CONFIDENCE_THRESHOLD:
-                    continue
-                x1, y1, x2, y2 = map(int, result.xyxy[0])
-                detections.append({
+        # Filter detections to include only box or package and confidence threshold
+        if label.lower() in ["box", "package"]:
+            conf = float(result.conf[0])
+            if conf < CONFIDENCE_THRESHOLD:
+                continue
+            x1, y1, x2, y2 = map(int, result.xyxy[0])
+            detections.append(
+                {
                     "frame": frame_idx,
+                    "sample_index": sample_idx,
                     "label": label,
                     "confidence": conf,
-                    "bbox": [x1, y1, x2, y2]
-                })
-
-                # Draw bounding box and label on the frame
-                '''cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                label_text = f"{label}: {conf:.2f}"
-                cv2.putText(frame, label_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            
-        demo_out.write(frame)'''
-
-        frame_idx += 1
-
-    cap.release()
-    #demo_out.release()
-    # Save to JSON
-    out_path = OUTPUT_DIR / f"detections_{video_name}.json"
-    with open(out_path, "w") as f:
-        json.dump(detections, f, indent=2)
-
-def process_all_videos():
-    video_paths = glob('data/raw/**/*.mp4', recursive=True)
-    for video_path in tqdm(video_paths, desc="Running object detection"):
-        detect_objects_in_video(Path(video_path))
+                    "bbox": [x1, y1, x2, y2],
+                }
+            )
+    return detections
+
+
+def detect_objects_in_frame(frame, frame_idx, sample_idx=None, model=None):
+    """Detections for one frame. `model` is anything with the ultralytics call
+    interface and `names`; defaults to the trained YOLO model."""
+    if model is None:
+        model = get_model()
+    # Run YOLO detection
+    with timer("detect.inference"):
+        results = model(frame)[0]  # Only take first result
+    if sample_idx is None:
+        sample_idx = frame_idx
+    with timer("detect.postprocess"):
+        return results_to_detections(results, frame_idx, sample_idx, model.names)
+
+
+def detect_objects_in_batch(frames, frame_indices, sample_indices=None, model=None):
+    """Run YOLO once on a list of frames; returns one detection list per frame."""
+    if model is None:
+        model = get_model()
+    if sample_indices is None:
+        sample_indices = frame_indices
+    if len(frames) == 1:
+        return [detect_objects_in_frame(frames[0], frame_indices[0], sample_indices[0], model)]
+    with timer("detect.inference"):
+        batch_results = model(list(frames))
+    with timer("detect.postprocess"):
+        return [
+            results_to_detections(results, frame_idx, sample_idx, model.names)
+            for results, frame_idx, sample_idx in zip(batch_results, frame_indices, sample_indices)
+        ]
+
+
+class DetectionStage(FrameStage):
+    """Runs YOLO (or the given stand-in `model`) on every frame, `batch_size`
+    frames per model call, and writes detections_<video>.<output_format>.
+
+    Detections are written incrementally (see `storage.ArtifactWriter`), so
+    memory stays flat, and with a `resume_key` an interrupted video resumes
+    after the last flushed frame. `finish` returns the number of detections
+    written, or the detections themselves when `output_dir` is None.
+
+    With an `InferenceClient` as `client` the frames are sent to a running
+    inference server instead of a model in this process. Frames marked
+    `static` by a motion gate reuse the detections of the last frame the
+    model ran on. The model sees `frame.model_input` (downscaled by a
+    ResizeStage, if any); bboxes are saved in source pixels together with the
+    source frame size.
+    """
+
+    def __init__(
+        self,
+        output_dir=OUTPUT_DIR,
+        batch_size=BATCH_SIZE,
+        output_format=OUTPUT_FORMAT,
+        model=None,
+        client=None,
+        flush_every=FLUSH_EVERY,
+        resume_key=None,
+    ):
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.batch_size = max(1, batch_size)
+        self.output_format = output_format
+        self.model = model
+        self.client = client
+        self.flush_every = flush_every
+        self.resume_key = resume_key
+
+    def start(self, video):
+        self.video = video
+        self.detections = None
+        self.writer = None
+        if self.output_dir is None:
+            self.detections = []
+        else:
+            out_path = detections_path(self.output_dir, video.name, self.output_format)
+            self.writer = detections_writer(out_path, self.flush_every, self.resume_key)
+            self.resume_frame = self.writer.resume_frame
+        self.pending = []  # (frame, reuse previous detections)
+        self.pending_live = 0
+        self.last_detections = None
+        self.reused = 0
+
+    def process(self, frame):
+        reuse = frame.static and (self.last_detections is not None or self.pending_live > 0)
+        self.pending.append((frame, reuse))
+        self.pending_live += not reuse
+        if self.pending_live >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        live = [frame for frame, reuse in self.pending if not reuse]
+        results = iter(
+            self.run_detector(
+                [frame.model_input for frame in live],
+                [frame.index for frame in live],
+                [frame.sample_index for frame in live],
+            )
+            if live
+            else []
+        )
+        for frame, reuse in self.pending:
+            if reuse:
+                frame_detections = [
+                    dict(det, frame=frame.index, sample_index=frame.sample_index)
+                    for det in self.last_detections
+                ]
+                self.reused += 1
+                count("reused_frames")
+            else:
+                frame_detections = self.last_detections = to_source(
+                    next(results), frame.scale, self.video.width, self.video.height
+                )
+            self.emit(frame, frame_detections)
+        self.pending = []
+        self.pending_live = 0
+
+    def emit(self, frame, frame_detections):
+        count("detections", len(frame_detections))
+        if self.writer is not None:
+            self.writer.write_frame(frame.index, frame_detections)
+        else:
+            self.detections.extend(frame_detections)
+
+    def run_detector(self, frames, frame_indices, sample_indices):
+        if self.client is not None:
+            with timer("detect.inference"):
+                return self.client.detect(frames, frame_indices, sample_indices)
+        return detect_objects_in_batch(frames, frame_indices, sample_indices, self.model)
+
+    def finish(self):
+        self.flush()
+        if self.writer is None:
+            return self.detections
+        self.writer.close()
+        return self.writer.count
+
+
+class TrackingDetectionStage(DetectionStage):
+    """Detect-then-track: the detector runs every `detect_every` frames, or
+    earlier as soon as a tracked box is lost, and optical flow carries the
+    boxes across the frames in between.
+
+    Every record gets a `source` field: "detect" for detector output, "track"
+    for boxes carried by the tracker (confidence scaled by track quality).
+    Tracking runs on the model input too, so it gets cheaper with a ResizeStage.
+    """
+
+    def __init__(
+        self,
+        output_dir=OUTPUT_DIR,
+        detect_every=DETECT_EVERY,
+        output_format=OUTPUT_FORMAT,
+        model=None,
+        client=None,
+        flush_every=FLUSH_EVERY,
+        resume_key=None,
+    ):
+        super().__init__(output_dir, 1, output_format, model, client, flush_every, resume_key)
+        self.detect_every = max(1, detect_every)
+
+    def start(self, video):
+        super().start(video)
+        self.trackers = []
+        self.prev_gray = None
+        self.since_detect = None
+        self.detector_calls = 0
+
+    def process(self, frame):
+        if frame.static and self.last_detections is not None:
+            self.emit(
+                frame,
+                [
+                    dict(det, frame=frame.index, sample_index=frame.sample_index)
+                    for det in self.last_detections
+                ],
+            )
+            self.reused += 1
+            count("reused_frames")
+            return
+
+        gray = to_gray(frame.model_input)
+        need_detect = self.since_detect is None or self.since_detect >= self.detect_every
+        if not need_detect:
+            with timer("track"):
+                for tracker in self.trackers:
+                    tracker.update(self.prev_gray, gray)
+            need_detect = any(tracker.lost for tracker in self.trackers)
+
+        if need_detect:
+            detections = self.run_detector(
+                [frame.model_input], [frame.index], [frame.sample_index]
+            )[0]
+            for det in detections:
+                det["source"] = "detect"
+            self.trackers = [BoxTracker(det, gray) for det in detections]
+            self.detector_calls += 1
+            count("detector_calls")
+            self.since_detect = 1
+        else:
+            detections = [
+                tracker.record(frame.index, frame.sample_index) for tracker in self.trackers
+            ]
+            self.since_detect += 1
+        detections = to_source(detections, frame.scale, self.video.width, self.video.height)
+        self.emit(frame, detections)
+        self.last_detections = detections
+        self.prev_gray = gray
+
+
+def detection_params(
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    detect_every=DETECT_EVERY,
+    motion_threshold=None,
+    backend=DETECTOR_BACKEND,
+    inference_max_side=INFERENCE_MAX_SIDE,
+    server=None,
+):
+    """Everything besides the video that determines the detections
+    (batch size doesn't change the results). With a `server`, the detector is
+    the one it serves, whatever `backend` says."""
+    return {
+        "detector": (
+            served_model(server, "detect")
+            if server is not None
+            else {"backend": backend, "weights": str(detector_weights(backend))}
+        ),
+        "confidence_threshold": CONFIDENCE_THRESHOLD,
+        "detect_every": detect_every,
+        "motion_gate": motion_params(motion_threshold),
+        "resize": resize_params(inference_max_side),
+        "target_fps": target_fps,
+        "stride": stride,
+        "output_format": output_format,
+    }
+
+
+def detect_objects_in_video(
+    video_path,
+    batch_size=BATCH_SIZE,
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    server=None,
+    detect_every=DETECT_EVERY,
+    motion_threshold=None,
+    flush_every=FLUSH_EVERY,
+    backend=DETECTOR_BACKEND,
+    inference_max_side=INFERENCE_MAX_SIDE,
+):
+    """Returns the number of detections saved, or None if the video could not be opened."""
+    resume_key = detection_params(
+        target_fps,
+        stride,
+        output_format,
+        detect_every,
+        motion_threshold,
+        backend,
+        inference_max_side,
+        server,
+    )
+    client = connect(server)
+    try:
+        model = get_model(backend) if client is None else None
+        if detect_every > 1:
+            stage = TrackingDetectionStage(
+                detect_every=detect_every,
+                output_format=output_format,
+                model=model,
+                client=client,
+                flush_every=flush_every,
+                resume_key=resume_key,
+            )
+        else:
+            stage = DetectionStage(
+                batch_size=batch_size,
+                output_format=output_format,
+                model=model,
+                client=client,
+                flush_every=flush_every,
+                resume_key=resume_key,
+            )
+        stages = with_resize(with_motion_gate([stage], motion_threshold), inference_max_side)
+        results = run_stages(Path(video_path), stages, target_fps, stride)
+    finally:
+        if client is not None:
+            client.close()
+    return results[-1] if results is not None else None
+
+
+def detection_cache(
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    force=False,
+    detect_every=DETECT_EVERY,
+    motion_threshold=None,
+    backend=DETECTOR_BACKEND,
+    inference_max_side=INFERENCE_MAX_SIDE,
+    server=None,
+):
+    """Detections depend on the video, the weights file and `detection_params`."""
+    params = detection_params(
+        target_fps,
+        stride,
+        output_format,
+        detect_every,
+        motion_threshold,
+        backend,
+        inference_max_side,
+        server,
+    )
+    return StageCache("detection", params, enabled=not force)
+
+
+def detection_inputs(video_path, backend=DETECTOR_BACKEND, server=None):
+    """The video, plus the local weights file (a server's weights hash is in the params)."""
+    if server is not None:
+        return [Path(video_path)]
+    return [Path(video_path), detector_weights(backend)]
+
+
+def detection_outputs(video_path, output_format=OUTPUT_FORMAT):
+    return [detections_path(OUTPUT_DIR, Path(video_path).stem, output_format)]
+
+
+@app.command()
+def process_all_videos(
+    batch_size: int = BATCH_SIZE,
+    target_fps: float | None = None,
+    stride: int | None = None,
+    workers: int = 1,
+    output_format: str = OUTPUT_FORMAT,
+    force: bool = False,
+    server: str | None = SERVER_OPTION,
+    detect_every: int = typer.Option(
+        DETECT_EVERY,
+        help="Run the detector every K frames and track boxes in between (1 = detect every frame)",
+    ),
+    motion_threshold: float | None = MOTION_THRESHOLD_OPTION,
+    backend: str = typer.Option(
+        DETECTOR_BACKEND,
+        help="torch, onnx or onnx-int8 (export first with `python -m ObjectMD.onnx_backend`)",
+    ),
+    inference_max_side: int = INFERENCE_MAX_SIDE_OPTION,
+):
+    video_paths = list_videos()
+    run_cached(
+        detection_cache(
+            target_fps,
+            stride,
+            output_format,
+            force,
+            detect_every,
+            motion_threshold,
+            backend,
+            inference_max_side,
+            server,
+        ),
+        partial(
+            detect_objects_in_video,
+            batch_size=batch_size,
+            target_fps=target_fps,
+            stride=stride,
+            output_format=output_format,
+            server=server,
+            detect_every=detect_every,
+            motion_threshold=motion_threshold,
+            backend=backend,
+            inference_max_side=inference_max_side,
+        ),
+        video_paths,
+        name_fn=lambda video_path: Path(video_path).stem,
+        inputs_fn=partial(detection_inputs, backend=backend, server=server),
+        outputs_fn=partial(detection_outputs, output_format=output_format),
+        workers=workers,
+        desc="Running object detection",
+    )
+
 
 if __name__ == "__main__":
-    process_all_videos()
\ No newline at end of file
+    app()
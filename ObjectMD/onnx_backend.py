@@ -0,0 +1,228 @@
+import ast
+import os
+from pathlib import Path
+import shutil
+
+import numpy as np
+import typer
+
+from ObjectMD.object_detection import ONNX_INT8_PATH, ONNX_PATH, WEIGHTS_PATH
+
+INPUT_SIZE = 640  # square network input, as the model was trained
+CANDIDATE_CONFIDENCE = 0.25  # ultralytics' predict default; CONFIDENCE_THRESHOLD comes after
+IOU_THRESHOLD = 0.7  # ultralytics' NMS default
+MAX_DETECTIONS = 300
+MAX_WH = 7680  # class offset so NMS never suppresses across classes
+PAD_VALUE = 114
+
+# 0 lets ONNX Runtime use one thread per physical core; lower it when running
+# several --workers per node so they don't oversubscribe the CPU
+INTRA_OP_THREADS = int(os.environ.get("OBJECTMD_ONNX_THREADS", "0"))
+INTER_OP_THREADS = 1  # the graph is a single chain of convolutions
+# OpenVINO is used when onnxruntime-openvino is installed, plain CPU otherwise
+PROVIDERS = ("OpenVINOExecutionProvider", "CPUExecutionProvider")
+
+app = typer.Typer()
+
+
+# === PRE- AND POSTPROCESSING (mirrors ultralytics) ===
+def letterbox(image, size=(INPUT_SIZE, INPUT_SIZE)):
+    """Resize keeping the aspect ratio and pad to `size` (h, w) with gray.
+
+    Returns the padded BGR image, the scale and the (left, top) padding.
+    """
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = min(size[0] / height, size[1] / width)
+    new_w, new_h = round(width * scale), round(height * scale)
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    image = cv2.copyMakeBorder(
+        image,
+        top,
+        bottom,
+        left,
+        right,
+        cv2.BORDER_CONSTANT,
+        value=(PAD_VALUE, PAD_VALUE, PAD_VALUE),
+    )
+    return image, scale, (left, top)
+
+
+def to_tensor(images):
+    """Letterboxed BGR uint8 images -> NCHW float32 RGB in [0, 1]."""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD):
+    """Indices of the boxes kept by greedy non-maximum suppression, best first."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(
+    output,
+    scale,
+    pad,
+    image_shape,
+    conf_threshold=CANDIDATE_CONFIDENCE,
+    iou_threshold=IOU_THRESHOLD,
+    max_det=MAX_DETECTIONS,
+):
+    """One image's raw YOLOv8 output (4 + classes, anchors) -> (xyxy, conf, cls)
+    in original image pixels, best first."""
+    scores = output[4:].T
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(cls)), cls]
+    keep = conf > conf_threshold
+    cx, cy, w, h = output[:4, keep]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    conf, cls = conf[keep], cls[keep]
+
+    kept = nms(boxes + cls[:, None] * MAX_WH, conf, iou_threshold)[:max_det]
+    boxes, conf, cls = boxes[kept], conf[kept], cls[kept]
+
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes /= scale
+    height, width = image_shape[:2]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes, conf, cls
+
+
+# === DETECTOR ===
+class OnnxBox:
+    def __init__(self, cls_id, conf, xyxy):
+        self.cls = np.float32(cls_id)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class OnnxResults:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class OnnxDetector:
+    """The YOLO detector exported to ONNX and run by ONNX Runtime on the CPU.
+
+    It has the same call interface as ultralytics: `model(frames)` returns one
+    result with `.boxes` per frame, and `names` maps class ids to labels. That
+    lets DetectionStage, the inference server and the benchmarks use it as is.
+    The confidence threshold and the box/package filter stay in
+    `results_to_detections`.
+    """
+
+    def __init__(
+        self,
+        path: Path = ONNX_PATH,
+        intra_op_threads: int = INTRA_OP_THREADS,
+        inter_op_threads: int = INTER_OP_THREADS,
+        providers=PROVIDERS,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        available = ort.get_available_providers()
+        self.session = ort.InferenceSession(
+            str(path), options, providers=[p for p in providers if p in available]
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2:]
+        self.input_size = (
+            (height, width)
+            if isinstance(height, int) and isinstance(width, int)
+            else (INPUT_SIZE, INPUT_SIZE)
+        )
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"])  # written by ultralytics export
+
+    def run(self, images):
+        return self.session.run(None, {self.input_name: to_tensor(images)})[0]
+
+    def __call__(self, frames):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        boxed = [letterbox(frame, self.input_size) for frame in frames]
+        images = [image for image, _, _ in boxed]
+        if self.dynamic_batch:
+            outputs = self.run(images)
+        else:
+            outputs = np.concatenate([self.run([image]) for image in images])
+
+        results = []
+        for output, frame, (_, scale, pad) in zip(outputs, frames, boxed):
+            boxes, conf, cls = postprocess(output, scale, pad, frame.shape)
+            results.append(OnnxResults([OnnxBox(c, s, b) for b, s, c in zip(boxes, conf, cls)]))
+        return results
+
+
+# === EXPORT ===
+def export_onnx(
+    weights: Path = WEIGHTS_PATH, output: Path = ONNX_PATH, imgsz: int = INPUT_SIZE
+) -> Path:
+    """Export the trained weights to ONNX with a dynamic batch dimension."""
+    from ultralytics import YOLO
+
+    exported = Path(
+        YOLO(str(weights)).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    )
+    if exported != Path(output):
+        shutil.move(exported, output)
+    return Path(output)
+
+
+def quantize_onnx(path: Path = ONNX_PATH, output: Path = ONNX_INT8_PATH) -> Path:
+    """INT8 dynamic quantization of the weights; activations stay float."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(path), str(output), weight_type=QuantType.QUInt8)
+    # Keep the class names and input size ultralytics stored in the metadata
+    source, quantized = onnx.load(str(path)), onnx.load(str(output))
+    onnx.helper.set_model_props(quantized, {p.key: p.value for p in source.metadata_props})
+    onnx.save(quantized, str(output))
+    return Path(output)
+
+
+@app.command()
+def main(
+    weights: Path = WEIGHTS_PATH,
+    output: Path = ONNX_PATH,
+    imgsz: int = INPUT_SIZE,
+    int8: bool = typer.Option(False, help=f"Also write an INT8-quantized {ONNX_INT8_PATH.name}"),
+):
+    """Export the box detector to ONNX for `--backend onnx` (and `onnx-int8`)."""
+    onnx_path = export_onnx(weights, output, imgsz)
+    print(f"✅ Exported {weights} to {onnx_path}")
+    if int8:
+        int8_path = quantize_onnx(onnx_path, output.with_name(f"{output.stem}.int8.onnx"))
+        print(f"✅ Quantized {onnx_path} to {int8_path}")
+
+
+if __name__ == "__main__":
+    app()
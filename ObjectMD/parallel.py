@@ -0,0 +1,105 @@
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import traceback
+
+from tqdm import tqdm
+
+from ObjectMD import metrics as run_metrics
+
+
+class ItemsFailed(RuntimeError):
+    """Raised at the end of a run when some items failed; `failures` maps each
+    of them to its formatted traceback."""
+
+    def __init__(self, failures):
+        super().__init__(
+            f"{len(failures)} item(s) failed: {', '.join(str(item) for item in failures)}"
+        )
+        self.failures = failures
+
+
+def _call(fn, item):
+    try:
+        return True, fn(item)
+    except Exception:  # noqa: BLE001 - collected, then raised by raise_failures
+        return False, traceback.format_exc()
+
+
+def run_per_video(
+    fn: Callable,
+    items: Iterable,
+    workers: int = 1,
+    desc: str | None = None,
+    initializer: Callable | None = None,
+    metrics: str | None = None,
+    name_fn: Callable = run_metrics.item_name,
+):
+    """Run `fn(item)` for every item, serially or on a pool of `workers` processes.
+
+    Workers are spawned (not forked), so each one imports the pipeline modules
+    and loads its own YOLO model / MediaPipe Pose instead of sharing the
+    parent's. `fn` and `initializer` must be picklable (module-level functions
+    or functools.partial of them).
+
+    Returns `(results, failures)`: a dict mapping item -> result for the items
+    that succeeded and a dict mapping item -> formatted traceback for the rest.
+    One failing item doesn't stop the others; callers record the results,
+    then call `raise_failures`. Progress is reported by a single tqdm bar in
+    the parent.
+
+    With a `metrics` stage name (and metrics enabled, see ObjectMD.metrics)
+    every call is timed in its worker and the per-video metrics plus a run
+    summary are written under reports/metrics, named by `name_fn(item)`.
+    """
+    items = list(items)
+    results = {}
+    failures = {}
+    run = (
+        run_metrics.RunMetrics(metrics, name_fn)
+        if metrics is not None and run_metrics.ENABLED and items
+        else None
+    )
+    if run is not None:
+        fn = run.wrap(fn)
+
+    if workers <= 1:
+        if initializer is not None:
+            initializer()
+        for item in tqdm(items, desc=desc):
+            ok, value = _call(fn, item)
+            (results if ok else failures)[item] = value
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=initializer
+        ) as pool:
+            futures = {pool.submit(_call, fn, item): item for item in items}
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                item = futures[future]
+                try:
+                    ok, value = future.result()
+                except Exception:  # noqa: BLE001 - collected like failures in _call
+                    # The worker itself died (e.g. killed by the OOM killer)
+                    ok, value = False, traceback.format_exc()
+                (results if ok else failures)[item] = value
+
+    report_failures(failures)
+    if run is not None:
+        results = run.finish(results, failures)
+    return results, failures
+
+
+def report_failures(failures):
+    if not failures:
+        return
+    print(f"⚠️ {len(failures)} item(s) failed:")
+    for item, error in failures.items():
+        last_line = error.strip().splitlines()[-1] if error else ""
+        print(f" - {item}: {last_line}")
+
+
+def raise_failures(failures):
+    """Fails the run (non-zero exit from the CLIs) if any item failed."""
+    if failures:
+        raise ItemsFailed(failures)
@@ -0,0 +1,277 @@
+from functools import partial
+from pathlib import Path
+
+import typer
+
+from ObjectMD import object_detection, pose_estimation
+from ObjectMD.catalog import load_catalog
+from ObjectMD.frames import BACKEND, STORE_MAX_SIDE, frame_stage, frames_cache, frames_outputs
+from ObjectMD.inference_server import SERVER_OPTION, connect
+from ObjectMD.motion import MOTION_THRESHOLD_OPTION, with_motion_gate
+from ObjectMD.object_detection import (
+    BATCH_SIZE,
+    DETECT_EVERY,
+    DETECTOR_BACKEND,
+    DetectionStage,
+    TrackingDetectionStage,
+    detection_cache,
+    detection_inputs,
+    detection_outputs,
+    detection_params,
+    get_model,
+)
+from ObjectMD.parallel import raise_failures, run_per_video
+from ObjectMD.pose_estimation import PoseStage, pose_cache, pose_outputs, pose_params
+from ObjectMD.preprocess import INFERENCE_MAX_SIDE, INFERENCE_MAX_SIDE_OPTION, with_resize
+from ObjectMD.video_pipeline import THREADED, run_stages
+
+app = typer.Typer()
+
+
+def build_stages(
+    stage_names,
+    batch_size: int = BATCH_SIZE,
+    detection_format: str = object_detection.OUTPUT_FORMAT,
+    pose_format: str = pose_estimation.OUTPUT_FORMAT,
+    client=None,
+    detect_every: int = DETECT_EVERY,
+    motion_threshold: float | None = None,
+    detection_key=None,
+    pose_key=None,
+    frame_backend: str = BACKEND,
+    frame_max_side: int | None = STORE_MAX_SIDE,
+    model=None,
+    inference_max_side: int | None = INFERENCE_MAX_SIDE,
+):
+    """The stages for `stage_names`; the keys let interrupted outputs resume."""
+    stages = []
+    if detect_every > 1 and "detection" in stage_names:
+        stages.append(
+            TrackingDetectionStage(
+                detect_every=detect_every,
+                output_format=detection_format,
+                model=model,
+                client=client,
+                resume_key=detection_key,
+            )
+        )
+    elif "detection" in stage_names:
+        stages.append(
+            DetectionStage(
+                batch_size=batch_size,
+                output_format=detection_format,
+                model=model,
+                client=client,
+                resume_key=detection_key,
+            )
+        )
+    if "pose" in stage_names:
+        stages.append(PoseStage(output_format=pose_format, client=client, resume_key=pose_key))
+    if "frames" in stage_names:
+        stages.append(frame_stage(frame_backend, frame_max_side))
+    # One resize and one gate in front of both models, so detection and pose share
+    # the downscaled frame and skip the same frames
+    stages = with_motion_gate(stages, motion_threshold)
+    if {"detection", "pose"} & set(stage_names):
+        stages = with_resize(stages, inference_max_side)
+    return stages
+
+
+def run_video(
+    job,
+    batch_size,
+    target_fps,
+    stride,
+    detection_format,
+    pose_format,
+    server=None,
+    detect_every=DETECT_EVERY,
+    motion_threshold=None,
+    threaded=THREADED,
+    frame_backend=BACKEND,
+    frame_max_side=STORE_MAX_SIDE,
+    detector_backend=DETECTOR_BACKEND,
+    inference_max_side=INFERENCE_MAX_SIDE,
+):
+    video_path, stage_names = job
+    detection_key = (
+        detection_params(
+            target_fps,
+            stride,
+            detection_format,
+            detect_every,
+            motion_threshold,
+            detector_backend,
+            inference_max_side,
+            server,
+        )
+        if "detection" in stage_names
+        else None
+    )
+    pose_key = (
+        pose_params(
+            target_fps,
+            stride,
+            pose_format,
+            server,
+            motion_threshold=motion_threshold,
+            inference_max_side=inference_max_side,
+        )
+        if "pose" in stage_names
+        else None
+    )
+    client = connect(server)
+    try:
+        model = (
+            get_model(detector_backend) if client is None and "detection" in stage_names else None
+        )
+        stages = build_stages(
+            stage_names,
+            batch_size,
+            detection_format,
+            pose_format,
+            client,
+            detect_every,
+            motion_threshold,
+            detection_key,
+            pose_key,
+            frame_backend,
+            frame_max_side,
+            model,
+            inference_max_side,
+        )
+        results = run_stages(Path(video_path), stages, target_fps, stride, threaded)
+    finally:
+        if client is not None:
+            client.close()
+    return stage_names if results is not None else None
+
+
+@app.command()
+def main(
+    detect: bool = True,
+    pose: bool = True,
+    frames: bool = True,
+    batch_size: int = BATCH_SIZE,
+    target_fps: float | None = None,
+    stride: int | None = None,
+    workers: int = 1,
+    detection_format: str = object_detection.OUTPUT_FORMAT,
+    pose_format: str = pose_estimation.OUTPUT_FORMAT,
+    force: bool = False,
+    server: str | None = SERVER_OPTION,
+    detect_every: int = DETECT_EVERY,
+    motion_threshold: float | None = MOTION_THRESHOLD_OPTION,
+    threaded: bool = typer.Option(
+        THREADED, help="Decode on a background thread while the models run"
+    ),
+    frame_backend: str = typer.Option(
+        BACKEND, help="jpeg: one file per frame; memmap: one memory-mapped array per video"
+    ),
+    frame_max_side: int | None = STORE_MAX_SIDE,
+    detector_backend: str = typer.Option(DETECTOR_BACKEND, help="torch, onnx or onnx-int8"),
+    inference_max_side: int = INFERENCE_MAX_SIDE_OPTION,
+):
+    """Decode every raw video once and feed detection, pose and frame export from it.
+
+    Only the stages whose cached output is stale are run for each video, and a
+    video whose stages are all up to date is not decoded at all.
+    """
+    catalog = load_catalog()
+    video_paths = [str(path) for path in catalog.paths()]
+    labeled_videos = {path.name for path in catalog.paths(labeled_only=True)}
+
+    print(f"[INFO] Found {len(video_paths)} videos to process.")
+
+    # stage name -> (cache, inputs_fn, outputs_fn)
+    stages = {}
+    if detect:
+        stages["detection"] = (
+            detection_cache(
+                target_fps,
+                stride,
+                detection_format,
+                force,
+                detect_every,
+                motion_threshold,
+                detector_backend,
+                inference_max_side,
+                server,
+            ),
+            partial(detection_inputs, backend=detector_backend, server=server),
+            partial(detection_outputs, output_format=detection_format),
+        )
+    if pose:
+        stages["pose"] = (
+            pose_cache(
+                target_fps,
+                stride,
+                pose_format,
+                force,
+                server,
+                motion_threshold=motion_threshold,
+                inference_max_side=inference_max_side,
+            ),
+            lambda video_path: [Path(video_path)],
+            partial(pose_outputs, output_format=pose_format),
+        )
+    if frames:
+        stages["frames"] = (
+            frames_cache(force, frame_backend, frame_max_side),
+            lambda video_path: [Path(video_path)],
+            partial(frames_outputs, backend=frame_backend),
+        )
+
+    jobs = []
+    for video_path in video_paths:
+        stage_names = []
+        for name, (cache, inputs_fn, outputs_fn) in stages.items():
+            # Frame export is only needed for labeled videos (see frames.main)
+            if name == "frames" and Path(video_path).name not in labeled_videos:
+                continue
+            if not cache.is_up_to_date(
+                Path(video_path).stem, inputs_fn(video_path), outputs_fn(video_path)
+            ):
+                stage_names.append(name)
+        if stage_names:
+            jobs.append((video_path, tuple(stage_names)))
+    print(f"[INFO] {len(jobs)} videos have stale stages.")
+
+    results, failures = run_per_video(
+        partial(
+            run_video,
+            batch_size=batch_size,
+            target_fps=target_fps,
+            stride=stride,
+            detection_format=detection_format,
+            pose_format=pose_format,
+            server=server,
+            detect_every=detect_every,
+            motion_threshold=motion_threshold,
+            threaded=threaded,
+            frame_backend=frame_backend,
+            frame_max_side=frame_max_side,
+            detector_backend=detector_backend,
+            inference_max_side=inference_max_side,
+        ),
+        jobs,
+        workers=workers,
+        desc="Running video pipeline",
+        metrics="pipeline",
+    )
+
+    for (video_path, stage_names), result in results.items():
+        if result is None:
+            continue
+        for name in stage_names:
+            cache, inputs_fn, outputs_fn = stages[name]
+            cache.record(Path(video_path).stem, inputs_fn(video_path), outputs_fn(video_path))
+    for cache, _, _ in stages.values():
+        cache.save()
+    raise_failures(failures)
+
+    print("✅ All done.")
+
+
+if __name__ == "__main__":
+    app()
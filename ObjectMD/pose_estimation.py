@@ -1,86 +1,481 @@
 # src/features/pose_estimation.py
 
-from glob import glob
-import json
+from functools import cache, partial
+from importlib.metadata import version
 from pathlib import Path
 
-import cv2
-import mediapipe as mp
-from tqdm import tqdm
+import numpy as np
+import typer
 
-# Initialize MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.catalog import list_videos
+from ObjectMD.inference_server import SERVER_OPTION, connect, served_model
+from ObjectMD.metrics import count, timer
+from ObjectMD.motion import MOTION_THRESHOLD_OPTION, motion_params, with_motion_gate
+from ObjectMD.preprocess import (
+    INFERENCE_MAX_SIDE,
+    INFERENCE_MAX_SIDE_OPTION,
+    resize_params,
+    with_resize,
+)
+from ObjectMD.storage import (
+    FLUSH_EVERY,
+    find_detections,
+    load_detections,
+    pose_path,
+    pose_writer,
+)
+from ObjectMD.video_pipeline import FrameStage, run_stages
+
+MIN_DETECTION_CONFIDENCE = 0.5
+VISIBILITY_THRESHOLD = 0.5
 
 # Define target output folder
 OUTPUT_DIR = Path("data/processed/pose_data")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_FORMAT = "json"  # json, parquet or npz
+
+# ROI mode: pose runs on a crop around the detected box (or the last wrists)
+BOX_DIR = Path("data/processed/objects")
+ROI_PADDING = 1.0  # added on every side, as a fraction of the box size
+ROI_MIN_SIZE = 0.3  # smallest crop side, as a fraction of the shorter frame side
+ROI_MAX_SIDE = 320  # crops are downscaled to at most this many pixels per side
+ROI_MAX_AGE = 10  # frames a detection stays valid as ROI for later frames
+
+app = typer.Typer()
+
+
+@cache
+def get_pose(static_image_mode: bool = False):
+    """MediaPipe Pose, created on first use and cached per process.
+
+    The default instance tracks landmarks across consecutive frames of one
+    video; `static_image_mode` gives an instance that treats every frame on
+    its own, for callers that interleave frames from several sources.
+    """
+    import mediapipe as mp
+
+    mp_pose = mp.solutions.pose
+    return mp_pose.Pose(
+        static_image_mode=static_image_mode, min_detection_confidence=MIN_DETECTION_CONFIDENCE
+    )
+
 
 def extract_hand_keypoints_from_frame(results):
-    
-    keypoints = {
-        "left_wrist": [None, None],
-        "right_wrist": [None, None],
-        "confidence": [0.0, 0.0]
-    }
+
+    keypoints = {"left_wrist": [None, None], "right_wrist": [None, None], "confidence": [0.0, 0.0]}
 
     if results.pose_landmarks:
-        
         for idx, name in zip([15, 16], ["left_wrist", "right_wrist"]):
             landmark = results.pose_landmarks.landmark[idx]
-            if landmark.visibility > 0.5:
+            if landmark.visibility > VISIBILITY_THRESHOLD:
                 keypoints[name] = [landmark.x, landmark.y]
                 keypoints["confidence"][0 if name == "left_wrist" else 1] = landmark.visibility
     return keypoints
 
-def process_video(video_path):
-    
-    cap = cv2.VideoCapture(video_path)
-    frame_data = []
-    frame_idx = 0
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+def estimate_keypoints(image, static_image_mode=False):
+    """Wrist keypoints of one BGR frame."""
+    import cv2
 
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(frame_rgb)
+    # Convert BGR to RGB
+    with timer("color_conversion"):
+        frame_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    with timer("pose.inference"):
+        results = get_pose(static_image_mode).process(frame_rgb)
+    with timer("pose.postprocess"):
+        return extract_hand_keypoints_from_frame(results)
 
-        keypoints = extract_hand_keypoints_from_frame(results)
-        frame_data.append({
-            "frame_index": frame_idx,
-            **keypoints
-        })
-        frame_idx += 1
 
-    cap.release()
-    return frame_data
+class PoseStage(FrameStage):
+    """Runs MediaPipe Pose on every frame and writes <video>_pose.<output_format>
+    incrementally, resuming an interrupted video when given a `resume_key`.
+    With `output_dir` None the frames are kept in memory and returned instead.
 
-def main():
-    video_paths = glob("data/raw/**/*.mp4", recursive=True)
+    With an `InferenceClient` as `client` the frames are sent to a running
+    inference server, which runs Pose in static image mode. Frames marked
+    `static` by a motion gate repeat the previous frame's keypoints. Pose
+    sees `frame.model_input`; wrists are normalized, so downscaling doesn't
+    change their coordinates.
+    """
+
+    def __init__(
+        self,
+        output_dir=OUTPUT_DIR,
+        output_format=OUTPUT_FORMAT,
+        client=None,
+        flush_every=FLUSH_EVERY,
+        resume_key=None,
+    ):
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.output_format = output_format
+        self.client = client
+        self.flush_every = flush_every
+        self.resume_key = resume_key
+
+    def start(self, video):
+        self.video = video
+        self.frame_data = None
+        self.writer = None
+        if self.output_dir is None:
+            self.frame_data = []
+        else:
+            out_path = pose_path(self.output_dir, video.name, self.output_format)
+            self.writer = pose_writer(out_path, video.path.name, self.flush_every, self.resume_key)
+            self.resume_frame = self.writer.resume_frame
+        self.last_frame = None
+        self.reused = 0
+
+    def emit(self, frame, keypoints):
+        self.last_frame = {
+            "frame_index": frame.index,
+            "sample_index": frame.sample_index,
+            **keypoints,
+        }
+        count("pose_frames")
+        if self.writer is not None:
+            self.writer.write_frame(frame.index, [self.last_frame])
+        else:
+            self.frame_data.append(self.last_frame)
+
+    def reuse_previous(self, frame):
+        """For a static frame, repeat the previous keypoints; returns whether it did."""
+        if not (frame.static and self.last_frame is not None):
+            return False
+        self.emit(
+            frame,
+            {
+                name: value
+                for name, value in self.last_frame.items()
+                if name not in ("frame_index", "sample_index")
+            },
+        )
+        self.reused += 1
+        count("reused_frames")
+        return True
+
+    def keypoints_of(self, image, static_image_mode=False):
+        if self.client is not None:
+            with timer("pose.inference"):
+                return self.client.pose([image])[0]
+        return estimate_keypoints(image, static_image_mode)
+
+    def process(self, frame):
+        if self.reuse_previous(frame):
+            return
+        self.emit(frame, self.keypoints_of(frame.model_input))
+
+    def finish(self):
+        if self.writer is None:
+            return self.frame_data
+        self.writer.close()
+        return self.writer.count
+
+
+def pad_roi(box, width, height, padding=ROI_PADDING, min_size=ROI_MIN_SIZE):
+    """[x1, y1, x2, y2] grown by `padding` per side (and to at least `min_size`),
+    clipped to the frame, as ints."""
+    x1, y1, x2, y2 = box
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    min_side = min_size * min(width, height)
+    half_w = max((x2 - x1) * (1 + 2 * padding), min_side) / 2
+    half_h = max((y2 - y1) * (1 + 2 * padding), min_side) / 2
+    return [
+        int(max(cx - half_w, 0)),
+        int(max(cy - half_h, 0)),
+        int(min(cx + half_w, width)),
+        int(min(cy + half_h, height)),
+    ]
+
+
+def detection_rois(detections):
+    """Frame index -> union box of that frame's detections, as sorted arrays."""
+    if len(detections) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4))
+    boxes = detections.groupby("frame").agg(
+        x1=("x1", "min"), y1=("y1", "min"), x2=("x2", "max"), y2=("y2", "max")
+    )
+    return boxes.index.to_numpy(dtype=np.int64), boxes.to_numpy(dtype=np.float64)
+
+
+def crop_roi(image, roi, max_side=ROI_MAX_SIDE):
+    import cv2
+
+    x1, y1, x2, y2 = roi
+    crop = image[y1:y2, x1:x2]
+    scale = max_side / max(crop.shape[:2]) if max_side else 1.0
+    if scale < 1:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return crop
 
-    print(f"[INFO] Found {len(video_paths)} videos to process.")
 
-    for video_path in tqdm(video_paths):
-        video_name = Path(video_path).stem
-        out_path = OUTPUT_DIR / f"{video_name}_pose.json"
+def roi_to_frame(keypoints, roi, width, height):
+    """Wrists normalized to the crop -> normalized to the full frame."""
+    x1, y1, x2, y2 = roi
+    mapped = dict(keypoints, confidence=list(keypoints["confidence"]))
+    for name in ("left_wrist", "right_wrist"):
+        x, y = keypoints[name]
+        if x is not None:
+            mapped[name] = [(x1 + x * (x2 - x1)) / width, (y1 + y * (y2 - y1)) / height]
+    return mapped
 
-        if out_path.exists():
-            continue  # Skip if already processed
 
-        frame_data = process_video(video_path)
+class RoiPoseStage(PoseStage):
+    """PoseStage that only feeds MediaPipe a padded crop around the box.
 
-        output_json = {
-            "video": Path(video_path).name,
-            "frames": frame_data
+    The ROI comes from the saved detections of the video (latest detection at
+    most `ROI_MAX_AGE` frames old), else from the wrists found in the previous
+    frame; with neither, or when the crop yields no wrists, the full frame is
+    used (at model input size). Crops are cut from the full-resolution frame,
+    downscaled to `max_side` and jump between frames, so Pose runs in static
+    image mode. Wrists are mapped back to full-frame normalized coordinates,
+    so the output is interchangeable with PoseStage's.
+    """
+
+    def __init__(
+        self,
+        output_dir=OUTPUT_DIR,
+        output_format=OUTPUT_FORMAT,
+        client=None,
+        box_dir=BOX_DIR,
+        max_side=ROI_MAX_SIDE,
+        flush_every=FLUSH_EVERY,
+        resume_key=None,
+    ):
+        super().__init__(output_dir, output_format, client, flush_every, resume_key)
+        self.box_dir = Path(box_dir)
+        self.max_side = max_side
+
+    def start(self, video):
+        super().start(video)
+        box_file = find_detections(self.box_dir, video.name)
+        detections = load_detections(box_file) if box_file is not None else []
+        self.roi_frames, self.roi_boxes = detection_rois(detections)
+        self.last_wrists = None
+        self.roi_frames_used = 0
+
+    def roi_for(self, frame):
+        pos = np.searchsorted(self.roi_frames, frame.index, side="right") - 1
+        if pos >= 0 and frame.index - self.roi_frames[pos] <= ROI_MAX_AGE:
+            box = self.roi_boxes[pos]
+        elif self.last_wrists is not None:
+            box = [*self.last_wrists.min(axis=0), *self.last_wrists.max(axis=0)]
+        else:
+            return None
+        return pad_roi(box, self.video.width, self.video.height)
+
+    def process(self, frame):
+        if self.reuse_previous(frame):
+            return
+        keypoints = None
+        roi = self.roi_for(frame)
+        if roi is not None and roi[2] > roi[0] and roi[3] > roi[1]:
+            crop = crop_roi(frame.image, roi, self.max_side)
+            keypoints = roi_to_frame(
+                self.keypoints_of(crop, static_image_mode=True),
+                roi,
+                self.video.width,
+                self.video.height,
+            )
+            if keypoints["left_wrist"][0] is None and keypoints["right_wrist"][0] is None:
+                keypoints = None
+            else:
+                self.roi_frames_used += 1
+        if keypoints is None:
+            keypoints = self.keypoints_of(frame.model_input, static_image_mode=True)
+
+        wrists = [
+            keypoints[name]
+            for name in ("left_wrist", "right_wrist")
+            if keypoints[name][0] is not None
+        ]
+        self.last_wrists = (
+            np.array(wrists) * [self.video.width, self.video.height] if wrists else None
+        )
+        self.emit(frame, keypoints)
+
+
+def process_video(video_path, target_fps=None, stride=None):
+    stage = PoseStage(output_dir=None)
+    results = run_stages(Path(video_path), [stage], target_fps, stride)
+    return results[0] if results is not None else []
+
+
+def pose_info():
+    """The local Pose model: MediaPipe version and detection confidence."""
+    return {
+        "mediapipe": version("mediapipe"),
+        "min_detection_confidence": MIN_DETECTION_CONFIDENCE,
+    }
+
+
+def pose_params(
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    server=None,
+    roi=False,
+    roi_max_side=ROI_MAX_SIDE,
+    motion_threshold=None,
+    inference_max_side=INFERENCE_MAX_SIDE,
+):
+    """Everything besides the video that determines the pose output. With a
+    `server`, the model is the one it serves."""
+    return {
+        **(served_model(server, "pose") if server is not None else pose_info()),
+        "visibility_threshold": VISIBILITY_THRESHOLD,
+        "target_fps": target_fps,
+        "stride": stride,
+        "output_format": output_format,
+        # the inference server runs Pose per frame, without cross-frame tracking
+        "static_image_mode": server is not None or roi,
+        "roi": {
+            "padding": ROI_PADDING,
+            "min_size": ROI_MIN_SIZE,
+            "max_side": roi_max_side,
+            "max_age": ROI_MAX_AGE,
         }
+        if roi
+        else None,
+        "motion_gate": motion_params(motion_threshold),
+        "resize": resize_params(inference_max_side),
+    }
 
-        with open(out_path, "w") as f:
-            json.dump(output_json, f, indent=2)
+
+def estimate_pose_for_video(
+    video_path,
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    server=None,
+    roi=False,
+    roi_max_side=ROI_MAX_SIDE,
+    motion_threshold=None,
+    flush_every=FLUSH_EVERY,
+    inference_max_side=INFERENCE_MAX_SIDE,
+):
+    """Runs pose on one video and saves it; returns the number of frames saved,
+    or None if it could not be opened."""
+    resume_key = pose_params(
+        target_fps,
+        stride,
+        output_format,
+        server,
+        roi,
+        roi_max_side,
+        motion_threshold,
+        inference_max_side,
+    )
+    client = connect(server)
+    try:
+        if roi:
+            stage = RoiPoseStage(
+                output_format=output_format,
+                client=client,
+                max_side=roi_max_side,
+                flush_every=flush_every,
+                resume_key=resume_key,
+            )
+        else:
+            stage = PoseStage(
+                output_format=output_format,
+                client=client,
+                flush_every=flush_every,
+                resume_key=resume_key,
+            )
+        stages = with_resize(with_motion_gate([stage], motion_threshold), inference_max_side)
+        results = run_stages(Path(video_path), stages, target_fps, stride)
+    finally:
+        if client is not None:
+            client.close()
+    return results[-1] if results is not None else None
+
+
+def pose_cache(
+    target_fps=None,
+    stride=None,
+    output_format=OUTPUT_FORMAT,
+    force=False,
+    server=None,
+    roi=False,
+    roi_max_side=ROI_MAX_SIDE,
+    motion_threshold=None,
+    inference_max_side=INFERENCE_MAX_SIDE,
+):
+    params = pose_params(
+        target_fps,
+        stride,
+        output_format,
+        server,
+        roi,
+        roi_max_side,
+        motion_threshold,
+        inference_max_side,
+    )
+    return StageCache("pose", params, enabled=not force)
+
+
+def pose_inputs(video_path, roi=False):
+    """The video, plus its detections in ROI mode (they decide the crops)."""
+    box_file = find_detections(BOX_DIR, Path(video_path).stem) if roi else None
+    return [Path(video_path)] + ([box_file] if box_file is not None else [])
+
+
+def pose_outputs(video_path, output_format=OUTPUT_FORMAT):
+    return [pose_path(OUTPUT_DIR, Path(video_path).stem, output_format)]
+
+
+@app.command()
+def main(
+    target_fps: float | None = None,
+    stride: int | None = None,
+    workers: int = 1,
+    output_format: str = OUTPUT_FORMAT,
+    force: bool = False,
+    server: str | None = SERVER_OPTION,
+    roi: bool = typer.Option(
+        False, help="Run pose on a crop around the detected box (run object_detection first)"
+    ),
+    roi_max_side: int = ROI_MAX_SIDE,
+    motion_threshold: float | None = MOTION_THRESHOLD_OPTION,
+    inference_max_side: int = INFERENCE_MAX_SIDE_OPTION,
+):
+    video_paths = list_videos()
+
+    print(f"[INFO] Found {len(video_paths)} videos to process.")
+
+    # Skip videos already processed with the same parameters
+    run_cached(
+        pose_cache(
+            target_fps,
+            stride,
+            output_format,
+            force,
+            server,
+            roi,
+            roi_max_side,
+            motion_threshold,
+            inference_max_side,
+        ),
+        partial(
+            estimate_pose_for_video,
+            target_fps=target_fps,
+            stride=stride,
+            output_format=output_format,
+            server=server,
+            roi=roi,
+            roi_max_side=roi_max_side,
+            motion_threshold=motion_threshold,
+            inference_max_side=inference_max_side,
+        ),
+        video_paths,
+        name_fn=lambda video_path: Path(video_path).stem,
+        inputs_fn=partial(pose_inputs, roi=roi),
+        outputs_fn=partial(pose_outputs, output_format=output_format),
+        workers=workers,
+    )
 
     print(f"[DONE] Pose estimation data saved to {OUTPUT_DIR}")
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
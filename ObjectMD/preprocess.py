@@ -0,0 +1,80 @@
+import typer
+
+from ObjectMD.metrics import timer
+from ObjectMD.video_pipeline import FrameStage
+
+# Longest side of the frames the models see (YOLO's own input size); None or 0
+# feeds them full-resolution frames
+INFERENCE_MAX_SIDE = 640
+# Shared by every CLI that runs the models
+INFERENCE_MAX_SIDE_OPTION = typer.Option(
+    INFERENCE_MAX_SIDE, help="Downscale frames to this longest side before inference (0 = off)"
+)
+
+
+def fit_scale(width: int, height: int, max_side: int | None) -> float:
+    """Factor that fits a width x height frame into `max_side` (never upscales)."""
+    if not max_side or max(width, height) <= max_side:
+        return 1.0
+    return max_side / max(width, height)
+
+
+class ResizeStage(FrameStage):
+    """Downscales every frame once, for all the model stages after it.
+
+    The factor comes from the video's real resolution, so 1080p and 480p
+    sources both reach the models at most `max_side` pixels wide or high,
+    aspect ratio kept. The result goes to `frame.model_image` and
+    `frame.scale`; `frame.image` stays full size for the frame export. Each
+    model still letterboxes to its own input shape, and the model stages map
+    their outputs back to source pixels (see `to_source`).
+    """
+
+    resume_frame = None  # keeps no output, so it can start wherever the models resume
+
+    def __init__(self, max_side: int = INFERENCE_MAX_SIDE):
+        self.max_side = max_side
+
+    def start(self, video):
+        self.scale = fit_scale(video.width, video.height, self.max_side)
+        self.size = (
+            max(1, round(video.width * self.scale)),
+            max(1, round(video.height * self.scale)),
+        )
+
+    def process(self, frame):
+        if self.scale == 1.0:
+            return
+        import cv2
+
+        with timer("resize"):
+            frame.model_image = cv2.resize(frame.image, self.size, interpolation=cv2.INTER_AREA)
+        frame.scale = self.scale
+
+
+def with_resize(stages, max_side: int | None = INFERENCE_MAX_SIDE):
+    """`stages` preceded by a ResizeStage, or unchanged when `max_side` is off."""
+    if not max_side:
+        return list(stages)
+    return [ResizeStage(max_side)] + list(stages)
+
+
+def resize_params(max_side: int | None = INFERENCE_MAX_SIDE):
+    """Resize settings for a stage cache key (None when frames go in at full size)."""
+    if not max_side:
+        return None
+    return {"max_side": max_side, "interpolation": "area"}
+
+
+def to_source(detections, scale: float, width: int, height: int):
+    """Detections made on a `scale`d model input, with bboxes in source pixels
+    and the source frame size (`image_width`, `image_height`) attached."""
+    return [
+        dict(
+            det,
+            bbox=[round(v / scale) for v in det["bbox"]] if scale != 1.0 else det["bbox"],
+            image_width=width,
+            image_height=height,
+        )
+        for det in detections
+    ]
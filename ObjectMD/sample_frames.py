@@ -2,26 +2,60 @@ from pathlib import Path
 import random
 import shutil
 
+import typer
+
+from ObjectMD.frames import STORE_DIR, FrameStore, list_frame_stores
+
 SOURCE_DIR = Path("data/processed/frames")
 TARGET_DIR = Path("data/processed/roboflow_samples")
-FRAMES_PER_VIDEO = 1  
-TARGET_DIR.mkdir(parents=True, exist_ok=True)
+FRAMES_PER_VIDEO = 1
+
+app = typer.Typer()
+
+
+def sample_from_stores(frames_per_video: int):
+    """Export random frames of every memmap frame store as JPEGs."""
+    video_names = list_frame_stores(STORE_DIR)
+    counter = 0
+    for name in video_names:
+        store = FrameStore(STORE_DIR, name)
+        selected = random.sample(range(len(store)), min(frames_per_video, len(store)))
+        counter += len(store.export_jpegs(TARGET_DIR, selected, prefix=f"{name}_"))
+
+    print(f"✅ Exported {counter} frames from {len(video_names)} frame stores into {TARGET_DIR}")
+
+
+@app.command()
+def main(
+    frames_per_video: int = FRAMES_PER_VIDEO,
+    source: str = typer.Option(
+        "jpeg", help="jpeg: copy exported frames; memmap: sample from the frame stores"
+    ),
+):
+    TARGET_DIR.mkdir(parents=True, exist_ok=True)
+    if source == "memmap":
+        sample_from_stores(frames_per_video)
+        return
+
+    all_video_folders = list(SOURCE_DIR.glob("*"))
+
+    counter = 0
 
-all_video_folders = list(SOURCE_DIR.glob("*"))
+    for folder in all_video_folders:
+        frame_files = list(folder.glob("*.jpg"))
 
-counter = 0
+        if len(frame_files) == 0:
+            continue
 
-for folder in all_video_folders:
-    frame_files = list(folder.glob("*.jpg"))
+        selected = random.sample(frame_files, min(frames_per_video, len(frame_files)))
 
-    if len(frame_files) == 0:
-        continue
+        for frame_path in selected:
+            new_name = f"{folder.name}_{frame_path.name}"
+            shutil.copy(frame_path, TARGET_DIR / new_name)
+            counter += 1
 
-    selected = random.sample(frame_files, min(FRAMES_PER_VIDEO, len(frame_files)))
+    print(f"✅ Copied {counter} frames from {len(all_video_folders)} videos into {TARGET_DIR}")
 
-    for frame_path in selected:
-        new_name = f"{folder.name}_{frame_path.name}"
-        shutil.copy(frame_path, TARGET_DIR / new_name)
-        counter += 1
 
-print(f"✅ Copied {counter} frames from {len(all_video_folders)} videos into {TARGET_DIR}")
\ No newline at end of file
+if __name__ == "__main__":
+    app()
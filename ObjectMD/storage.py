@@ -0,0 +1,583 @@
+import json
+import os
+from pathlib import Path
+import shutil
+import textwrap
+import zipfile
+
+import numpy as np
+import pandas as pd
+import typer
+
+from ObjectMD.metrics import timer
+
+# Supported on-disk formats per artifact. The first one is the legacy default.
+DETECTION_FORMATS = ("json", "parquet", "npz")
+POSE_FORMATS = ("json", "parquet", "npz")
+FEATURE_FORMATS = ("csv", "parquet", "npz")
+
+FLUSH_EVERY = 500  # frames buffered by the incremental writers between flushes
+
+DETECTION_DTYPES = {
+    "frame": np.int32,
+    "sample_index": np.int32,
+    "label": str,
+    "confidence": np.float32,
+    "x1": np.int32,
+    "y1": np.int32,
+    "x2": np.int32,
+    "y2": np.int32,
+    "source": str,  # "detect", or "track" for boxes carried by the tracker
+    # Size of the source frame the bbox pixels refer to (0: not recorded, older files)
+    "image_width": np.int32,
+    "image_height": np.int32,
+}
+
+POSE_DTYPES = {
+    "frame_index": np.int32,
+    "sample_index": np.int32,
+    "left_wrist_x": np.float32,
+    "left_wrist_y": np.float32,
+    "right_wrist_x": np.float32,
+    "right_wrist_y": np.float32,
+    "left_confidence": np.float32,
+    "right_confidence": np.float32,
+}
+
+app = typer.Typer()
+
+
+# === CONVERSION BETWEEN LEGACY RECORDS AND TYPED COLUMNS ===
+def detections_to_frame(detections, float_dtype=np.float32) -> pd.DataFrame:
+    """List of {"frame", "sample_index", "label", "confidence", "bbox"} dicts -> typed columns.
+
+    Records without a frame index or bbox are dropped.
+    """
+    dtypes = {**DETECTION_DTYPES, "confidence": float_dtype}
+    columns = {name: [] for name in DETECTION_DTYPES}
+    for det in detections:
+        if det.get("frame") is None or not det.get("bbox"):
+            continue
+        x1, y1, x2, y2 = det["bbox"]
+        columns["frame"].append(det["frame"])
+        columns["sample_index"].append(det.get("sample_index", det["frame"]))
+        columns["label"].append(det["label"])
+        columns["confidence"].append(det["confidence"])
+        for name, value in zip(("x1", "y1", "x2", "y2"), (x1, y1, x2, y2)):
+            columns[name].append(value)
+        columns["source"].append(det.get("source", "detect"))
+        columns["image_width"].append(det.get("image_width", 0))
+        columns["image_height"].append(det.get("image_height", 0))
+    return pd.DataFrame(
+        {name: np.asarray(values, dtype=dtypes[name]) for name, values in columns.items()}
+    )
+
+
+def frame_to_detections(df: pd.DataFrame):
+    """Typed detection columns -> legacy list of dicts (the source frame size
+    only when it was recorded)."""
+    detections = []
+    for row in df.itertuples(index=False):
+        det = {
+            "frame": int(row.frame),
+            "sample_index": int(row.sample_index),
+            "label": str(row.label),
+            "confidence": float(row.confidence),
+            "bbox": [int(row.x1), int(row.y1), int(row.x2), int(row.y2)],
+            "source": str(getattr(row, "source", "detect")),
+        }
+        if getattr(row, "image_width", 0):
+            det["image_width"] = int(row.image_width)
+            det["image_height"] = int(row.image_height)
+        detections.append(det)
+    return detections
+
+
+def pose_to_frame(frames, float_dtype=np.float32) -> pd.DataFrame:
+    """List of pose frame dicts -> typed columns; missing wrists become NaN.
+
+    Frames without a frame index are dropped.
+    """
+    dtypes = {
+        name: float_dtype if dtype is np.float32 else dtype for name, dtype in POSE_DTYPES.items()
+    }
+    columns = {name: [] for name in POSE_DTYPES}
+    for frame in frames:
+        if frame.get("frame_index") is None:
+            continue
+        columns["frame_index"].append(frame["frame_index"])
+        columns["sample_index"].append(frame.get("sample_index", frame["frame_index"]))
+        for side in ("left", "right"):
+            x, y = (frame.get(f"{side}_wrist") or [None, None])[:2]
+            columns[f"{side}_wrist_x"].append(np.nan if x is None else x)
+            columns[f"{side}_wrist_y"].append(np.nan if y is None else y)
+        left_conf, right_conf = frame.get("confidence", [0.0, 0.0])
+        columns["left_confidence"].append(left_conf)
+        columns["right_confidence"].append(right_conf)
+    return pd.DataFrame(
+        {name: np.asarray(values, dtype=dtypes[name]) for name, values in columns.items()}
+    )
+
+
+def frame_to_pose(df: pd.DataFrame):
+    """Typed pose columns -> legacy list of frame dicts."""
+
+    def wrist(x, y):
+        return [None, None] if np.isnan(x) or np.isnan(y) else [float(x), float(y)]
+
+    return [
+        {
+            "frame_index": int(row.frame_index),
+            "sample_index": int(row.sample_index),
+            "left_wrist": wrist(row.left_wrist_x, row.left_wrist_y),
+            "right_wrist": wrist(row.right_wrist_x, row.right_wrist_y),
+            "confidence": [float(row.left_confidence), float(row.right_confidence)],
+        }
+        for row in df.itertuples(index=False)
+    ]
+
+
+def cast_columns(df: pd.DataFrame, dtypes) -> pd.DataFrame:
+    """Cast the numeric columns of `df` to their storage dtypes."""
+    return df.astype(
+        {name: dtype for name, dtype in dtypes.items() if name in df.columns and dtype is not str}
+    )
+
+
+def downcast_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Store feature columns as float32, and integer columns (frame, labels) as int32."""
+    out = {}
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_integer_dtype(column):
+            out[name] = column.astype(np.int32)
+        elif pd.api.types.is_numeric_dtype(column):
+            out[name] = column.astype(np.float32)
+        else:
+            out[name] = column
+    return pd.DataFrame(out)
+
+
+# === COLUMNAR FILES ===
+def npz_column(column: pd.Series) -> np.ndarray:
+    """Numeric columns as-is; text as fixed-width unicode so no pickling is needed."""
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy()
+    return column.to_numpy().astype(str)
+
+
+def write_table(df: pd.DataFrame, path: Path):
+    """Write typed columns to .parquet or .npz (one array per column)."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    elif path.suffix == ".npz":
+        np.savez(path, **{name: npz_column(df[name]) for name in df.columns})
+    else:
+        raise ValueError(f"Unsupported columnar format: {path.suffix}")
+    return path
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if path.suffix == ".npz":
+        with np.load(path) as data:
+            return pd.DataFrame({name: data[name] for name in data.files})
+    raise ValueError(f"Unsupported columnar format: {path.suffix}")
+
+
+def concat_tables(parts, path: Path):
+    """Write the rows of the .parquet/.npz files `parts`, in order, to one file
+    at `path` with memory bounded by a single part (not the whole table).
+
+    Parquet parts become row groups of one file. For npz every column is
+    streamed part by part into its .npy member, so the result is the same
+    file `write_table` would have written for the concatenated table.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for part in parts:
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif path.suffix == ".npz":
+        lengths, dtypes = [], {}
+        for part in parts:
+            with np.load(part) as data:
+                for name in data.files:
+                    column = data[name]
+                    dtypes[name] = (
+                        np.result_type(dtypes[name], column.dtype)
+                        if name in dtypes
+                        else column.dtype
+                    )
+                lengths.append(len(column))
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name, dtype in dtypes.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array_header_1_0(
+                        f,
+                        {
+                            "descr": np.lib.format.dtype_to_descr(dtype),
+                            "fortran_order": False,
+                            "shape": (sum(lengths),),
+                        },
+                    )
+                    for part in parts:
+                        with np.load(part) as data:
+                            f.write(data[name].astype(dtype, copy=False).tobytes())
+    else:
+        raise ValueError(f"Unsupported columnar format: {path.suffix}")
+    return path
+
+
+# === ARTIFACT PATHS ===
+# What surrounds the video name in the per-video artifact file names
+ARTIFACT_PREFIXES = ("detections_", "features_", "predictions_")
+ARTIFACT_SUFFIXES = ("_pose",)
+
+
+def detections_path(output_dir: Path, video_name: str, fmt: str = "json") -> Path:
+    return Path(output_dir) / f"detections_{video_name}.{fmt}"
+
+
+def pose_path(output_dir: Path, video_name: str, fmt: str = "json") -> Path:
+    return Path(output_dir) / f"{video_name}_pose.{fmt}"
+
+
+def features_path(output_dir: Path, video_name: str, fmt: str = "csv") -> Path:
+    return Path(output_dir) / f"features_{video_name}.{fmt}"
+
+
+def video_name_of(path: Path) -> str:
+    """Video name of a per-video artifact file (the inverse of the *_path helpers)."""
+    stem = Path(path).stem
+    for prefix in ARTIFACT_PREFIXES:
+        if stem.startswith(prefix):
+            return stem[len(prefix) :]
+    for suffix in ARTIFACT_SUFFIXES:
+        if stem.endswith(suffix):
+            return stem[: -len(suffix)]
+    return stem
+
+
+def find_existing(candidates):
+    """First path in `candidates` that exists, or None."""
+    for path in candidates:
+        if path.exists():
+            return path
+    return None
+
+
+def find_detections(output_dir: Path, video_name: str):
+    return find_existing(detections_path(output_dir, video_name, fmt) for fmt in DETECTION_FORMATS)
+
+
+def find_pose(output_dir: Path, video_name: str):
+    return find_existing(pose_path(output_dir, video_name, fmt) for fmt in POSE_FORMATS)
+
+
+def glob_artifacts(directory: Path, pattern: str, formats):
+    """Glob `pattern.<fmt>` for every format, sorted by path.
+
+    When an artifact exists in several formats only one path is returned,
+    preferring formats in the order given.
+    """
+    paths = {}
+    for fmt in formats:
+        for path in Path(directory).glob(f"{pattern}.{fmt}"):
+            paths.setdefault(path.with_suffix(""), path)
+    return sorted(paths.values())
+
+
+# === SAVE / LOAD PER ARTIFACT ===
+def save_detections(detections, path: Path):
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, "w") as f:
+            json.dump(detections, f, indent=2)
+        return path
+    return write_table(detections_to_frame(detections), path)
+
+
+def load_detections(path: Path) -> pd.DataFrame:
+    """Detections as typed columns; JSON input keeps its float64 precision."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, "r") as f:
+            return detections_to_frame(json.load(f), float_dtype=np.float64)
+    return read_table(path)
+
+
+def save_pose(video_file_name: str, frames, path: Path):
+    path = Path(path)
+    if path.suffix == ".json":
+        output_json = {"video": video_file_name, "frames": frames}
+        with open(path, "w") as f:
+            json.dump(output_json, f, indent=2)
+        return path
+    return write_table(pose_to_frame(frames), path)
+
+
+def load_pose(path: Path) -> pd.DataFrame:
+    """Pose frames as typed columns; JSON input keeps its float64 precision."""
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, "r") as f:
+            return pose_to_frame(json.load(f).get("frames", []), float_dtype=np.float64)
+    return read_table(path)
+
+
+def save_features(df: pd.DataFrame, path: Path):
+    path = Path(path)
+    if path.suffix == ".csv":
+        df.to_csv(path, index=False)
+        return path
+    return write_table(downcast_features(df), path)
+
+
+def load_features(path: Path) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path)
+    return read_table(path)
+
+
+# === INCREMENTAL WRITERS ===
+class ArtifactWriter:
+    """Writes a detections/pose artifact frame by frame with bounded memory.
+
+    Records are buffered for `flush_every` frames, then appended to
+    `<path>.partial` (JSON, streamed with the exact layout `json.dump(...,
+    indent=2)` produces) or written as one chunk under `<path>.parts/`
+    (parquet/npz, streamed into a single file on close, one part in memory
+    at a time, see `concat_tables`). After every flush a
+    `<path>.progress` sidecar records the next frame to process, so an
+    interrupted run can resume from there: `resume_frame` is that frame when
+    the sidecar was written with the same `resume_key`, else 0 and any
+    partial output is discarded. `close` moves the finished artifact to `path`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        to_frame,
+        json_prefix="[",
+        json_indent="  ",
+        json_suffix="\n]",
+        json_empty="]",
+        flush_every=FLUSH_EVERY,
+        resume_key=None,
+    ):
+        self.path = Path(path)
+        self.to_frame = to_frame
+        self.json_prefix = json_prefix
+        self.json_indent = json_indent
+        self.json_suffix = json_suffix
+        self.json_empty = json_empty
+        self.flush_every = max(1, flush_every)
+        self.partial = self.path.with_name(self.path.name + ".partial")
+        self.parts_dir = self.path.with_name(self.path.name + ".parts")
+        self.progress_path = self.path.with_name(self.path.name + ".progress")
+
+        self.buffer = []
+        self.buffered_frames = 0
+        self.next_frame = 0
+        self.count = 0
+        self.parts = 0
+        self.bytes = 0
+        self.resume(resume_key)
+        self.resume_key = resume_key
+        self.resume_frame = self.next_frame
+
+    @property
+    def is_json(self):
+        return self.path.suffix == ".json"
+
+    def resume(self, resume_key):
+        progress = None
+        if resume_key is not None and self.progress_path.exists():
+            with open(self.progress_path, "r") as f:
+                progress = json.load(f)
+        output = self.partial if self.is_json else self.parts_dir
+        if (
+            progress is None
+            or progress.get("resume_key") != resume_key
+            or ((progress["bytes"] or progress["parts"]) and not output.exists())
+        ):
+            self.discard()
+            return
+        self.next_frame = progress["next_frame"]
+        self.count = progress["count"]
+        self.parts = progress["parts"]
+        self.bytes = progress["bytes"]
+        if self.is_json:
+            with open(self.partial, "r+b") as f:
+                f.truncate(self.bytes)  # drop anything written after the last flush
+        else:
+            for part in self.parts_dir.glob("part-*"):
+                if int(part.stem.split("-")[1]) >= self.parts:
+                    part.unlink()
+
+    def discard(self):
+        self.partial.unlink(missing_ok=True)
+        self.progress_path.unlink(missing_ok=True)
+        if self.parts_dir.exists():
+            shutil.rmtree(self.parts_dir)
+
+    def write_frame(self, frame_index: int, records):
+        """Records produced for one frame (possibly none)."""
+        self.buffer.extend(records)
+        self.buffered_frames += 1
+        self.next_frame = frame_index + 1
+        if self.buffered_frames >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        with timer("serialize"):
+            self.write_buffer()
+
+    def write_buffer(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.is_json:
+            with open(self.partial, "ab") as f:
+                if self.bytes == 0:
+                    f.write(self.json_prefix.encode())
+                for record in self.buffer:
+                    text = textwrap.indent(json.dumps(record, indent=2), self.json_indent)
+                    f.write(((",\n" if self.count else "\n") + text).encode())
+                    self.count += 1
+                self.bytes = f.tell()
+        elif self.buffer:
+            self.parts_dir.mkdir(parents=True, exist_ok=True)
+            write_table(
+                self.to_frame(self.buffer),
+                self.parts_dir / f"part-{self.parts:05d}{self.path.suffix}",
+            )
+            self.parts += 1
+            self.count += len(self.buffer)
+        self.buffer = []
+        self.buffered_frames = 0
+
+        tmp_path = self.progress_path.with_name(self.progress_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "resume_key": self.resume_key,
+                    "next_frame": self.next_frame,
+                    "count": self.count,
+                    "parts": self.parts,
+                    "bytes": self.bytes,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.progress_path)
+
+    def close(self) -> Path:
+        """Flush what is left and publish the finished artifact at `path`."""
+        self.flush()
+        with timer("serialize"):
+            self.publish()
+        return self.path
+
+    def publish(self):
+        if self.is_json:
+            with open(self.partial, "ab") as f:
+                f.write((self.json_suffix if self.count else self.json_empty).encode())
+            os.replace(self.partial, self.path)
+        else:
+            parts = sorted(self.parts_dir.glob(f"part-*{self.path.suffix}"))
+            tmp_path = self.path.with_name(f"{self.path.stem}.tmp{self.path.suffix}")
+            if parts:
+                concat_tables(parts, tmp_path)
+            else:
+                write_table(self.to_frame([]), tmp_path)
+            os.replace(tmp_path, self.path)
+        self.discard()
+
+
+def detections_writer(path: Path, flush_every=FLUSH_EVERY, resume_key=None):
+    return ArtifactWriter(
+        path, detections_to_frame, flush_every=flush_every, resume_key=resume_key
+    )
+
+
+def pose_writer(path: Path, video_file_name: str, flush_every=FLUSH_EVERY, resume_key=None):
+    """Same layout as save_pose: {"video": ..., "frames": [...]}."""
+    head = f'{{\n  "video": {json.dumps(video_file_name)},\n  "frames": ['
+    return ArtifactWriter(
+        path,
+        pose_to_frame,
+        json_prefix=head,
+        json_indent="    ",
+        json_suffix="\n  ]\n}",
+        json_empty="]\n}",
+        flush_every=flush_every,
+        resume_key=resume_key,
+    )
+
+
+# === CONVERSION OF EXISTING ARTIFACTS ===
+def convert_file(path: Path, fmt: str, remove: bool = False):
+    """Convert one detections/pose/features file to `fmt`; returns the new path."""
+    path = Path(path)
+    target = path.with_suffix(f".{fmt}")
+    if target == path:
+        return path
+
+    if path.stem.startswith("detections_"):
+        df = load_detections(path)
+        if fmt == "json":
+            save_detections(frame_to_detections(df), target)
+        else:
+            write_table(cast_columns(df, DETECTION_DTYPES), target)
+    elif path.stem.endswith("_pose"):
+        df = load_pose(path)
+        if fmt == "json":
+            video = video_name_of(path) + ".mp4"
+            save_pose(video, frame_to_pose(df), target)
+        else:
+            write_table(cast_columns(df, POSE_DTYPES), target)
+    elif path.stem.startswith("features_"):
+        save_features(load_features(path), target)
+    else:
+        raise ValueError(f"Don't know what kind of artifact {path.name} is")
+
+    if remove:
+        path.unlink()
+    return target
+
+
+@app.command()
+def convert(directory: Path, to: str = "parquet", remove: bool = False):
+    """Convert every detections/pose/features artifact under `directory` to another format."""
+    patterns = [
+        ("detections_*", DETECTION_FORMATS),
+        ("*_pose", POSE_FORMATS),
+        ("features_*", FEATURE_FORMATS),
+    ]
+    converted = 0
+    for pattern, formats in patterns:
+        if to not in formats:
+            continue
+        for path in glob_artifacts(directory, f"**/{pattern}", formats):
+            if path.with_suffix(f".{to}").exists():
+                continue
+            target = convert_file(path, to, remove)
+            print(f"✅ {path} -> {target}")
+            converted += 1
+    print(f"📁 Converted {converted} file(s) to {to}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,416 @@
+from collections import defaultdict, deque
+from contextlib import ExitStack
+import json
+from pathlib import Path
+import sys
+import threading
+import time
+
+import numpy as np
+import typer
+
+from ObjectMD.events import EventSegmenter
+from ObjectMD.feature_extraction import (
+    FEATURE_COLUMNS,
+    IMAGE_HEIGHT,
+    IMAGE_WIDTH,
+    NO_HAND,
+    compute_box_center,
+    euclidean,
+    nearest_hand,
+    normalize_wrists,
+)
+from ObjectMD.object_detection import detect_objects_in_frame
+from ObjectMD.pose_estimation import extract_hand_keypoints_from_frame, get_pose
+from ObjectMD.preprocess import (
+    INFERENCE_MAX_SIDE,
+    INFERENCE_MAX_SIDE_OPTION,
+    ResizeStage,
+    to_source,
+)
+from ObjectMD.video_pipeline import VideoFrame, VideoInfo
+
+SPEED_THRESHOLD = 0.05  # normalized box-center units per second
+SMOOTHING = 0.5  # EMA weight of the newest speed sample
+EVENT_EXIT_RATIO = 0.6  # movement events close below this share of the threshold
+MAX_LATENCY_MS = 500  # frames older than this when picked up are dropped
+REPORT_EVERY_S = 5.0
+
+app = typer.Typer()
+
+
+class LatestFrameBuffer:
+    """Single-slot buffer between the capture thread and the processing loop.
+
+    The capture side always overwrites the slot, so under backpressure the
+    processing loop only ever sees the newest frame and unconsumed frames are
+    counted as dropped instead of queueing up.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.cond.notify()
+
+    def get(self, timeout=1.0):
+        """Next (frame_idx, capture_time, frame), or None once the source is exhausted."""
+        with self.cond:
+            while self.item is None and not self.closed:
+                self.cond.wait(timeout)
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class CaptureThread(threading.Thread):
+    """Reads a capture source into a LatestFrameBuffer.
+
+    Files are paced to their native fps when `realtime` is set so they behave
+    like a live camera; live sources (webcam index, RTSP URL) are read as fast
+    as they deliver.
+    """
+
+    def __init__(self, source, buffer: LatestFrameBuffer, realtime: bool = True):
+        super().__init__(daemon=True)
+        self.source = source
+        self.buffer = buffer
+        self.realtime = realtime
+        self.stop_event = threading.Event()
+        self.fps = None
+
+    def run(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            print(f"⚠️ Failed to open {self.source}", file=sys.stderr)
+            self.buffer.close()
+            return
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        # Only local files are paced; cameras and network streams deliver at their own rate
+        pace = self.realtime and is_local_file(self.source)
+        start = time.perf_counter()
+        frame_idx = 0
+        while not self.stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if pace:
+                delay = start + frame_idx / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.buffer.put((frame_idx, time.perf_counter(), frame))
+            frame_idx += 1
+
+        cap.release()
+        self.buffer.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class OnlineFeatures:
+    """Rolling version of feature_extraction.extract_features, one frame at a time.
+
+    Keeps the last box center so box_dx/box_dy match the offline features.
+    Only the best detection is followed, so it is always track 0.
+    """
+
+    def __init__(self):
+        self.last_cx = None
+        self.last_cy = None
+
+    def update(self, frame_idx, detection, keypoints):
+        """Feature row for one frame, or None when there is no box detection."""
+        if detection is None:
+            return None
+
+        width = detection.get("image_width", IMAGE_WIDTH)
+        height = detection.get("image_height", IMAGE_HEIGHT)
+        cx, cy, w, h = compute_box_center(detection["bbox"], width, height)
+        if self.last_cx is not None:
+            dx, dy = cx - self.last_cx, cy - self.last_cy
+        else:
+            dx = dy = 0.0
+        self.last_cx, self.last_cy = cx, cy
+
+        wrists = []
+        for name in ("left_wrist", "right_wrist"):
+            x, y = (np.nan if v is None else v for v in keypoints[name])
+            x, y = normalize_wrists(
+                np.array([x], dtype=float), np.array([y], dtype=float), width, height
+            )
+            wrists.append((float(x[0]), float(y[0])))
+        (lwx, lwy), (rwx, rwy) = wrists
+
+        dist_left = euclidean([lwx, lwy], [cx, cy]) if not np.isnan(lwx) else np.nan
+        dist_right = euclidean([rwx, rwy], [cx, cy]) if not np.isnan(rwx) else np.nan
+        min_dist = np.fmin(dist_left, dist_right)
+        nearest = int(nearest_hand(np.array([dist_left]), np.array([dist_right]))[0])
+
+        return dict(
+            zip(
+                FEATURE_COLUMNS,
+                [
+                    frame_idx,
+                    0,
+                    cx,
+                    cy,
+                    w,
+                    h,
+                    dx,
+                    dy,
+                    lwx,
+                    lwy,
+                    rwx,
+                    rwy,
+                    float(dist_left),
+                    float(dist_right),
+                    float(min_dist),
+                    nearest,
+                    int(nearest != NO_HAND),
+                ],
+            )
+        )
+
+
+class MovementDetector:
+    """Thresholds an EMA of the box-center speed.
+
+    Speed is measured per second of capture time, not per processed frame, so
+    decisions don't depend on how many frames were dropped in between.
+    """
+
+    def __init__(self, threshold=SPEED_THRESHOLD, smoothing=SMOOTHING):
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.speed = 0.0
+        self.last = None  # (capture_time, cx, cy)
+
+    def update(self, capture_time, features):
+        if features is None:
+            # No box in view: decay towards "not moving"
+            self.speed *= 1 - self.smoothing
+            self.last = None
+            return False, self.speed
+
+        cx, cy = features["box_cx"], features["box_cy"]
+        if self.last is not None:
+            last_time, last_cx, last_cy = self.last
+            dt = max(capture_time - last_time, 1e-6)
+            sample = euclidean([cx, cy], [last_cx, last_cy]) / dt
+            self.speed = self.smoothing * sample + (1 - self.smoothing) * self.speed
+        self.last = (capture_time, cx, cy)
+        return self.speed > self.threshold, self.speed
+
+
+class LatencyStats:
+    """Per-stage latency samples in milliseconds, summarized as p50/p95/max."""
+
+    def __init__(self, window=1000):
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds * 1000)
+
+    def summary(self):
+        return {
+            stage: {
+                "p50_ms": round(float(np.percentile(values, 50)), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+                "max_ms": round(float(np.max(values)), 2),
+            }
+            for stage, values in self.samples.items()
+            if values
+        }
+
+
+def is_local_file(source) -> bool:
+    return not isinstance(source, int) and Path(str(source)).is_file()
+
+
+def best_detection(detections):
+    return max(detections, key=lambda det: det["confidence"]) if detections else None
+
+
+def parse_source(source: str):
+    """Webcam index when numeric, otherwise a file path or stream URL."""
+    return int(source) if source.isdigit() else source
+
+
+def stream(
+    source,
+    realtime=True,
+    threshold=SPEED_THRESHOLD,
+    max_latency_ms=MAX_LATENCY_MS,
+    out=sys.stdout,
+    report_every=REPORT_EVERY_S,
+    events_out=None,
+    max_side=INFERENCE_MAX_SIDE,
+):
+    """Run detection, pose and movement decisions over a live source.
+
+    Writes one JSON line per processed frame to `out` and, when `events_out`
+    is given, one JSON line per movement event as soon as it is final. Returns
+    the final stats (processed/dropped/event counts and per-stage latency).
+    Frames are downscaled by the batch pipeline's ResizeStage before the
+    models see them; boxes are reported in source pixels.
+    """
+    import cv2
+
+    buffer = LatestFrameBuffer()
+    capture = CaptureThread(source, buffer, realtime)
+    features_state = OnlineFeatures()
+    detector = MovementDetector(threshold)
+    # The detector's speed is already smoothed, so the segmenter doesn't smooth again
+    segmenter = EventSegmenter(
+        threshold, threshold * EVENT_EXIT_RATIO, smoothing=1.0, video=str(source)
+    )
+    latency = LatencyStats()
+    resize = ResizeStage(max_side)
+    resize_size = None
+    processed = stale = events = 0
+    last_report = time.perf_counter()
+    started = last_report
+
+    def write_events(records):
+        nonlocal events
+        events += len(records)
+        if events_out is not None:
+            for record in records:
+                events_out.write(json.dumps(record) + "\n")
+            events_out.flush()
+
+    capture.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is None:
+                break
+            frame_idx, capture_time, frame = item
+
+            picked_up = time.perf_counter()
+            latency.add("queue", picked_up - capture_time)
+            if (picked_up - capture_time) * 1000 > max_latency_ms:
+                stale += 1
+                continue
+
+            t0 = time.perf_counter()
+            height, width = frame.shape[:2]
+            if resize_size != (width, height):
+                # Live sources can switch resolution mid-stream; refit the downscale
+                resize.start(
+                    VideoInfo(
+                        path=Path(str(source)),
+                        fps=capture.fps or 0.0,
+                        frame_count=0,
+                        width=width,
+                        height=height,
+                    )
+                )
+                resize_size = (width, height)
+            sample = VideoFrame(index=frame_idx, image=frame, sample_index=processed)
+            resize.process(sample)
+            detection = best_detection(
+                to_source(
+                    detect_objects_in_frame(sample.model_input, frame_idx),
+                    sample.scale,
+                    width,
+                    height,
+                )
+            )
+            t1 = time.perf_counter()
+            frame_rgb = cv2.cvtColor(sample.model_input, cv2.COLOR_BGR2RGB)
+            keypoints = extract_hand_keypoints_from_frame(get_pose().process(frame_rgb))
+            t2 = time.perf_counter()
+            features = features_state.update(frame_idx, detection, keypoints)
+            is_moving, speed = detector.update(capture_time, features)
+            write_events(segmenter.update(capture_time - started, speed, frame_idx))
+            t3 = time.perf_counter()
+
+            latency.add("detection", t1 - t0)
+            latency.add("pose", t2 - t1)
+            latency.add("features", t3 - t2)
+            latency.add("end_to_end", t3 - capture_time)
+            processed += 1
+
+            out.write(
+                json.dumps(
+                    {
+                        "frame": frame_idx,
+                        "timestamp": round(capture_time, 4),
+                        "is_moving": int(is_moving),
+                        "speed": round(speed, 5),
+                        "bbox": detection["bbox"] if detection else None,
+                        "latency_ms": round((t3 - capture_time) * 1000, 2),
+                    }
+                )
+                + "\n"
+            )
+
+            if time.perf_counter() - last_report >= report_every:
+                last_report = time.perf_counter()
+                print(
+                    f"[INFO] processed={processed} dropped={buffer.dropped} stale={stale} "
+                    f"latency={latency.summary()}",
+                    file=sys.stderr,
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.stop()
+        write_events(segmenter.finish())
+        out.flush()
+
+    return {
+        "processed": processed,
+        "dropped": buffer.dropped,
+        "stale": stale,
+        "events": events,
+        "latency": latency.summary(),
+    }
+
+
+@app.command()
+def main(
+    source: str,
+    realtime: bool = True,
+    threshold: float = SPEED_THRESHOLD,
+    max_latency_ms: float = MAX_LATENCY_MS,
+    output: Path | None = None,
+    events_output: Path | None = None,
+    inference_max_side: int = INFERENCE_MAX_SIDE_OPTION,
+):
+    """Stream "is the box moving" decisions from a webcam index, stream URL or video file."""
+    with ExitStack() as files:
+        out = files.enter_context(open(output, "w")) if output is not None else sys.stdout
+        events_out = (
+            files.enter_context(open(events_output, "w")) if events_output is not None else None
+        )
+        stats = stream(
+            parse_source(source),
+            realtime,
+            threshold,
+            max_latency_ms,
+            out,
+            events_out=events_out,
+            max_side=inference_max_side,
+        )
+    print(f"✅ Stream finished: {json.dumps(stats)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    app()
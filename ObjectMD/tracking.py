@@ -0,0 +1,275 @@
+import math
+
+import numpy as np
+
+from ObjectMD.metrics import timer
+
+MAX_POINTS = 40  # feature points tracked per box
+MIN_POINTS = 4  # fewer surviving points than this and the track is lost
+MIN_QUALITY = 0.5  # fraction of points that must survive a frame
+MAX_FB_ERROR = 1.0  # forward-backward flow error (px) above which a point is dropped
+
+# Track assignment across frames (MultiObjectTracker)
+MATCH_MIN_IOU = 0.1  # a detection may continue a track it overlaps at least this much...
+MATCH_MAX_CENTER_DIST = 0.75  # ...or whose center is this close (in track box diagonals)
+CENTER_WEIGHT = 0.5  # weight of the center distance next to 1 - IoU in the matching cost
+MAX_TRACK_AGE = 30  # frames a track is kept without a matching detection
+
+LK_PARAMS = {
+    "winSize": (21, 21),
+    "maxLevel": 3,
+    "criteria": (3, 30, 0.01),
+}  # cv2.TERM_CRITERIA_EPS | COUNT
+
+
+def to_gray(image):
+    import cv2
+
+    with timer("color_conversion"):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def box_iou(a, b) -> float:
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_ious(a, b):
+    """IoU of [x1, y1, x2, y2] boxes along the last axis, with numpy broadcasting
+    (pass `a[:, None]` and `b[None]` for all pairs)."""
+    ix = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    iy = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = ix * iy
+    union = (
+        (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+        + (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        - inter
+    )
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def match_costs(track_boxes, boxes):
+    """Matching cost of track boxes and detection boxes (1 - IoU plus the center
+    distance in track box diagonals), and whether each pair may match at all.
+    Broadcasts like `box_ious`."""
+    iou = box_ious(track_boxes, boxes)
+    diagonals = np.maximum(
+        np.hypot(
+            track_boxes[..., 2] - track_boxes[..., 0], track_boxes[..., 3] - track_boxes[..., 1]
+        ),
+        1e-6,
+    )
+    dist = (
+        np.hypot(
+            (track_boxes[..., 0] + track_boxes[..., 2] - boxes[..., 0] - boxes[..., 2]),
+            (track_boxes[..., 1] + track_boxes[..., 3] - boxes[..., 1] - boxes[..., 3]),
+        )
+        / 2
+        / diagonals
+    )
+    allowed = (iou >= MATCH_MIN_IOU) | (dist <= MATCH_MAX_CENTER_DIST)
+    return 1 - iou + CENTER_WEIGHT * dist, allowed
+
+
+def seed_points(gray, bbox):
+    """Corners inside `bbox` to follow; a regular grid when the box has no texture."""
+    import cv2
+
+    x1, y1, x2, y2 = (max(int(v), 0) for v in bbox)
+    points = None
+    if x2 > x1 and y2 > y1:
+        points = cv2.goodFeaturesToTrack(
+            gray[y1:y2, x1:x2], maxCorners=MAX_POINTS, qualityLevel=0.01, minDistance=3
+        )
+    if points is not None and len(points) >= MIN_POINTS:
+        points = points + np.array([x1, y1], dtype=np.float32)
+    else:
+        xs = np.linspace(x1, x2, 6)[1:-1]
+        ys = np.linspace(y1, y2, 6)[1:-1]
+        points = np.array([[[x, y]] for y in ys for x in xs], dtype=np.float32)
+    return points.astype(np.float32)
+
+
+class BoxTracker:
+    """Carries one detection forward with pyramidal Lucas-Kanade optical flow.
+
+    The box follows the median displacement of the points tracked inside it
+    and scales with their median spread. `quality` is the fraction of points
+    that survived the last update (forward-backward checked); the track is
+    lost once too few survive.
+    """
+
+    def __init__(self, detection, gray):
+        self.detection = detection
+        self.bbox = np.array(detection["bbox"], dtype=np.float64)
+        self.points = seed_points(gray, detection["bbox"])
+        self.quality = 1.0
+        self.lost = False
+
+    def update(self, prev_gray, gray):
+        import cv2
+
+        if self.lost:
+            return False
+        p0 = self.points
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **LK_PARAMS)
+        p0r, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < MAX_FB_ERROR)
+
+        self.quality = float(good.mean()) if len(good) else 0.0
+        if good.sum() < MIN_POINTS or self.quality < MIN_QUALITY:
+            self.lost = True
+            return False
+
+        old, new = p0[good].reshape(-1, 2), p1[good].reshape(-1, 2)
+        shift = np.median(new - old, axis=0)
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1e-3
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+        cx, cy = (self.bbox[:2] + self.bbox[2:]) / 2 + shift
+        half_w, half_h = (self.bbox[2:] - self.bbox[:2]) / 2 * scale
+        height, width = gray.shape[:2]
+        self.bbox = np.array(
+            [
+                np.clip(cx - half_w, 0, width - 1),
+                np.clip(cy - half_h, 0, height - 1),
+                np.clip(cx + half_w, 0, width - 1),
+                np.clip(cy + half_h, 0, height - 1),
+            ]
+        )
+        if self.bbox[2] <= self.bbox[0] or self.bbox[3] <= self.bbox[1]:
+            self.lost = True  # drifted out of the frame
+            return False
+        self.points = p1[good].reshape(-1, 1, 2)
+        return True
+
+    def record(self, frame_idx, sample_idx):
+        """The tracked box in the detection schema, marked `source: track`."""
+        return {
+            "frame": frame_idx,
+            "sample_index": sample_idx,
+            "label": self.detection["label"],
+            "confidence": round(self.detection["confidence"] * self.quality, 4),
+            "bbox": [round(v) for v in self.bbox],
+            "source": "track",
+        }
+
+
+class MultiObjectTracker:
+    """Assigns persistent track ids to the detections of consecutive frames.
+
+    Every frame, live tracks and detections are matched with the Hungarian
+    algorithm (scipy's linear_sum_assignment) on a cost of 1 - IoU plus the
+    center distance in track box diagonals; pairs that neither overlap by
+    MATCH_MIN_IOU nor lie within MATCH_MAX_CENTER_DIST are never matched.
+    Unmatched detections start new tracks, and tracks without a match for
+    more than `max_age` frames are dropped. Costs are computed as one
+    vectorized matrix per frame, so dozens of boxes per frame stay cheap;
+    frames with a single detection skip the matrix altogether.
+    """
+
+    def __init__(self, max_age: int = MAX_TRACK_AGE):
+        self.max_age = max_age
+        self.tracks = []  # [track id, [x1, y1, x2, y2], last frame seen]
+        self.next_id = 0
+
+    def match(self, boxes):
+        """(track index, detection index) pairs of the accepted matches."""
+        if not self.tracks or len(boxes) == 0:
+            return []
+        if len(boxes) == 1:
+            # A single detection just takes its cheapest allowed track
+            box = boxes[0].tolist()
+            costs = [(match_cost(track[1], box), i) for i, track in enumerate(self.tracks)]
+            cost, best = min(costs)
+            return [(best, 0)] if cost < math.inf else []
+
+        from scipy.optimize import linear_sum_assignment
+
+        track_boxes = np.array([track[1] for track in self.tracks])
+        cost, allowed = match_costs(track_boxes[:, None], boxes[None])
+        cost = np.where(allowed, cost, 1e6)
+        rows, cols = linear_sum_assignment(cost)
+        return [(row, col) for row, col in zip(rows.tolist(), cols.tolist()) if allowed[row, col]]
+
+    def update(self, frame_idx: int, boxes):
+        """Track id for each (N, 4) box of frame `frame_idx`."""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.tracks = [track for track in self.tracks if frame_idx - track[2] <= self.max_age]
+        ids = [None] * len(boxes)
+        for row, col in self.match(boxes):
+            track = self.tracks[row]
+            track[1], track[2] = boxes[col].tolist(), frame_idx
+            ids[col] = track[0]
+        for col, track_id in enumerate(ids):
+            if track_id is None:
+                ids[col] = self.next_id
+                self.tracks.append([self.next_id, boxes[col].tolist(), frame_idx])
+                self.next_id += 1
+        return ids
+
+
+def match_cost(track_box, box) -> float:
+    """`match_costs` of a single pair in plain Python floats (inf if not allowed)."""
+    iou = box_iou(track_box, box)
+    diagonal = max(math.hypot(track_box[2] - track_box[0], track_box[3] - track_box[1]), 1e-6)
+    dist = (
+        math.hypot(
+            (track_box[0] + track_box[2] - box[0] - box[2]) / 2,
+            (track_box[1] + track_box[3] - box[1] - box[3]) / 2,
+        )
+        / diagonal
+    )
+    if iou < MATCH_MIN_IOU and dist > MATCH_MAX_CENTER_DIST:
+        return math.inf
+    return 1 - iou + CENTER_WEIGHT * dist
+
+
+def assign_track_ids(frames, boxes, max_age: int = MAX_TRACK_AGE):
+    """Track id per detection row, given its frame and [x1, y1, x2, y2] box.
+
+    Rows may come in any order; each frame is matched against the tracks of
+    the frames before it. Runs of single-detection frames that all continue
+    the only live track (the usual one-box video) are assigned in bulk.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    order = np.argsort(frames, kind="stable")
+    unique_frames, starts = np.unique(frames[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    track_ids = np.empty(len(frames), dtype=np.int64)
+    if len(frames) == 0:
+        return track_ids
+
+    # continues[k]: frame k and the frame before it both have one detection,
+    # close enough in time and space to be the same track
+    single = ends - starts == 1
+    first_boxes = boxes[order[starts]]
+    _, allowed = match_costs(first_boxes[:-1], first_boxes[1:])
+    continues = np.concatenate(
+        [[False], single[:-1] & single[1:] & allowed & (np.diff(unique_frames) <= max_age)]
+    )
+    breaks = np.append(np.flatnonzero(~continues), len(continues))
+    run_end = breaks[np.searchsorted(breaks, np.arange(len(continues)) + 1)] - 1
+
+    tracker = MultiObjectTracker(max_age)
+    with timer("track_assignment"):
+        k = 0
+        while k < len(unique_frames):
+            rows = order[starts[k] : ends[k]]
+            ids = tracker.update(int(unique_frames[k]), boxes[rows])
+            track_ids[rows] = ids
+            end = run_end[k]
+            if end > k and len(tracker.tracks) == 1:
+                track_ids[order[starts[k + 1 : end + 1]]] = ids[0]
+                tracker.tracks[0][1:] = [first_boxes[end].tolist(), int(unique_frames[end])]
+                k = end
+            k += 1
+    return track_ids
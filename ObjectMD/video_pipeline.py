@@ -0,0 +1,298 @@
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+import queue
+import threading
+import time
+
+import numpy as np
+
+from ObjectMD.metrics import count, current, timer
+
+THREADED = True  # decode on a background thread while the stages run
+QUEUE_SIZE = 8  # decoded frames (or pending writes) allowed to queue up
+
+
+@dataclass
+class VideoInfo:
+    """Metadata of an opened video, handed to every stage before the first frame."""
+
+    path: Path
+    fps: float
+    frame_count: int
+    width: int
+    height: int
+    stride: int = 1  # only every `stride`-th source frame is decoded and processed
+
+    @property
+    def name(self):
+        return self.path.stem
+
+
+@dataclass
+class VideoFrame:
+    """A decoded frame shared by all stages. Stages must not modify `image` in place.
+
+    `index` is the source frame number in the video, `sample_index` its position
+    among the frames actually decoded (equal to `index` when nothing is skipped).
+    `static` is set by a MotionGateStage placed before the model stages when
+    nothing moved since the last frame the models ran on. `model_image` is the
+    downscaled copy a ResizeStage made for the models and `scale` its size
+    relative to `image` (model stages map their outputs back with it).
+    """
+
+    index: int
+    image: np.ndarray
+    sample_index: int
+    static: bool = False
+    model_image: np.ndarray | None = None
+    scale: float = 1.0
+
+    @property
+    def model_input(self) -> np.ndarray:
+        """The image the models should see: `model_image` when there is one."""
+        return self.model_image if self.model_image is not None else self.image
+
+
+class FrameStage:
+    """A consumer fed by a single decode pass over a video.
+
+    `start` is called once per video, `process` once per decoded frame and
+    `finish` once after the last frame; `finish` returns the stage result.
+    If the run fails after `start`, `abort` is called instead of `finish` to
+    release whatever `start` acquired (open files, writer threads).
+
+    `resume_frame` (read after `start`) is the first source frame the stage
+    still needs; stages resuming an interrupted run raise it so decoding can
+    seek past the finished part. None means the stage takes frames from
+    wherever decoding starts.
+    """
+
+    resume_frame: int | None = 0
+
+    def start(self, video: VideoInfo):
+        pass
+
+    def process(self, frame: VideoFrame):
+        raise NotImplementedError
+
+    def finish(self):
+        return None
+
+    def abort(self):
+        pass
+
+
+def open_video(video_path: Path):
+    import cv2  # imported on first decode to keep module import cheap
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        return None, None
+
+    info = VideoInfo(
+        path=Path(video_path),
+        fps=cap.get(cv2.CAP_PROP_FPS),
+        frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    )
+    return cap, info
+
+
+def sampling_stride(
+    video_fps: float, target_fps: float | None = None, stride: int | None = None
+) -> int:
+    """Number of source frames per sampled frame.
+
+    A fixed `stride` wins over `target_fps`; with neither every frame is used.
+    """
+    if stride:
+        return max(1, int(stride))
+    if target_fps:
+        return int(video_fps / target_fps) if video_fps > target_fps else 1
+    return 1
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterator, size: int = QUEUE_SIZE) -> Iterator:
+    """Consume `iterator` on a background thread, staying at most `size` items ahead.
+
+    Exceptions raised by the iterator are re-raised in the consumer. Closing
+    the returned generator early stops and joins the background thread.
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(done)
+        except BaseException as e:  # noqa: BLE001 - re-raised in the consumer
+            put(_Failure(e))
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class AsyncWriter:
+    """Runs write calls on a background thread, at most `size` of them pending.
+
+    The first error is re-raised by the next `submit` or by `close`.
+    """
+
+    def __init__(self, size: int = QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=size)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="writer", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            fn, args = item
+            if self.error is None:
+                try:
+                    fn(*args)
+                except Exception as e:  # noqa: BLE001 - re-raised by submit/close
+                    self.error = e
+
+    def submit(self, fn, *args):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((fn, args))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def decode_frames(cap, stride: int, start: int = 0) -> Iterator[VideoFrame]:
+    """Every `stride`-th frame of `cap`, from the first sample at or after
+    source frame `start`. Frames between samples are only grabbed, never
+    retrieved, so they are not fully decoded."""
+    sample_idx = -(-start // stride)
+    frame_idx = sample_idx * stride
+    if frame_idx:
+        import cv2
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    while True:
+        if frame_idx % stride != 0:
+            with timer("decode.grab"):
+                grabbed = cap.grab()
+            if not grabbed:
+                break
+            frame_idx += 1
+            continue
+
+        with timer("decode"):
+            ret, image = cap.read()
+        if not ret:
+            break
+
+        yield VideoFrame(index=frame_idx, image=image, sample_index=sample_idx)
+        frame_idx += 1
+        sample_idx += 1
+
+
+def run_stages(
+    video_path: Path,
+    stages: Sequence[FrameStage],
+    target_fps: float | None = None,
+    stride: int | None = None,
+    threaded: bool = THREADED,
+) -> list | None:
+    """Decode `video_path` once and fan every sampled frame out to `stages`.
+
+    With `threaded`, decoding runs on a background thread a bounded number of
+    frames ahead, so it overlaps with the stages (cv2 and the model runtimes
+    release the GIL). Decoding starts at the lowest `resume_frame` of the
+    stages, and each stage only gets the frames from its own `resume_frame` on.
+    Each stage's `process` time is recorded as the `stage.<class>` timer.
+    If decoding or a stage fails, the stages not finished yet are aborted and
+    the error is re-raised. Returns the list of stage results (in stage
+    order), or None if the video could not be opened.
+    """
+    cap, info = open_video(video_path)
+    if cap is None:
+        print(f"⚠️ Failed to open {video_path}")
+        return None
+
+    info.stride = sampling_stride(info.fps, target_fps, stride)
+    names = [f"stage.{type(stage).__name__}" for stage in stages]
+    pending = []  # started and not finished yet: aborted if the run fails
+    try:
+        for stage in stages:
+            stage.start(info)
+            pending.append(stage)
+        feed_stages(cap, info, stages, names, threaded)
+        results = []
+        for stage, name in zip(stages, names):
+            with timer(name):
+                results.append(stage.finish())
+            pending.remove(stage)
+    except BaseException:
+        for stage in pending:
+            stage.abort()
+        raise
+    finally:
+        cap.release()
+    return results
+
+
+def feed_stages(cap, info: VideoInfo, stages: Sequence[FrameStage], names, threaded: bool):
+    """Decode from the lowest `resume_frame` on and hand every frame to the
+    stages that still need it."""
+    resume = [stage.resume_frame or 0 for stage in stages]
+    start = min(
+        (frame for stage, frame in zip(stages, resume) if stage.resume_frame is not None),
+        default=0,
+    )
+    if start:
+        print(f"⏩ Resuming {info.name} at frame {start}")
+
+    frames = decode_frames(cap, info.stride, start)
+    if threaded:
+        frames = prefetch(frames)
+    try:
+        for frame in frames:
+            count("frames")
+            for stage, resume_frame, name in zip(stages, resume, names):
+                if frame.index >= resume_frame:
+                    start_time = time.perf_counter()
+                    stage.process(frame)
+                    current.add_time(name, time.perf_counter() - start_time)
+    finally:
+        frames.close()
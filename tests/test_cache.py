@@ -0,0 +1,141 @@
+import os
+
+import pytest
+
+from ObjectMD import cache as cache_module
+from ObjectMD.cache import StageCache, run_cached
+from ObjectMD.parallel import ItemsFailed
+
+PARAMS = {"stride": 1}
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Names of the files hashed so far."""
+    names = []
+    hash_file = cache_module.hash_file
+
+    def recording_hash_file(path):
+        names.append(path.name)
+        return hash_file(path)
+
+    monkeypatch.setattr(cache_module, "hash_file", recording_hash_file)
+    return names
+
+
+def touch_later(path):
+    """Bump mtime explicitly; coarse filesystem clocks may not tick between test steps."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.fixture
+def files(tmp_path):
+    """An input and an output file, with the output recorded in a fresh cache."""
+    source, output = tmp_path / "video.mp4", tmp_path / "detections_video.json"
+    source.write_bytes(b"frames")
+    output.write_text("[]")
+    cache = StageCache("detection", PARAMS, cache_dir=tmp_path / "cache")
+    cache.record("video", [source], [output])
+    cache.save()
+    return source, output
+
+
+def reloaded(tmp_path, params=PARAMS, enabled=True):
+    return StageCache("detection", params, cache_dir=tmp_path / "cache", enabled=enabled)
+
+
+def test_unchanged_entry_is_up_to_date(tmp_path, files):
+    source, output = files
+    assert reloaded(tmp_path).is_up_to_date("video", [source], [output])
+    assert not reloaded(tmp_path).is_up_to_date("other", [source], [output])
+    assert not reloaded(tmp_path, enabled=False).is_up_to_date("video", [source], [output])
+
+
+def test_changed_params_or_item_params_make_it_stale(tmp_path, files):
+    source, output = files
+    assert not reloaded(tmp_path, {"stride": 2}).is_up_to_date("video", [source], [output])
+    assert not reloaded(tmp_path).is_up_to_date("video", [source], [output],
+                                                item_params={"fps": 25.0})
+
+    cache = reloaded(tmp_path)
+    cache.record("video", [source], [output], item_params={"fps": 25.0})
+    assert cache.is_up_to_date("video", [source], [output], item_params={"fps": 25.0})
+    assert not cache.is_up_to_date("video", [source], [output], item_params={"fps": 30.0})
+
+
+def test_changed_input_content_makes_it_stale(tmp_path, files):
+    source, output = files
+    source.write_bytes(b"other frames")
+    touch_later(source)
+    assert not reloaded(tmp_path).is_up_to_date("video", [source], [output])
+
+
+def test_touched_input_with_the_same_content_stays_up_to_date(tmp_path, files, hashed):
+    source, output = files
+    touch_later(source)
+    assert reloaded(tmp_path).is_up_to_date("video", [source], [output])
+    assert hashed == ["video.mp4"]  # rehashed once, since its mtime changed
+
+
+def test_missing_or_modified_output_forces_a_rerun(tmp_path, files):
+    source, output = files
+    output.write_text('[{"frame": 0}]')
+    touch_later(output)
+    assert not reloaded(tmp_path).is_up_to_date("video", [source], [output])
+    output.unlink()
+    assert not reloaded(tmp_path).is_up_to_date("video", [source], [output])
+
+
+def test_file_hashes_are_memoized_by_size_and_mtime(tmp_path, files, hashed):
+    source, output = files
+    cache = reloaded(tmp_path)
+    for _ in range(3):
+        cache.is_up_to_date("video", [source], [output])
+    assert hashed == []  # hashed when recorded; the saved memo is reused
+
+    source.write_bytes(b"FRAMES")  # same size, new mtime
+    touch_later(source)
+    cache.is_up_to_date("video", [source], [output])
+    cache.is_up_to_date("video", [source], [output])
+    assert hashed == ["video.mp4"]
+
+
+def test_run_cached_records_only_the_items_that_produced_output(tmp_path):
+    inputs = {}
+    for name in ("a", "b", "c"):
+        inputs[name] = tmp_path / f"{name}.mp4"
+        inputs[name].write_bytes(name.encode())
+    processed = []
+
+    def process(name, fail=()):
+        processed.append(name)
+        if name in fail:
+            raise ValueError(f"cannot process {name}")
+        if name == "c":
+            return None  # e.g. no labels: nothing written, nothing recorded
+        (tmp_path / f"out_{name}").write_text(name)
+        return name
+
+    def run(fail=()):
+        processed.clear()
+        return run_cached(
+            StageCache("stage", PARAMS, cache_dir=tmp_path / "cache"),
+            lambda name: process(name, fail),
+            sorted(inputs),
+            name_fn=str,
+            inputs_fn=lambda name: [inputs[name]],
+            outputs_fn=lambda name: [tmp_path / f"out_{name}"],
+        )
+
+    with pytest.raises(ItemsFailed) as failed:
+        run(fail=("b",))
+    assert list(failed.value.failures) == ["b"]
+    assert processed == ["a", "b", "c"]
+
+    results, failures = run()
+    assert processed == ["b", "c"]  # the failed and the output-less items run again
+    assert results == {"b": "b", "c": None} and failures == {}
+
+    run()
+    assert processed == ["c"]
@@ -0,0 +1,135 @@
+import json
+import os
+
+import pytest
+
+from ObjectMD import catalog as catalog_module
+from ObjectMD.catalog import CATALOG_VERSION, VideoCatalog
+
+METADATA = {"fps": 30.0, "frame_count": 90, "width": 640, "height": 480, "duration": 3.0}
+
+
+@pytest.fixture
+def probed(monkeypatch):
+    """Names of the videos probed so far; probing returns METADATA without decoding."""
+    names = []
+
+    def probe_video(path):
+        names.append(path.name)
+        return dict(METADATA)
+
+    monkeypatch.setattr(catalog_module, "probe_video", probe_video)
+    return names
+
+
+@pytest.fixture
+def listed(monkeypatch):
+    """Directories listed with os.scandir so far."""
+    dirs = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        dirs.append(path.name)
+        return scandir(path)
+
+    monkeypatch.setattr(catalog_module.os, "scandir", recording_scandir)
+    return dirs
+
+
+def add_video(root, rel_path):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"not really a video")
+    # Coarse filesystem clocks may not tick between test steps; make the change visible
+    stat = path.parent.stat()
+    os.utime(path.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    return path
+
+
+def refreshed(tmp_path, **kwargs):
+    catalog = VideoCatalog(tmp_path / "raw", tmp_path / "catalog.json",
+                           tmp_path / "labels.json").refresh(**kwargs)
+    catalog.save()
+    return catalog
+
+
+def test_refresh_only_lists_changed_dirs_and_probes_new_videos(tmp_path, probed, listed):
+    root = tmp_path / "raw"
+    add_video(root, "a/one.mp4")
+    add_video(root, "b/two.mp4")
+    catalog = refreshed(tmp_path)
+    assert sorted(catalog.videos) == ["one.mp4", "two.mp4"]
+    assert catalog.get("one.mp4")["path"] == os.path.join("a", "one.mp4")
+    assert catalog.fps_of("two.mp4") == METADATA["fps"]
+    assert sorted(probed) == ["one.mp4", "two.mp4"]
+
+    probed.clear(), listed.clear()
+    refreshed(tmp_path)
+    assert probed == [] and listed == []
+
+    add_video(root, "b/three.mp4")
+    catalog = refreshed(tmp_path)
+    assert listed == ["b"]
+    assert probed == ["three.mp4"]
+    assert sorted(catalog.videos) == ["one.mp4", "three.mp4", "two.mp4"]
+
+
+def test_removed_videos_leave_the_catalog(tmp_path, probed):
+    root = tmp_path / "raw"
+    add_video(root, "a/one.mp4")
+    path = add_video(root, "a/two.mp4")
+    refreshed(tmp_path)
+
+    path.unlink()
+    stat = path.parent.stat()
+    os.utime(path.parent, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert sorted(refreshed(tmp_path).videos) == ["one.mp4"]
+
+
+def test_catalog_of_another_version_is_rebuilt(tmp_path, probed):
+    add_video(tmp_path / "raw", "a/one.mp4")
+    refreshed(tmp_path)
+    data = json.loads((tmp_path / "catalog.json").read_text())
+    data["version"] = CATALOG_VERSION - 1
+    (tmp_path / "catalog.json").write_text(json.dumps(data))
+
+    probed.clear()
+    catalog = refreshed(tmp_path)
+    assert probed == ["one.mp4"]
+    assert json.loads((tmp_path / "catalog.json").read_text())["version"] == CATALOG_VERSION
+    assert catalog.get("one.mp4")["labels"] == []
+
+
+def test_duplicate_names_keep_the_first_path_and_warn(tmp_path, probed, capsys):
+    root = tmp_path / "raw"
+    add_video(root, "a/same.mp4")
+    add_video(root, "b/same.mp4")
+    catalog = refreshed(tmp_path)
+    assert catalog.get("same.mp4")["path"] == os.path.join("a", "same.mp4")
+    assert "Duplicate video name same.mp4" in capsys.readouterr().out
+
+
+def test_every_label_entry_of_a_video_is_attached(tmp_path, probed):
+    add_video(tmp_path / "raw", "a/one.mp4")
+    add_video(tmp_path / "raw", "a/two.mp4")
+    labels = [
+        {"video": "one.mp4", "start_time": 1.0, "end_time": 2.0},
+        {"video": "two.mp4", "start_time": 0.5, "end_time": 1.5},
+        {"video": "one.mp4", "start_time": 4.0, "end_time": 5.0},
+        {"video": "missing.mp4", "start_time": 0.0, "end_time": 1.0},
+    ]
+    (tmp_path / "labels.json").write_text(json.dumps(labels))
+    catalog = refreshed(tmp_path)
+    assert catalog.get("one.mp4")["labels"] == [labels[0], labels[2]]
+    assert catalog.get("two.mp4")["labels"] == [labels[1]]
+    assert catalog.paths(labeled_only=True) == sorted(catalog.paths())
+
+    # Changing the labels file re-attaches them without probing anything
+    probed.clear()
+    (tmp_path / "labels.json").write_text(json.dumps(labels[:1]))
+    stat = (tmp_path / "labels.json").stat()
+    os.utime(tmp_path / "labels.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    catalog = refreshed(tmp_path)
+    assert probed == []
+    assert catalog.get("one.mp4")["labels"] == [labels[0]]
+    assert catalog.get("two.mp4")["labels"] == []
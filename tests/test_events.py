@@ -0,0 +1,99 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ObjectMD import events as events_module
+from ObjectMD.events import EventSegmenter, segment
+
+FPS = 10  # one sample every 0.1 s
+SETTINGS = {"enter_threshold": 0.5, "exit_threshold": 0.3, "smoothing": 1.0,
+            "min_duration_s": 0.15, "merge_gap_s": 0.25}
+
+
+def events_of(scores, times=None, **overrides):
+    scores = np.asarray(scores, dtype=np.float64)
+    frames = np.arange(len(scores))
+    times = frames / FPS if times is None else np.asarray(times, dtype=np.float64)
+    events = segment(frames, times, scores, EventSegmenter(**{**SETTINGS, **overrides}))
+    return [(event["start_s"], event["end_s"]) for event in events]
+
+
+@pytest.mark.parametrize("scores, expected", [
+    # nothing reaches the enter threshold
+    ([0.0, 0.4, 0.45, 0.2, 0.0], []),
+    # hysteresis: 0.4 is below enter but above exit, so the event stays open
+    ([0.0, 0.6, 0.4, 0.4, 0.6, 0.2, 0.0], [(0.1, 0.4)]),
+    # after closing, 0.4 is not enough to open a new event
+    ([0.6, 0.6, 0.6, 0.1, 0.1, 0.1, 0.4, 0.4, 0.4], [(0.0, 0.2)]),
+    # a dip shorter than the merge gap is merged into one event
+    ([0.6, 0.6, 0.6, 0.1, 0.6, 0.6, 0.6, 0.0, 0.0, 0.0], [(0.0, 0.6)]),
+    # a dip longer than the merge gap gives two events
+    ([0.6, 0.6, 0.6, 0.1, 0.1, 0.1, 0.6, 0.6, 0.6], [(0.0, 0.2), (0.6, 0.8)]),
+    # events shorter than min_duration_s are dropped
+    ([0.0, 0.6, 0.0, 0.0, 0.0, 0.6, 0.6, 0.0], []),
+    ([0.0, 0.6, 0.6, 0.6, 0.0], [(0.1, 0.3)]),
+    # an event still open at the end of the stream is emitted by finish
+    ([0.0, 0.0, 0.6, 0.6, 0.6], [(0.2, 0.4)]),
+    # missing scores are skipped
+    ([0.6, np.nan, 0.6, 0.6, 0.0], [(0.0, 0.3)]),
+])
+def test_segments(scores, expected):
+    assert events_of(scores) == expected
+
+
+def test_time_gap_without_samples_closes_the_event():
+    times = [0.0, 0.1, 0.2, 1.0, 1.1, 1.2]
+    assert events_of([0.6] * 6, times=times) == [(0.0, 0.2), (1.0, 1.2)]
+
+
+@pytest.mark.parametrize("smoothing, expected", [
+    (1.0, [(0.2, 0.2)]),  # raw scores: the one-sample spike is an event
+    (0.5, []),  # smoothed to 0.5, below the 0.6 enter threshold
+])
+def test_smoothing_suppresses_single_sample_spikes(smoothing, expected):
+    scores = [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0]
+    assert events_of(scores, smoothing=smoothing, enter_threshold=0.6,
+                     min_duration_s=0.0) == expected
+
+
+def test_event_record_fields():
+    segmenter = EventSegmenter(**SETTINGS, video="clip")
+    frames = np.arange(6)
+    events = segment(frames, frames / FPS, np.array([0.0, 0.6, 0.4, 0.8, 0.0, 0.0]),
+                     segmenter)
+    assert events == [{
+        "video": "clip", "start_frame": 1, "end_frame": 3,
+        "start_s": 0.1, "end_s": 0.3, "duration_s": 0.2,
+        "confidence": round(2 / 3, 3), "mean_score": 0.6, "peak_score": 0.8,
+    }]
+
+
+def test_exit_threshold_above_enter_threshold_is_rejected():
+    with pytest.raises(ValueError):
+        EventSegmenter(enter_threshold=0.3, exit_threshold=0.5)
+
+
+def test_a_video_is_resegmented_when_its_fps_becomes_known(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the stage and its cache use relative data/ paths
+    predictions_dir = tmp_path / "data" / "processed" / "predictions"
+    predictions_dir.mkdir(parents=True)
+    frames = np.arange(60)
+    for name in ("a", "b"):
+        pd.DataFrame({"frame": frames, "probability": ((frames >= 10) & (frames < 40)) * 0.9}
+                     ).to_csv(predictions_dir / f"predictions_{name}.csv", index=False)
+
+    def run(video_fps):
+        videos = {f"{name}.mp4": {"fps": fps} for name, fps in video_fps.items()}
+        monkeypatch.setattr(events_module, "load_catalog", lambda: SimpleNamespace(videos=videos))
+        events_module.main(source="predictions", enter_threshold=None, exit_threshold=None,
+                           min_duration_s=0.0, merge_gap_s=0.0, workers=1, force=False)
+        return {name: json.loads((tmp_path / "data" / "processed" / "events"
+                                  / f"events_{name}.json").read_text())[0]["start_s"]
+                for name in ("a", "b")}
+
+    assert run({"a": None, "b": 10.0}) == {"a": round(10 / events_module.DEFAULT_FPS, 3),
+                                           "b": 1.0}
+    assert run({"a": 20.0, "b": 10.0}) == {"a": 0.5, "b": 1.0}
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ObjectMD import is_moving
+from ObjectMD.is_moving import (
+    DEFAULT_FPS,
+    build_video_label_dict,
+    label_features_with_movement,
+    label_fps,
+    label_frames,
+    merge_intervals,
+)
+from ObjectMD.storage import load_features
+
+
+def label(video, start_s, end_s):
+    return {"video": video, "action_start": {"video_second": start_s},
+            "action_end": {"video_second": end_s}}
+
+
+@pytest.mark.parametrize("intervals, expected", [
+    ([(10, 20)], ([10], [20])),
+    ([(10, 20), (15, 30)], ([10], [30])),  # overlapping
+    ([(10, 20), (21, 30)], ([10], [30])),  # touching: no unlabeled frame in between
+    ([(10, 20), (22, 30)], ([10, 22], [20, 30])),  # disjoint: frame 21 stays unlabeled
+    ([(40, 50), (10, 20), (12, 14)], ([10, 40], [20, 50])),  # unsorted, one nested
+    ([(10, 30), (12, 14), (16, 18), (31, 35)], ([10], [35])),
+])
+def test_merge_intervals(intervals, expected):
+    starts, ends = merge_intervals(np.array(intervals, dtype=np.int64))
+    assert (starts.tolist(), ends.tolist()) == expected
+
+
+def test_label_frames_includes_both_boundaries():
+    intervals = (np.array([10, 22]), np.array([20, 30]))
+    frames = [0, 9, 10, 15, 20, 21, 22, 30, 31, 100]
+    assert label_frames(frames, intervals).tolist() == [0, 0, 1, 1, 1, 0, 1, 1, 0, 0]
+
+
+def test_label_frames_without_intervals():
+    empty = (np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    assert label_frames([0, 5], empty).tolist() == [0, 0]
+
+
+def test_build_video_label_dict_merges_every_entry_of_a_video():
+    label_data = [
+        label("a.mp4", 1.0, 2.0),
+        label("b.mp4", 0.0, 0.5),
+        label("a.mp4", 1.5, 3.0),  # overlaps the first action of a
+        label("a.mp4", 5.0, 6.0),
+        label("a.mp4", 7.0, 6.0),  # ends before it starts: ignored
+        {"video": "a.mp4", "action_start": {"video_second": 8.0}},  # no end: ignored
+    ]
+    video_labels = build_video_label_dict(label_data, {"a.mp4": 10.0, "b.mp4": 20.0})
+    assert sorted(video_labels) == ["a", "b"]
+    assert [bounds.tolist() for bounds in video_labels["a"]] == [[10, 50], [30, 60]]
+    assert [bounds.tolist() for bounds in video_labels["b"]] == [[0], [10]]
+
+
+def test_videos_without_fps_fall_back_to_the_default(capsys):
+    label_data = [label("a.mp4", 1.0, 2.0), label("b.mp4", 1.0, 2.0)]
+    fps = label_fps(label_data, {"a.mp4": 10.0, "b.mp4": None})
+    assert fps == {"a.mp4": 10.0, "b.mp4": DEFAULT_FPS}
+    assert "No fps for 1 labeled video(s)" in capsys.readouterr().out
+
+    video_labels = build_video_label_dict(label_data)
+    assert [bounds.tolist() for bounds in video_labels["b"]] == [[DEFAULT_FPS],
+                                                                  [2 * DEFAULT_FPS]]
+
+
+@pytest.fixture
+def relabeled(monkeypatch):
+    """Video names labeled so far."""
+    names = []
+    label_feature_file = is_moving.label_feature_file
+
+    def recording(feature_file, **kwargs):
+        names.append(feature_file.stem)
+        return label_feature_file(feature_file, **kwargs)
+
+    monkeypatch.setattr(is_moving, "label_feature_file", recording)
+    return names
+
+
+def run_labeling(tmp_path, label_data, video_fps):
+    fps = label_fps(label_data, video_fps)
+    label_features_with_movement(tmp_path / "features", build_video_label_dict(label_data, fps),
+                                 output_dir=tmp_path / "labeled", fps=fps)
+
+
+def test_labeling_one_video_does_not_relabel_the_others(tmp_path, monkeypatch, relabeled):
+    monkeypatch.chdir(tmp_path)  # stage cache manifests go to the relative CACHE_DIR
+    (tmp_path / "features").mkdir()
+    for name in ("a", "b", "c"):
+        pd.DataFrame({"frame": np.arange(100)}).to_csv(
+            tmp_path / "features" / f"features_{name}.csv", index=False)
+    labels = [label("a.mp4", 1.0, 2.0), label("b.mp4", 0.5, 1.0)]
+    video_fps = {"a.mp4": 30.0}
+
+    run_labeling(tmp_path, labels, video_fps)
+    assert sorted(relabeled) == ["features_a", "features_b", "features_c"]
+
+    relabeled.clear()
+    run_labeling(tmp_path, labels, video_fps)
+    assert sorted(relabeled) == ["features_c"]  # unlabeled videos produce no output
+
+    # A new label for c and a newly known fps for b leave a untouched
+    relabeled.clear()
+    run_labeling(tmp_path, labels + [label("c.mp4", 0.0, 0.5)], {**video_fps, "b.mp4": 10.0})
+    assert sorted(relabeled) == ["features_b", "features_c"]
+    labeled_b = load_features(tmp_path / "labeled" / "features_b.csv")
+    assert labeled_b.loc[labeled_b["is_moving"] == 1, "frame"].tolist() == list(range(5, 11))
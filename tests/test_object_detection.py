@@ -0,0 +1,99 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ObjectMD.object_detection import (
+    DetectionStage,
+    detect_objects_in_batch,
+    detect_objects_in_frame,
+)
+from ObjectMD.video_pipeline import VideoFrame, VideoInfo
+
+HEIGHT, WIDTH = 20, 30
+
+
+class StubModel:
+    """Ultralytics-style stand-in whose boxes follow the pixel value of each frame.
+
+    Every frame yields a "box", a "package" below the confidence threshold and
+    a "person"; only the first one must come through. `calls` records how many
+    frames each model call got.
+    """
+
+    names = {0: "box", 1: "package", 2: "person"}
+
+    def __init__(self):
+        self.calls = []
+
+    def result(self, image):
+        value = int(image[0, 0, 0])
+        boxes = [
+            SimpleNamespace(cls=0, conf=[0.5 + value / 1000], xyxy=[[value, 1, value + 5, 6]]),
+            SimpleNamespace(cls=1, conf=[0.2], xyxy=[[0, 0, 1, 1]]),
+            SimpleNamespace(cls=2, conf=[0.99], xyxy=[[0, 0, 2, 2]]),
+        ]
+        return SimpleNamespace(boxes=boxes)
+
+    def __call__(self, images):
+        images = images if isinstance(images, list) else [images]
+        self.calls.append(len(images))
+        return [self.result(image) for image in images]
+
+
+def image(value):
+    return np.full((HEIGHT, WIDTH, 3), value, dtype=np.uint8)
+
+
+def test_batched_detections_match_per_frame_detections():
+    values = [3, 9, 4, 12, 7]
+    frame_indices = [10, 12, 14, 16, 18]
+    sample_indices = [5, 6, 7, 8, 9]
+    images = [image(value) for value in values]
+
+    model = StubModel()
+    batched = detect_objects_in_batch(images, frame_indices, sample_indices, model)
+    assert model.calls == [len(images)]
+
+    per_frame = [detect_objects_in_frame(img, frame_idx, sample_idx, StubModel())
+                 for img, frame_idx, sample_idx in zip(images, frame_indices, sample_indices)]
+    assert batched == per_frame
+    assert [dets[0]["frame"] for dets in batched] == frame_indices
+    assert [dets[0]["bbox"][0] for dets in batched] == values
+    assert all(len(dets) == 1 and dets[0]["label"] == "box" for dets in batched)
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 4])
+def test_detection_stage_batches_keep_frame_order_reuse_and_the_last_partial_batch(
+        batch_size):
+    # frames 3, 4 and 8 are static and reuse the detections of the frame before them
+    static = {3, 4, 8}
+    frames = [VideoFrame(index=2 * i, image=image(i + 1), sample_index=i, static=i in static)
+              for i in range(10)]
+
+    model = StubModel()
+    stage = DetectionStage(output_dir=None, batch_size=batch_size, model=model)
+    stage.start(VideoInfo(path=Path("video.mp4"), fps=30.0, frame_count=20,
+                          width=WIDTH, height=HEIGHT, stride=2))
+    for frame in frames:
+        stage.process(frame)
+    detections = stage.finish()
+
+    live = [frame for frame in frames if not frame.static]
+    expected = []
+    last = None
+    for frame in frames:
+        if not frame.static:
+            last = detect_objects_in_frame(frame.image, frame.index, frame.sample_index,
+                                           StubModel())
+            last = [dict(det, image_width=WIDTH, image_height=HEIGHT) for det in last]
+        expected.extend(dict(det, frame=frame.index, sample_index=frame.sample_index)
+                        for det in last)
+
+    assert detections == expected
+    assert [det["frame"] for det in detections] == [frame.index for frame in frames]
+    assert stage.reused == len(static)
+    # full batches of live frames, then whatever is left when the video ends
+    full, rest = divmod(len(live), batch_size)
+    assert model.calls == [batch_size] * full + ([rest] if rest else [])
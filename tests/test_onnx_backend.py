@@ -0,0 +1,78 @@
+from glob import glob
+
+import numpy as np
+import pytest
+
+from ObjectMD.object_detection import (
+    ONNX_PATH,
+    WEIGHTS_PATH,
+    detect_objects_in_batch,
+    get_model,
+)
+from ObjectMD.onnx_backend import letterbox, nms, postprocess
+from ObjectMD.tracking import box_iou
+
+NUM_FRAMES = 8
+
+
+def sample_frames(tmp_path):
+    """A few frames of the first raw video, or of a synthetic one."""
+    import cv2
+
+    from ObjectMD.benchmarks.pipeline import make_synthetic_video
+
+    videos = sorted(glob("data/raw/**/*.mp4", recursive=True))
+    if videos:
+        video_path = videos[0]
+    else:
+        video_path = tmp_path / "synthetic.mp4"
+        make_synthetic_video(video_path, 640, 480, 25, 2.0)
+    cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    while len(frames) < NUM_FRAMES:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def test_letterbox_boxes_map_back_to_the_frame():
+    frame = np.zeros((480, 1280, 3), dtype=np.uint8)
+    image, scale, pad = letterbox(frame)
+    assert image.shape == (640, 640, 3)
+    assert scale == 0.5 and pad == (0, 200)
+
+    # one "box" anchor at (100, 50)-(300, 150) in the frame, in letterboxed coordinates
+    output = np.zeros((5, 2), dtype=np.float32)
+    output[:, 0] = [100, 250, 100, 50, 0.9]
+    boxes, conf, cls = postprocess(output, scale, pad, frame.shape)
+    np.testing.assert_allclose(boxes, [[100, 50, 300, 150]])
+    assert conf.tolist() == pytest.approx([0.9]) and cls.tolist() == [0]
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+
+
+def test_onnx_detections_match_pytorch(tmp_path):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    if not WEIGHTS_PATH.exists() or not ONNX_PATH.exists():
+        pytest.skip("needs trained weights exported with `python -m ObjectMD.onnx_backend`")
+
+    frames = sample_frames(tmp_path)
+    indices = list(range(len(frames)))
+    reference = detect_objects_in_batch(frames, indices, model=get_model("torch"))
+    candidate = detect_objects_in_batch(frames, indices, model=get_model("onnx"))
+
+    for expected, actual in zip(reference, candidate):
+        assert len(actual) == len(expected)
+        for det in expected:
+            match = max(actual, key=lambda other: box_iou(det["bbox"], other["bbox"]))
+            assert match["label"] == det["label"]
+            assert box_iou(det["bbox"], match["bbox"]) > 0.9
+            assert match["confidence"] == pytest.approx(det["confidence"], abs=0.02)
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ObjectMD.feature_extraction import extract_features
+from ObjectMD.preprocess import ResizeStage, fit_scale, to_source, with_resize
+from ObjectMD.video_pipeline import VideoFrame, VideoInfo
+
+
+@pytest.mark.parametrize("width, height, max_side, scale", [
+    (1920, 1080, 640, 1 / 3),
+    (720, 1280, 640, 0.5),  # portrait: the longest side is the height
+    (640, 480, 640, 1.0),
+    (320, 240, 640, 1.0),  # never upscales
+    (1920, 1080, None, 1.0),
+    (1920, 1080, 0, 1.0),
+])
+def test_fit_scale(width, height, max_side, scale):
+    assert fit_scale(width, height, max_side) == pytest.approx(scale)
+
+
+def bbox_of(image):
+    """[x1, y1, x2, y2] (end exclusive) of the bright pixels of a frame."""
+    ys, xs = np.nonzero(image[:, :, 0] > 127)
+    return [int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1]
+
+
+def on_grid(value):
+    """Multiple of 6 source pixels: a whole model pixel at scale 1/3 and 1/2."""
+    return 6 * (value // 6)
+
+
+@pytest.mark.parametrize("width, height", [(1920, 1080), (1280, 720), (720, 1280),
+                                           (640, 480)])
+def test_box_found_on_the_downscaled_frame_maps_back_to_source_pixels(width, height):
+    source_box = [on_grid(width // 4), on_grid(height // 3),
+                  on_grid(width * 2 // 3), on_grid(height * 3 // 4)]
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[source_box[1]:source_box[3], source_box[0]:source_box[2]] = 255
+
+    stage = ResizeStage(640)
+    stage.start(VideoInfo(path=Path("video.mp4"), fps=30.0, frame_count=1,
+                          width=width, height=height))
+    frame = VideoFrame(index=0, image=image, sample_index=0)
+    stage.process(frame)
+
+    assert max(frame.model_input.shape[:2]) == min(640, max(width, height))
+    assert frame.image is image  # the full-size frame is kept for frame export
+    detections = [{"frame": 0, "bbox": bbox_of(frame.model_input), "confidence": 0.9}]
+    [mapped] = to_source(detections, frame.scale, width, height)
+    np.testing.assert_allclose(mapped["bbox"], source_box, atol=1)
+    assert (mapped["image_width"], mapped["image_height"]) == (width, height)
+    assert mapped["confidence"] == 0.9
+
+
+def test_with_resize():
+    assert with_resize([], None) == []
+    [stage] = with_resize([], 320)
+    assert isinstance(stage, ResizeStage) and stage.max_side == 320
+
+
+def test_features_normalize_each_row_by_its_own_frame_size():
+    # the same relative layout (box in the middle, left wrist at a quarter) in
+    # a 1080p frame, a 480p frame and a legacy row without a recorded size
+    boxes = [
+        {"frame": 0, "bbox": [860, 490, 1060, 590], "confidence": 0.9, "label": "box",
+         "image_width": 1920, "image_height": 1080},
+        {"frame": 1, "bbox": [220, 190, 420, 290], "confidence": 0.9, "label": "box",
+         "image_width": 640, "image_height": 480},
+        {"frame": 2, "bbox": [220, 190, 420, 290], "confidence": 0.9, "label": "box"},
+    ]
+    pose = {"frames": [
+        {"frame_index": 0, "left_wrist": [480, 270], "right_wrist": [None, None]},
+        {"frame_index": 1, "left_wrist": [160, 120], "right_wrist": [0.75, 0.75]},
+        {"frame_index": 2, "left_wrist": [160, 120], "right_wrist": [None, None]},
+    ]}
+    features = extract_features(pose, boxes)
+
+    np.testing.assert_allclose(features["box_cx"], [0.5, 0.5, 0.5])
+    np.testing.assert_allclose(features["box_cy"], [0.5, 0.5, 0.5])
+    np.testing.assert_allclose(features["box_w"], [200 / 1920, 200 / 640, 200 / 640])
+    np.testing.assert_allclose(features["left_wrist_x"], [0.25, 0.25, 0.25])
+    np.testing.assert_allclose(features["left_wrist_y"], [0.25, 0.25, 0.25])
+    # already normalized wrists are left alone
+    assert features["right_wrist_x"].tolist()[1] == 0.75
+    np.testing.assert_allclose(features["dist_left_to_box"], [np.hypot(0.25, 0.25)] * 3)
@@ -0,0 +1,161 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ObjectMD.storage import (
+    concat_tables,
+    detections_path,
+    detections_writer,
+    load_detections,
+    load_pose,
+    pose_path,
+    pose_writer,
+    read_table,
+    save_detections,
+    save_pose,
+    video_name_of,
+    write_table,
+)
+
+NUM_FRAMES = 10
+FLUSH_EVERY = 3
+RESUME_KEY = {"weights": "best.pt", "stride": 1}
+
+
+def frame_detections(frame):
+    """Zero to two detections per frame, with labels of different lengths."""
+    return [
+        {"frame": frame, "sample_index": frame, "label": "box" if i else "package",
+         "confidence": 0.5 + frame / 100, "bbox": [frame, i, frame + 10, i + 10],
+         "source": "detect", "image_width": 640, "image_height": 480}
+        for i in range(frame % 3)
+    ]
+
+
+def frame_pose(frame):
+    return {"frame_index": frame, "sample_index": frame,
+            "left_wrist": [frame / 10, 0.5] if frame % 2 else [None, None],
+            "right_wrist": [0.25, frame / 20],
+            "confidence": [0.9, 0.8]}
+
+
+def write_frames(writer, frames, records_of):
+    for frame in frames:
+        records = records_of(frame)
+        writer.write_frame(frame, records if isinstance(records, list) else [records])
+
+
+ARTIFACTS = {
+    "detections": (
+        lambda tmp_path, fmt: detections_path(tmp_path, "video", fmt),
+        lambda path, key: detections_writer(path, FLUSH_EVERY, key),
+        frame_detections,
+        lambda frames, path: save_detections(frames, path),
+        load_detections,
+    ),
+    "pose": (
+        lambda tmp_path, fmt: pose_path(tmp_path, "video", fmt),
+        lambda path, key: pose_writer(path, "video.mp4", FLUSH_EVERY, key),
+        frame_pose,
+        lambda frames, path: save_pose("video.mp4", frames, path),
+        load_pose,
+    ),
+}
+
+
+def expected_records(records_of):
+    records = []
+    for frame in range(NUM_FRAMES):
+        frame_records = records_of(frame)
+        records.extend(frame_records if isinstance(frame_records, list) else [frame_records])
+    return records
+
+
+@pytest.mark.parametrize("fmt", ["json", "parquet", "npz"])
+@pytest.mark.parametrize("artifact", sorted(ARTIFACTS))
+def test_interrupted_writer_resumes_and_publishes_the_full_artifact(tmp_path, artifact, fmt):
+    path_of, writer_of, records_of, save, load = ARTIFACTS[artifact]
+    path = path_of(tmp_path, fmt)
+
+    # Interrupted run: 7 frames written, only the first two flushes (6 frames) on disk
+    writer = writer_of(path, RESUME_KEY)
+    write_frames(writer, range(7), records_of)
+    partial_output = writer.partial if fmt == "json" else writer.parts_dir
+    assert partial_output.exists() and writer.progress_path.exists()
+    assert not path.exists()
+    if fmt == "json":
+        with open(writer.partial, "ab") as f:
+            f.write(b',\n  {"half a rec')  # torn write after the last flush
+    else:
+        (writer.parts_dir / f"part-00099{path.suffix}").write_bytes(b"torn")
+    del writer
+
+    resumed = writer_of(path, RESUME_KEY)
+    assert resumed.resume_frame == 6
+    write_frames(resumed, range(resumed.resume_frame, NUM_FRAMES), records_of)
+    resumed.close()
+
+    assert path.exists()
+    assert not resumed.partial.exists()
+    assert not resumed.parts_dir.exists()
+    assert not resumed.progress_path.exists()
+
+    reference = tmp_path / "reference" / path.name
+    reference.parent.mkdir()
+    save(expected_records(records_of), reference)
+    if fmt == "json":
+        assert path.read_bytes() == reference.read_bytes()
+    pd.testing.assert_frame_equal(load(path), load(reference))
+
+
+@pytest.mark.parametrize("fmt", ["json", "parquet"])
+def test_writer_with_another_resume_key_starts_over(tmp_path, fmt):
+    path = detections_path(tmp_path, "video", fmt)
+    writer = detections_writer(path, FLUSH_EVERY, RESUME_KEY)
+    write_frames(writer, range(7), frame_detections)
+    del writer
+
+    restarted = detections_writer(path, FLUSH_EVERY, {**RESUME_KEY, "stride": 2})
+    assert restarted.resume_frame == 0 and restarted.count == 0
+    write_frames(restarted, range(NUM_FRAMES), frame_detections)
+    restarted.close()
+    assert len(load_detections(path)) == len(expected_records(frame_detections))
+
+
+@pytest.mark.parametrize("fmt", ["json", "npz"])
+def test_writer_without_records_publishes_an_empty_artifact(tmp_path, fmt):
+    path = detections_path(tmp_path, "video", fmt)
+    writer = detections_writer(path, FLUSH_EVERY)
+    write_frames(writer, range(NUM_FRAMES), lambda frame: [])
+    writer.close()
+    assert len(load_detections(path)) == 0
+    if fmt == "json":
+        assert json.loads(path.read_text()) == []
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "npz"])
+def test_concat_tables_matches_writing_the_concatenated_table(tmp_path, fmt):
+    frames = [
+        pd.DataFrame({"frame": np.arange(i * 4, i * 4 + 4, dtype=np.int32),
+                      "label": ["box", "package", "box", "b"][: 4 - i] + ["x"] * i,
+                      "score": np.linspace(0, 1, 4, dtype=np.float32)})
+        for i in range(3)
+    ]
+    parts = [write_table(df, tmp_path / f"part-{i}.{fmt}") for i, df in enumerate(frames)]
+    concat_tables(parts, tmp_path / f"merged.{fmt}")
+    write_table(pd.concat(frames, ignore_index=True), tmp_path / f"reference.{fmt}")
+    pd.testing.assert_frame_equal(read_table(tmp_path / f"merged.{fmt}"),
+                                  read_table(tmp_path / f"reference.{fmt}"))
+
+
+@pytest.mark.parametrize("path", [
+    "objects/detections_cam_1.parquet",
+    "pose_data/cam_1_pose.json",
+    "features/features_cam_1.csv",
+    "predictions/predictions_cam_1.csv",
+])
+def test_video_name_of_inverts_the_artifact_paths(path):
+    assert video_name_of(Path(path)) == "cam_1"
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from ObjectMD.feature_extraction import (
+    LEFT_HAND,
+    NO_HAND,
+    RIGHT_HAND,
+    hand_targets,
+    nearest_hand,
+    track_deltas,
+)
+from ObjectMD.tracking import MAX_TRACK_AGE, MultiObjectTracker, assign_track_ids
+
+
+def box(x, y, size=40):
+    return [x, y, x + size, y + size]
+
+
+def crossing_boxes(num_frames=12):
+    """Rows (frame, box) of two boxes passing each other: A goes right, B goes left."""
+    rows = []
+    for frame in range(num_frames):
+        a = box(10 * frame, 0)
+        b = box(10 * (num_frames - 1 - frame), 20)
+        # list them in a different order every frame; ids must not follow the order
+        rows.extend([(frame, a, "A"), (frame, b, "B")] if frame % 2 else
+                    [(frame, b, "B"), (frame, a, "A")])
+    return rows
+
+
+def test_crossing_boxes_keep_their_ids():
+    tracker = MultiObjectTracker()
+    ids = {"A": set(), "B": set()}
+    for frame in range(12):
+        frame_rows = [row for row in crossing_boxes() if row[0] == frame]
+        for (_, _, name), track_id in zip(frame_rows,
+                                          tracker.update(frame, [r[1] for r in frame_rows])):
+            ids[name].add(track_id)
+    assert len(ids["A"]) == 1 and len(ids["B"]) == 1
+    assert ids["A"] != ids["B"]
+
+
+def test_assign_track_ids_matches_the_tracker_for_rows_in_any_order():
+    rows = crossing_boxes()
+    shuffled = [rows[i] for i in np.random.default_rng(0).permutation(len(rows))]
+    frames = np.array([frame for frame, _, _ in shuffled])
+    ids = assign_track_ids(frames, np.array([b for _, b, _ in shuffled], dtype=np.float64))
+    by_name = {}
+    for (_, _, name), track_id in zip(shuffled, ids.tolist()):
+        by_name.setdefault(name, set()).add(track_id)
+    assert sorted(len(v) for v in by_name.values()) == [1, 1]
+    assert by_name["A"] != by_name["B"]
+
+
+@pytest.mark.parametrize("gap, same_track", [
+    (MAX_TRACK_AGE, True),  # unseen for max_age frames: still alive
+    (MAX_TRACK_AGE + 1, False),  # one frame longer: a new track
+])
+def test_track_age(gap, same_track):
+    frames = np.array([0, 1, 2, 2 + gap])
+    boxes = np.array([box(0, 0), box(2, 0), box(4, 0), box(6, 0)], dtype=np.float64)
+    ids = assign_track_ids(frames, boxes).tolist()
+    assert ids[:3] == [0, 0, 0]
+    assert (ids[3] == 0) == same_track
+
+    tracker = MultiObjectTracker()
+    tracker_ids = [tracker.update(frame, [b])[0] for frame, b in zip(frames, boxes)]
+    assert tracker_ids == ids
+
+
+def test_far_away_detection_starts_a_new_track():
+    frames = np.array([0, 1, 2])
+    boxes = np.array([box(0, 0), box(2, 0), box(400, 300)], dtype=np.float64)
+    assert assign_track_ids(frames, boxes).tolist() == [0, 0, 1]
+
+
+def test_assign_track_ids_bulk_path_matches_the_frame_by_frame_tracker():
+    # one box drifting for a while, then a second box joins, then it leaves again
+    rng = np.random.default_rng(1)
+    frames, boxes = [], []
+    for frame in range(60):
+        frames.append(frame)
+        boxes.append(box(2 * frame + rng.uniform(-1, 1), 0))
+        if 20 <= frame < 35:
+            frames.append(frame)
+            boxes.append(box(300 - frame, 200))
+    frames, boxes = np.array(frames), np.array(boxes, dtype=np.float64)
+
+    tracker = MultiObjectTracker()
+    expected = np.concatenate([tracker.update(frame, boxes[frames == frame])
+                               for frame in np.unique(frames)])
+    np.testing.assert_array_equal(assign_track_ids(frames, boxes), expected)
+
+
+def test_track_deltas_are_relative_to_the_previous_box_of_the_same_track():
+    # rows interleave two tracks and are not sorted by frame
+    track_ids = np.array([1, 0, 0, 1, 0])
+    frames = np.array([0, 2, 0, 1, 1])
+    cx = np.array([0.5, 0.3, 0.1, 0.6, 0.2])
+    cy = np.array([0.5, 0.0, 0.0, 0.4, 0.1])
+    dx, dy = track_deltas(track_ids, frames, cx, cy)
+    np.testing.assert_allclose(dx, [0.0, 0.1, 0.0, 0.1, 0.1])
+    np.testing.assert_allclose(dy, [0.0, -0.1, 0.0, -0.1, 0.1])
+
+
+def test_nearest_hand():
+    dist_left = np.array([0.1, 0.5, np.nan, 0.2, np.nan])
+    dist_right = np.array([0.3, 0.2, 0.1, np.nan, np.nan])
+    assert nearest_hand(dist_left, dist_right).tolist() == [
+        LEFT_HAND, RIGHT_HAND, RIGHT_HAND, LEFT_HAND, NO_HAND]
+
+
+def test_hand_targets_mark_the_closest_box_per_frame_and_wrist():
+    frames = np.array([0, 0, 0, 1, 1])
+    dist_left = np.array([0.3, 0.1, 0.5, np.nan, np.nan])
+    dist_right = np.array([0.2, 0.4, 0.6, np.nan, 0.7])
+    # frame 0: box 1 is closest to the left wrist, box 0 to the right one;
+    # frame 1: only the right wrist of the second box is known
+    assert hand_targets(frames, dist_left, dist_right).tolist() == [1, 1, 0, 0, 1]
@@ -0,0 +1,170 @@
+from pathlib import Path
+import threading
+
+import numpy as np
+import pytest
+
+from ObjectMD import video_pipeline
+from ObjectMD.video_pipeline import (
+    AsyncWriter,
+    FrameStage,
+    VideoInfo,
+    decode_frames,
+    prefetch,
+    run_stages,
+)
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in over `num_frames` frames whose pixels hold their index."""
+
+    def __init__(self, num_frames, fail_at=None):
+        self.num_frames = num_frames
+        self.fail_at = fail_at
+        self.pos = 0
+        self.reads = []
+        self.released = False
+
+    def set(self, prop, value):
+        self.pos = int(value)
+
+    def grab(self):
+        if self.pos >= self.num_frames:
+            return False
+        self.pos += 1
+        return True
+
+    def read(self):
+        if self.pos == self.fail_at:
+            raise OSError(f"corrupt frame {self.pos}")
+        if self.pos >= self.num_frames:
+            return False, None
+        self.reads.append(self.pos)
+        image = np.full((2, 2, 3), self.pos, dtype=np.uint8)
+        self.pos += 1
+        return True, image
+
+    def release(self):
+        self.released = True
+
+
+class RecordingStage(FrameStage):
+    def __init__(self, resume_frame=0):
+        self.resume_frame = resume_frame
+        self.seen = []
+
+    def process(self, frame):
+        self.seen.append((frame.index, frame.sample_index, int(frame.image[0, 0, 0])))
+
+    def finish(self):
+        return self.seen
+
+
+@pytest.mark.parametrize("stride, start, expected", [
+    (1, 0, [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9)]),
+    (3, 0, [(0, 0), (3, 1), (6, 2), (9, 3)]),
+    (3, 6, [(6, 2), (9, 3)]),  # start on a sample
+    (3, 7, [(9, 3)]),  # start between samples: next sample, same sample numbering
+    (4, 1, [(4, 1), (8, 2)]),
+    (3, 10, []),  # past the end
+])
+def test_decode_frames_samples_and_resumes(stride, start, expected):
+    cap = FakeCapture(10)
+    frames = list(decode_frames(cap, stride, start))
+    assert [(frame.index, frame.sample_index) for frame in frames] == expected
+    assert [int(frame.image[0, 0, 0]) for frame in frames] == [index for index, _ in expected]
+    # frames between samples are grabbed, never retrieved
+    assert cap.reads == [index for index, _ in expected]
+
+
+def test_prefetch_keeps_order():
+    assert list(prefetch(iter(range(100)), size=2)) == list(range(100))
+
+
+def test_prefetch_reraises_producer_errors_after_the_items_before_them():
+    def items():
+        yield 1
+        yield 2
+        raise ValueError("decode failed")
+
+    received = []
+    with pytest.raises(ValueError, match="decode failed"):
+        for item in prefetch(items()):
+            received.append(item)
+    assert received == [1, 2]
+
+
+def test_prefetch_close_stops_the_producer():
+    frames = prefetch(iter(range(1000)), size=1)
+    assert next(frames) == 0
+    frames.close()
+    assert not any(thread.name == "prefetch" for thread in threading.enumerate())
+
+
+def test_async_writer_runs_writes_in_order():
+    written = []
+    writer = AsyncWriter(size=1)
+    for i in range(20):
+        writer.submit(written.append, i)
+    writer.close()
+    assert written == list(range(20))
+
+
+def test_async_writer_reraises_the_first_error_and_skips_later_writes():
+    written = []
+
+    def write(i):
+        if i == 1:
+            raise OSError("disk full")
+        written.append(i)
+
+    writer = AsyncWriter()
+    for i in range(3):
+        writer.submit(write, i)
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
+    assert written == [0]
+
+
+def fake_open(cap):
+    def open_video(video_path):
+        return cap, VideoInfo(path=Path(video_path), fps=30.0, frame_count=cap.num_frames,
+                              width=2, height=2)
+    return open_video
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_run_stages_starts_each_stage_at_its_resume_frame(monkeypatch, threaded):
+    cap = FakeCapture(10)
+    monkeypatch.setattr(video_pipeline, "open_video", fake_open(cap))
+    early, late = RecordingStage(resume_frame=4), RecordingStage(resume_frame=8)
+    results = run_stages(Path("video.mp4"), [early, late], stride=2, threaded=threaded)
+
+    assert results[0] == [(4, 2, 4), (6, 3, 6), (8, 4, 8)]
+    assert results[1] == [(8, 4, 8)]
+    assert cap.reads == [4, 6, 8]  # decoding seeks past frames no stage needs
+    assert cap.released
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_run_stages_propagates_decode_errors(monkeypatch, threaded):
+    cap = FakeCapture(10, fail_at=3)
+    monkeypatch.setattr(video_pipeline, "open_video", fake_open(cap))
+    stage = RecordingStage()
+    with pytest.raises(OSError, match="corrupt frame 3"):
+        run_stages(Path("video.mp4"), [stage], threaded=threaded)
+    assert [index for index, _, _ in stage.seen] == [0, 1, 2]
+    assert cap.released
+
+
+def test_failed_run_aborts_the_frame_store(monkeypatch, tmp_path):
+    from ObjectMD.frames import FrameStoreStage, store_paths
+
+    cap = FakeCapture(10, fail_at=7)
+    monkeypatch.setattr(video_pipeline, "open_video", fake_open(cap))
+    stage = FrameStoreStage(store_dir=tmp_path, fps=30)
+    with pytest.raises(OSError, match="corrupt frame 7"):
+        run_stages(Path("video.mp4"), [stage])
+    assert stage.file.closed
+    assert not stage.tmp_path.exists()
+    assert not any(path.exists() for path in store_paths(tmp_path, "video"))